@@ -0,0 +1,478 @@
+#!/usr/bin/python
+
+#Imports
+import os, sys, json, time, platform, argparse, subprocess, contextlib
+import tracemalloc
+import numpy as np
+from fishyhelper import *
+from fishyhelper import FrameRecorder
+from herefishy import params as default_params
+
+'''
+**********************************  GUIDE  *************************************
+
+Benchmarks the BobTracker hot paths (find_bob and wait_for_splash) against
+SyntheticFrameSource frames, headless. Run from the repository root:
+
+python fishybench.py
+python fishybench.py --sizes 1920x1080 --casts 10 --out new.json
+python fishybench.py --compare old.json --out new.json
+python fishybench.py --record frames --sizes 1134x650
+python fishybench.py --trace traces --sizes 1134x650 --casts 1
+python fishybench.py --param bob_color_lut=colors.hfc --sizes 1134x650
+python fishybench.py --param bob_color_lut=colors.hfc --distractors 4
+
+Results are saved as JSON. Passing --compare with an older results file prints
+the change of every metric and exits with status 1 if any of them regressed
+by more than --tolerance.
+
+With --record, every frame is also recorded by a FrameRecorder to a
+directory per capture size, which shows its cost on the stages below and
+leaves recordings to replay with ReplayFrameSource. With --trace, the
+trace of every cast is dumped by a Tracer as Chrome trace JSON to a
+directory per capture size, which also shows the cost of tracing.
+
+With the bob_color_lut param set, the bobber color table learned from the
+casts is saved to that file, so a second run (e.g. with distractors, which
+brightness alone cannot tell from the bobber) searches with it from the
+first cast.
+
+Startup is checked too: fishyhelper is imported in fresh interpreters and
+the median import time is reported. The run fails if the import pulls in any
+of backend_modules, which must only be imported when first used.
+
+Stages (latencies are in milliseconds of wall time unless noted):
+    find_bob         - whole find_bob call, excluding sleeps
+    find_bob_grab    - screenshots taken during find_bob
+    splash_frame     - per-frame analysis in wait_for_splash, excluding grabs
+    splash_grab      - screenshots taken during wait_for_splash
+    splash_to_detect - time between the splash and its detection, in
+                       milliseconds of virtual (screen) time
+    splash_to_click  - time between the splash and the loot click, in
+                       milliseconds of virtual (screen) time
+
+********************************************************************************
+'''
+
+# named capture sizes. 5k is a 27" Retina display
+sizes = {
+    '1134x650': (1134,650),
+    '1920x1080': (1920,1080),
+    '5k': (5120,2880)}
+
+# latency percentiles reported for every stage
+percentiles = (50,90,99)
+
+# modules that importing fishyhelper must not import
+backend_modules = ('mss','Quartz','cv2','scipy','matplotlib','pyautogui',
+                   'asyncio')
+
+class TimedSource(FrameSource):
+    '''
+    Wraps a FrameSource and records the wall clock start and end of every
+    grab, so that grab time can be separated from analysis time.
+    '''
+
+    def __init__(self,source):
+        self.source = source
+        self.grabs = []
+    #end method __init__
+
+    def grab(self,area,out=None):
+        start = time.perf_counter()
+        frame = self.source.grab(area,out=out)
+        self.grabs.append((start,time.perf_counter()))
+        return frame
+    #end method grab
+
+    def monitor(self,idx=1):
+        return self.source.monitor(idx)
+    #end method monitor
+
+    def mark(self,event):
+        self.source.mark(event)
+    #end method mark
+
+    def now(self):
+        return self.source.now()
+    #end method now
+
+    def sleep(self,secs):
+        self.source.sleep(secs)
+    #end method sleep
+
+#end class TimedSource
+
+def summarize(samples):
+    '''
+    Returns dict with count, mean, max and percentiles of list samples.
+    '''
+
+    if len(samples) == 0:
+        return {'count': 0}
+    arr = np.array(samples,dtype=np.float64)
+    stats = {
+        'count': len(arr),
+        'mean': float(np.mean(arr)),
+        'max': float(np.max(arr))}
+    for p in percentiles:
+        stats['p' + str(p)] = float(np.percentile(arr,p))
+    return stats
+
+#end function summarize
+
+def run_cast(tracker,source,params,recorder=None):
+    '''
+    Runs one find_bob and wait_for_splash cycle of tracker against a
+    CaptureSession over source, the same way NatPagle does, recording
+    frames with FrameRecorder recorder if given. Returns dict of per-stage
+    samples in milliseconds, and the outcome.
+    '''
+
+    timed = TimedSource(CaptureSession(
+        source,params['capture_ring_size'],recorder))
+    # feed the rolling background like NatPagle does during the countdown
+    if tracker.background is not None:
+        tracker.background.reset()
+        for i in range(params['init_wait_time']):
+            timed.sleep(1)
+            tracker.background.update(timed.grab(params['cap_area']))
+        timed.grabs = []
+    devnull = open(os.devnull,'w')
+    samples = {}
+    try:
+        with contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            bob_loc = tracker.find_bob(params['bob_track_probe'],source=timed)
+            end = time.perf_counter()
+        samples['find_bob'] = [1e3*(end-start)]
+        samples['find_bob_grab'] = [1e3*(e-s) for s, e in timed.grabs]
+        if not bob_loc:
+            return samples, 'no_bobber'
+        # a splash watched anywhere else would be a false positive at best.
+        # The tolerance is the bobber's diameter, not a tuned param like
+        # splash_radius, so that every candidate is held to the same mark
+        if np.hypot(bob_loc[0]-source.bob_pos[0],
+                    bob_loc[1]-source.bob_pos[1]) > 2*source.bob_radius:
+            return samples, 'wrong_bobber'
+
+        timed.grabs = []
+        with contextlib.redirect_stdout(devnull):
+            splashing = tracker.wait_for_splash(
+                bob_loc[0],bob_loc[1],source=timed)
+            end = time.perf_counter()
+    finally:
+        devnull.close()
+    # analysis time is the gap between the end of a grab and the start of
+    # the next one (or the return of wait_for_splash for the last frame).
+    # The first grab is the baseline and is not counted as a frame
+    ends = [e for s, e in timed.grabs]
+    starts = [s for s, e in timed.grabs[2:]] + [end]
+    samples['splash_frame'] = [
+        1e3*(s-e) for s, e in zip(starts,ends[1:])]
+    samples['splash_grab'] = [1e3*(e-s) for s, e in timed.grabs]
+
+    splash_t = source.splash_time()
+    if not splashing:
+        return samples, 'missed'
+    if splash_t is None or source.now() < splash_t:
+        return samples, 'false_splash'
+    samples['splash_to_detect'] = [1e3*(source.now()-splash_t)]
+    # loot on deadlines from the splash frame, on the virtual clock
+    mouser = RecordingMouser(source)
+    mouser.loot(bob_loc[0],bob_loc[1],tracker.splash_t,
+                params['loot_move_delay'],params['loot_click_delay'],
+                params['shift_right_speed'])
+    samples['splash_to_click'] = [1e3*(mouser.last('rightclick')-splash_t)]
+    return samples, 'detected'
+
+#end function run_cast
+
+def bench_size(name,params,casts,distractors,seed,light_drift=0.,
+               record=None,bite_jitter=0.,trace=None):
+    '''
+    Benchmarks casts casts at capture size name, recording the frames to
+    directory record/name if record is given, and dumping the trace of
+    every cast to directory trace/name if trace is given. Bites come 8
+    seconds after the cast, give or take up to bite_jitter seconds.
+    Returns dict of results.
+    '''
+
+    width, height = sizes[name]
+    params = dict(params)
+    params['cap_area'] = {'top': 0, 'left': 0, 'width': width, 'height': height}
+    background = None
+    if params.get('bg_model',None):
+        background = BackgroundModel(
+            params['bg_model'],params['bg_window'],params['bg_alpha_shift'])
+    # messages are not printed, since the writer thread would print them
+    # after stdout is restored
+    devnull = open(os.devnull,'w')
+    tracer = Tracer('info' if trace else 'warning',stream=devnull)
+    tracker = BobTracker(
+        params,None,mouser=NullMouser(),background=background,tracer=tracer)
+
+    recorder = None
+    if record:
+        recorder = FrameRecorder(
+            os.path.join(record,name),
+            int(params['record_max_mb']*2**20),
+            int(params['record_chunk_mb']*2**20),
+            # the bench grabs far faster than a live session
+            queue_size=4096)
+
+    samples = {}
+    outcomes = {}
+    frames = 0
+    analysis_secs = 0.
+    rng = np.random.default_rng(seed)
+    for i in range(casts):
+        source = SyntheticFrameSource(
+            width,height,distractors=distractors,light_drift=light_drift,
+            splash_delay=8.+rng.uniform(-bite_jitter,bite_jitter),
+            seed=seed+i)
+        cast_samples, outcome = run_cast(tracker,source,params,recorder)
+        if trace:
+            tracer.dump(os.path.join(
+                trace,name,'cast-{:03d}-{}.json'.format(i,outcome)),
+                tracker.cast_perf)
+        outcomes[outcome] = outcomes.get(outcome,0) + 1
+        for stage, vals in cast_samples.items():
+            samples.setdefault(stage,[]).extend(vals)
+        frames += len(cast_samples.get('splash_frame',[]))
+        analysis_secs += 1e-3*(sum(cast_samples.get('splash_frame',[])) + \
+                               sum(cast_samples.get('splash_grab',[])))
+
+    recorded = None
+    if recorder is not None:
+        recorder.close()
+        recorded = {'written': recorder.written,'dropped': recorder.dropped}
+
+    # separate pass for peak memory, since tracing slows allocations down
+    source = SyntheticFrameSource(
+        width,height,distractors=distractors,light_drift=light_drift,
+        seed=seed)
+    tracemalloc.start()
+    try:
+        run_cast(tracker,source,params)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        tracer.close()
+        devnull.close()
+    if tracker.color_lut is not None:
+        tracker.learn_colors()
+        tracker.color_lut.save(params['bob_color_lut'])
+
+    return {
+        'width': width,
+        'height': height,
+        'casts': casts,
+        'outcomes': outcomes,
+        'splash_fps': frames/analysis_secs if analysis_secs else 0.,
+        'splash_frames_per_cast': frames/casts,
+        'peak_mem_mb': peak/2.**20,
+        'recorded': recorded,
+        'stages': {
+            stage: summarize(vals) for stage, vals in samples.items()}}
+
+#end function bench_size
+
+def startup_time(runs=5):
+    '''
+    Imports fishyhelper in runs fresh interpreters. Returns dict with the
+    median import time in milliseconds and the backend_modules it imported.
+    '''
+
+    code = '''if True:
+        import sys, time
+        start = time.perf_counter()
+        import fishyhelper
+        print(1e3*(time.perf_counter()-start))
+        print(','.join(m for m in {} if m in sys.modules))'''.format(
+            repr(backend_modules))
+    times = []
+    loaded = set()
+    for i in range(runs):
+        out = subprocess.check_output(
+            [sys.executable,'-c',code],
+            cwd=os.path.dirname(os.path.abspath(__file__))).decode().split('\n')
+        times.append(float(out[0]))
+        loaded.update(m for m in out[1].split(',') if m)
+    return {'import_ms': float(np.median(times)),'backends': sorted(loaded)}
+
+#end function startup_time
+
+def version_info():
+    '''
+    Returns dict describing the code and platform being benchmarked.
+    '''
+
+    try:
+        commit = subprocess.check_output(
+            ['git','rev-parse','--short','HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError,subprocess.CalledProcessError):
+        commit = 'unknown'
+    return {
+        'commit': commit,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor()}
+
+#end function version_info
+
+def compare(old,new,tolerance):
+    '''
+    Prints the change of every metric in results dict new relative to old.
+    Returns list of (metric,old,new) that regressed by more than tolerance.
+    '''
+
+    regressions = []
+    if 'startup' in old and 'startup' in new:
+        old_ms, new_ms = old['startup']['import_ms'], new['startup']['import_ms']
+        change = (new_ms - old_ms)/old_ms
+        flag = '  REGRESSION' if change > tolerance else ''
+        print('startup')
+        print('    {:<24} {:>12.3f} -> {:>12.3f} ({:+.1%}){}'.format(
+            'import_ms',old_ms,new_ms,change,flag))
+        if flag:
+            regressions.append(('startup:import_ms',old_ms,new_ms))
+    for name, res in new['results'].items():
+        if name not in old['results']:
+            continue
+        old_res = old['results'][name]
+        metrics = [
+            ('splash_fps',res['splash_fps'],old_res['splash_fps'],True),
+            ('peak_mem_mb',res['peak_mem_mb'],old_res['peak_mem_mb'],False)]
+        for stage, stats in res['stages'].items():
+            old_stats = old_res['stages'].get(stage,{})
+            for key in ['p' + str(p) for p in percentiles]:
+                if key in stats and key in old_stats:
+                    metrics.append((stage + '.' + key,stats[key],
+                                    old_stats[key],False))
+        print(name)
+        for metric, val, old_val, higher_better in metrics:
+            if old_val == 0:
+                continue
+            change = (val - old_val)/old_val
+            worse = -change if higher_better else change
+            flag = '  REGRESSION' if worse > tolerance else ''
+            print('    {:<24} {:>12.3f} -> {:>12.3f} ({:+.1%}){}'.format(
+                metric,old_val,val,change,flag))
+            if flag:
+                regressions.append((name + ':' + metric,old_val,val))
+    return regressions
+
+#end function compare
+
+def print_results(results):
+    '''
+    Prints a short table of results dict.
+    '''
+
+    startup = results['startup']
+    print("startup  import=" + "{:.1f}".format(startup['import_ms']) + " ms" + \
+          ("  backends imported: " + ', '.join(startup['backends'])
+           if startup['backends'] else ''))
+    for name, res in results['results'].items():
+        print(name + "  (" + str(res['width']) + "x" + str(res['height']) + \
+              ")  splash fps=" + "{:.1f}".format(res['splash_fps']) + \
+              "  frames/cast=" + \
+              "{:.0f}".format(res.get('splash_frames_per_cast',0)) + \
+              "  peak mem=" + "{:.1f}".format(res['peak_mem_mb']) + " MB" + \
+              "  outcomes=" + str(res['outcomes']) + \
+              ("  recorded=" + str(res['recorded'])
+               if res.get('recorded') else ''))
+        for stage, stats in res['stages'].items():
+            if stats['count'] == 0:
+                continue
+            print('    {:<18} n={:<6} '.format(stage,stats['count']) + \
+                  '  '.join('p{}={:.3f}'.format(p,stats['p' + str(p)])
+                            for p in percentiles) + \
+                  '  max={:.3f}'.format(stats['max']))
+
+#end function print_results
+
+def main(argv=None):
+    '''
+    Command line entry point. See GUIDE above.
+    '''
+
+    parser = argparse.ArgumentParser(description=\
+        "Benchmark BobTracker.find_bob and BobTracker.wait_for_splash")
+    parser.add_argument('--sizes',default=','.join(sizes),
+        help="comma separated capture sizes: " + ', '.join(sizes))
+    parser.add_argument('--casts',type=int,default=5,
+        help="casts per capture size")
+    parser.add_argument('--distractors',type=int,default=0,
+        help="passing distractors in the synthetic scene")
+    parser.add_argument('--light-drift',type=float,default=0.,
+        help="change of the synthetic water brightness per second")
+    parser.add_argument('--bite-jitter',type=float,default=0.,
+        help="seconds the synthetic bites vary around 8 s after the cast")
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--record',default=None,metavar='DIR',
+        help="record every frame to a directory per size in DIR")
+    parser.add_argument('--trace',default=None,metavar='DIR',
+        help="dump the trace of every cast to a directory per size in DIR")
+    parser.add_argument('--startup-runs',type=int,default=5,
+        help="fresh interpreters that time the import of fishyhelper")
+    parser.add_argument('--param',action='append',default=[],
+        metavar='NAME=VALUE',
+        help="override a herefishy.py param, e.g. bob_track_probe=30")
+    parser.add_argument('--out',default=None,
+        help="save results as JSON to this file")
+    parser.add_argument('--compare',default=None,
+        help="JSON results file to compare against")
+    parser.add_argument('--tolerance',type=float,default=.1,
+        help="relative change counted as a regression")
+    args = parser.parse_args(argv)
+
+    params = dict(default_params)
+    params['_dev_mode'] = False
+    for override in args.param:
+        key, val = override.split('=',1)
+        default = params.get(key,None)
+        if val == 'None':
+            val = None
+        elif isinstance(default,bool):
+            val = val.lower() in ('1','true','yes','on')
+        elif default is not None:
+            val = type(default)(val)
+        params[key] = val
+
+    results = {
+        'version': version_info(),
+        'params': {k: v for k, v in params.items() if k != 'cap_area'},
+        'startup': startup_time(args.startup_runs),
+        'results': {}}
+    for name in args.sizes.split(','):
+        results['results'][name] = bench_size(
+            name,params,args.casts,args.distractors,args.seed,
+            args.light_drift,args.record,args.bite_jitter,args.trace)
+    print_results(results)
+
+    if args.out:
+        with open(args.out,'w') as f:
+            json.dump(results,f,indent=2)
+    status = 0
+    if results['startup']['backends']:
+        print("Importing fishyhelper imported backends: " + \
+              ', '.join(results['startup']['backends']))
+        status = 1
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        if compare(old,results,args.tolerance):
+            status = 1
+    return status
+
+#end function main
+
+if __name__ == '__main__':
+    sys.exit(main())
+#end if
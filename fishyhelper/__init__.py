@@ -0,0 +1,75 @@
+#!/usr/bin/python
+
+'''
+HereFishy helpers. The analysis core (numpy only) is imported right away and
+works on any platform. Backends are imported the first time they are used:
+MSS by the first MSSFrameSource, Quartz by the first MacMouser, and OpenCV
+when the GUI is first shown.
+
+    analysis - summed-area tables, probes, blobs, template matching,
+               ColorLUT, FrameReducer, BackgroundModel, ChangeDetector
+    geometry - rectangle and point helpers, batched over (N,4,2) quads
+    capture  - FrameSource, MSSFrameSource, CaptureSession, FramePacer,
+               SyntheticFrameSource
+    inputs   - Mouser, MacMouser, WinMouser, NullMouser, RecordingMouser,
+               LockedMouser
+    gui      - GUIParamSet, show_img
+    tracker  - BobTracker
+    history  - ParamTracker
+    metrics  - Metrics
+    trace    - Tracer, trace_level, shared_tracer
+    profile  - SessionProfile
+    recorder - FrameRecorder, FrameReplay, ReplayFrameSource
+    session  - NatPagle, FishingSupervisor (imported on first use)
+'''
+
+from .analysis import summed_area_table, probe_grid, probe_sums, \
+    probe_means, label_grid, cluster_hits, match_template, ColorLUT, \
+    FrameReducer, BackgroundModel, ChangeDetector
+from .geometry import quad_angles, are_like_rects, is_like_rect, \
+    quad_bounds, rect_bounds, pts_in_boxes, pts_in_box, sortquads_clockwise, \
+    sortpts_clockwise, approx_rects, approx_rect
+from .capture import FrameSource, MSSFrameSource, CaptureSession, \
+    FramePacer, SyntheticFrameSource
+from .inputs import Mouser, MacMouser, WinMouser, NullMouser, \
+    RecordingMouser, LockedMouser
+from .gui import show_img, GUIParamSet
+from .tracker import BobTracker
+from .history import ParamTracker
+from .metrics import Metrics
+from .trace import Tracer, trace_level, shared_tracer
+from .profile import SessionProfile
+from .recorder import FrameRecorder, FrameReplay, ReplayFrameSource
+
+def __getattr__(name):
+    '''
+    NatPagle and FishingSupervisor need asyncio and multiprocessing, so
+    fishyhelper.session is only imported when one of them is first used.
+    '''
+    
+    if name in ('NatPagle','FishingSupervisor'):
+        from . import session
+        return getattr(session,name)
+    raise AttributeError("module 'fishyhelper' has no attribute '" + \
+                         name + "'")
+    
+#end function __getattr__
+
+# NatPagle and FishingSupervisor are left out, since import * would look
+# them up and import fishyhelper.session right away
+__all__ = [
+    'summed_area_table', 'probe_grid', 'probe_sums', 'probe_means',
+    'label_grid', 'cluster_hits', 'match_template', 'ColorLUT',
+    'FrameReducer',
+    'BackgroundModel', 'ChangeDetector',
+    'quad_angles', 'are_like_rects', 'is_like_rect', 'quad_bounds',
+    'rect_bounds', 'pts_in_boxes', 'pts_in_box', 'sortquads_clockwise',
+    'sortpts_clockwise', 'approx_rects', 'approx_rect',
+    'FrameSource', 'MSSFrameSource', 'CaptureSession', 'FramePacer',
+    'SyntheticFrameSource',
+    'Mouser', 'MacMouser', 'WinMouser', 'NullMouser', 'RecordingMouser',
+    'LockedMouser',
+    'show_img', 'GUIParamSet',
+    'BobTracker', 'ParamTracker', 'Metrics', 'Tracer', 'trace_level',
+    'shared_tracer',
+    'SessionProfile', 'FrameRecorder', 'FrameReplay', 'ReplayFrameSource']
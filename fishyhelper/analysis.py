@@ -0,0 +1,797 @@
+#!/usr/bin/python
+
+#Essential imports
+import math, os
+import numpy as np
+
+def summed_area_table(img,dtype=np.int64,out=None):
+    '''
+    Returns the summed-area table (integral image) of img, summed over the
+    channel axis if img has one. The table is padded with a leading row and
+    column of zeros, so that the sum of img[y0:y1,x0:x1] is
+    sat[y1,x1] - sat[y0,x1] - sat[y1,x0] + sat[y0,x0] for any box. With an
+    unsigned dtype the table wraps around on overflow, but box sums computed
+    in that dtype are still exact as long as the box sum itself fits.
+    Writes into ndarray out if given.
+    '''
+
+    if img.ndim == 3:
+        img = np.sum(img,axis=2,dtype=dtype)
+    if out is None:
+        out = np.empty((img.shape[0]+1,img.shape[1]+1),dtype=dtype)
+    out[0,:] = 0
+    out[:,0] = 0
+    np.cumsum(img,axis=0,dtype=dtype,out=out[1:,1:])
+    np.cumsum(out[1:,1:],axis=1,dtype=dtype,out=out[1:,1:])
+    return out
+
+#end function summed_area_table
+
+def probe_grid(cap_area,res):
+    '''
+    Returns (xs,ys), the screen coordinates of the find_bob sample points in
+    cap_area, as int ndarrays. Points are separated by res in both x and y
+    axes, starting at the top left corner of cap_area. Only points whose
+    square probe with sides 2*res lies entirely inside cap_area are returned.
+    '''
+
+    left, top = cap_area['left'], cap_area['top']
+    xs = np.arange(left,left+cap_area['width'],res)
+    ys = np.arange(top,top+cap_area['height'],res)
+    xs = xs[(xs-res >= left) & (xs+res <= left+cap_area['width'])]
+    ys = ys[(ys-res >= top) & (ys+res <= top+cap_area['height'])]
+    return xs, ys
+
+#end function probe_grid
+
+def _probe_box(xs,ys,cap_area,res,stride,grid=True):
+    '''
+    Returns (x0,x1,y0,y1), the bounds of every square probe around the grid
+    (or points, if not grid) xs,ys in the coordinates of a cap_area image
+    subsampled by stride.
+    '''
+
+    x0 = -(-(xs - res - cap_area['left'])//stride)
+    x1 = -(-(xs + res - cap_area['left'])//stride)
+    y0 = -(-(ys - res - cap_area['top'])//stride)
+    y1 = -(-(ys + res - cap_area['top'])//stride)
+    if grid:
+        return x0[None,:], x1[None,:], y0[:,None], y1[:,None]
+    return x0, x1, y0, y1
+
+#end function _probe_box
+
+def probe_sums(sat,xs,ys,cap_area,res,stride=1,grid=True,peak=None):
+    '''
+    Given summed-area table sat of a cap_area screenshot, returns the sum over
+    the square probe with sides 2*res around every sample point in the grid
+    defined by xs and ys (see probe_grid). Result is an int64 ndarray with
+    shape (len(ys),len(xs)). If grid is False, xs and ys are instead paired
+    up as individual points and the result has shape (len(xs),). If the
+    screenshot was subsampled by stride before building sat, probes are
+    mapped onto the subsampled pixels.
+
+    With a uint32 sat (see FrameReducer.sat) the sums are only exact while
+    a probe's sum fits in 32 bits, i.e. for probes of at most
+    (2**32-1)//peak pixels, where peak is the largest value of a pixel of
+    the summed image (FrameReducer.peak): about 2048x2048 pixels in 'mean'
+    mode and 256x256 in 'luma' mode. If peak is given, raises ValueError
+    for bigger probes.
+    '''
+
+    x0, x1, y0, y1 = _probe_box(xs,ys,cap_area,res,stride,grid)
+    if peak is not None and sat.dtype.itemsize <= 4:
+        size = int(np.max((x1-x0)*(y1-y0),initial=0))
+        if size*peak >= 1 << 8*sat.dtype.itemsize:
+            raise ValueError("Probes of " + str(size) + " pixels overflow " + \
+                             "a " + str(sat.dtype) + " summed-area table")
+    sums = sat[y1,x1] - sat[y0,x1] - sat[y1,x0] + sat[y0,x0]
+    return sums.astype(np.int64)
+
+#end function probe_sums
+
+def probe_means(sat,xs,ys,cap_area,res,stride=1,grid=True,peak=None):
+    '''
+    Same as probe_sums, but returns the mean per pixel of every probe.
+    '''
+
+    x0, x1, y0, y1 = _probe_box(xs,ys,cap_area,res,stride,grid)
+    return probe_sums(sat,xs,ys,cap_area,res,stride,grid,peak) / \
+        ((x1-x0)*(y1-y0))
+
+#end function probe_means
+
+def label_grid(mask,connectivity=8):
+    '''
+    Labels the connected blobs of True cells in 2D bool ndarray mask, using
+    vectorized min-label propagation between neighboring cells. connectivity
+    is 4 (edges only) or 8 (edges and corners). Returns (labels,n), where
+    labels is an int ndarray shaped like mask with -1 for False cells and
+    0..n-1 for the blobs.
+    '''
+
+    h, w = mask.shape
+    bg = h*w # label of cells outside any blob
+    labels = np.where(mask,np.arange(h*w).reshape((h,w)),bg)
+    padded = np.full((h+2,w+2),bg)
+    if connectivity == 4:
+        shifts = [(0,1),(2,1),(1,0),(1,2)]
+    else:
+        shifts = [(i,j) for i in range(3) for j in range(3) if (i,j) != (1,1)]
+    while True:
+        padded[1:-1,1:-1] = labels
+        new = labels.copy()
+        for i, j in shifts:
+            np.minimum(new,padded[i:i+h,j:j+w],out=new)
+        new[~mask] = bg
+        if np.array_equal(new,labels):
+            break
+        labels = new
+    uniq, inv = np.unique(labels[mask],return_inverse=True)
+    out = np.full((h,w),-1)
+    out[mask] = inv
+    return out, len(uniq)
+
+#end function label_grid
+
+def cluster_hits(pts,weights,res,connectivity=8,grab_weights=None,
+                 footprint=None,max_motion=None):
+    '''
+    Groups find_bob hits into connected blobs on the probe grid and scores
+    them. pts is an (N,2) ndarray of hit coordinates, all on a grid with
+    spacing res, and weights their color differences. A bright, passing
+    distractor changes more than the bobber does, so the color difference
+    alone does not pick the bobber: blobs are also scored by how close
+    their area is to footprint, the number of hits of a bobber-sized
+    change, and by how still they keep over the screenshots of
+    (M,N) ndarray grab_weights, the color differences of every hit in each
+    of M screenshots. Blobs whose centroid moves more than max_motion
+    pixels between those screenshots are dropped. Every blob is returned
+    as a dict with keys
+        'x', 'y' - centroid, weighted by color difference
+        'area' - number of hits
+        'total_diff' - sum of the color differences
+        'compactness' - area over the area of the blob's bounding box
+        'fit' - smaller over larger of area and footprint (1 if None)
+        'motion' - largest distance in pixels of the centroid of one
+            screenshot from that of the first (0 if no grab_weights)
+        'score' - total_diff*compactness*fit
+    Returns list of blob dicts, best score first.
+    '''
+
+    pts = np.asarray(pts)
+    weights = np.asarray(weights,dtype=np.float64)
+    if len(pts) == 0:
+        return []
+    cells = (pts - np.min(pts,axis=0))//res
+    mask = np.zeros(tuple(np.max(cells,axis=0)[::-1] + 1),dtype=bool)
+    mask[cells[:,1],cells[:,0]] = True
+    grid_labels, n = label_grid(mask,connectivity)
+    lbl = grid_labels[cells[:,1],cells[:,0]]
+
+    area = np.bincount(lbl,minlength=n)
+    total = np.bincount(lbl,weights=weights,minlength=n)
+    cx = np.bincount(lbl,weights=weights*pts[:,0],minlength=n)/total
+    cy = np.bincount(lbl,weights=weights*pts[:,1],minlength=n)/total
+    lo = np.full((n,2),np.iinfo(cells.dtype).max)
+    hi = np.full((n,2),-1)
+    np.minimum.at(lo,lbl,cells)
+    np.maximum.at(hi,lbl,cells)
+    extent = hi - lo + 1
+    compactness = area/(extent[:,0]*extent[:,1])
+    fit = np.ones(n)
+    if footprint:
+        fit = np.minimum(area,footprint)/np.maximum(area,footprint)
+    score = total*compactness*fit
+
+    # centroid of every blob in every screenshot, relative to the first
+    motion = np.zeros(n)
+    if grab_weights is not None and len(grab_weights) > 1:
+        gw = np.asarray(grab_weights,dtype=np.float64)
+        gtotal = np.array([np.bincount(lbl,weights=w,minlength=n)
+                           for w in gw])
+        gx = np.array([np.bincount(lbl,weights=w*pts[:,0],minlength=n)
+                       for w in gw])/gtotal
+        gy = np.array([np.bincount(lbl,weights=w*pts[:,1],minlength=n)
+                       for w in gw])/gtotal
+        motion = np.max(np.hypot(gx - gx[0],gy - gy[0]),axis=0)
+    keep = np.ones(n,dtype=bool) if max_motion is None else \
+        motion <= max_motion
+
+    return [{
+        'x': float(cx[i]),
+        'y': float(cy[i]),
+        'area': int(area[i]),
+        'total_diff': float(total[i]),
+        'compactness': float(compactness[i]),
+        'fit': float(fit[i]),
+        'motion': float(motion[i]),
+        'score': float(score[i])}
+        for i in np.argsort(-score) if keep[i]]
+
+#end function cluster_hits
+
+def match_template(plane,template,step=1):
+    '''
+    Slides 2D ndarray template over every position inside 2D ndarray plane
+    (integer planes of up to 16 bits) and scores each by the sum of absolute
+    differences (SAD), all at once through a strided view of the windows.
+    Only every step-th pixel of the template is compared, which still finds
+    the match to the pixel. Returns tuple (iy,ix,sad): the top left corner
+    of the best match in plane and the array of SAD scores of all positions.
+    '''
+    
+    windows = np.lib.stride_tricks.sliding_window_view(
+        plane,template.shape)[:,:,::step,::step]
+    diff = windows.astype(np.int32) - template[::step,::step]
+    sad = np.abs(diff,out=diff).reshape(windows.shape[:2] + (-1,)).sum(axis=2)
+    iy, ix = np.unravel_index(np.argmin(sad),sad.shape)
+    return int(iy), int(ix), sad
+    
+#end function match_template
+
+class ColorLUT(object):
+    
+    # file header: magic, then bits and blur as uint32
+    magic = b'HFCLUT01'
+    
+    def __init__(self,bits=5,blur=1):
+        '''
+        Bobber pixel classifier driven by a precomputed lookup table, indexed
+        by BGR quantized to bits bits per channel (2**(3*bits) uint8 entries,
+        32 KB for 5 bits). Each entry is the likelihood, 0 to 255, that a
+        pixel of that color belongs to the bobber, built from histograms of
+        sample bobber pixels and of other pixels (see update and learn).
+        Classifying a frame is a few integer shifts and one gather through
+        the table (see classify), so a bright change of another color, like
+        a spell effect or a passing player, scores low.
+        
+        Arguments:
+            int bits[=5] - bits per channel of the quantized colors, 1 to 5
+            int blur[=1] - radius in bins of the box blur of the histograms,
+                so that colors next to sampled ones score too
+        '''
+        
+        if not 1 <= bits <= 5:
+            raise ValueError("ColorLUT bits must be 1 to 5, not " + str(bits))
+        self.bits = int(bits)
+        self.blur = int(blur)
+        self.shift = 8 - self.bits
+        n = 1 << 3*self.bits
+        self.pos = np.zeros(n) # histograms of bobber and other colors
+        self.neg = np.zeros(n)
+        self.table = np.zeros(n,dtype=np.uint8)
+        self.samples = 0 # updates with bobber pixels
+        self.buffers = {} # shape -> preallocated index, scratch and map
+        
+    #end method __init__
+    
+    @classmethod
+    def load(cls,path):
+        '''
+        Returns the ColorLUT saved to path, or None if there is none. Raises
+        ValueError if the file is not a color table.
+        '''
+        
+        if not os.path.exists(path):
+            return None
+        with open(path,'rb') as f:
+            head = f.read(16)
+            if head[:8] != cls.magic:
+                raise ValueError("'" + path + "' is not a color table of " + \
+                                 "this version of HereFishy")
+            bits, blur = np.frombuffer(head[8:16],dtype=np.uint32)
+            lut = cls(int(bits),int(blur))
+            n = len(lut.table)
+            lut.samples = int(np.fromfile(f,dtype=np.uint64,count=1)[0])
+            lut.pos = np.fromfile(f,dtype=np.float64,count=n)
+            lut.neg = np.fromfile(f,dtype=np.float64,count=n)
+        lut.build()
+        return lut
+        
+    #end method load
+    
+    def save(self,path):
+        '''
+        Writes the histograms to path, replacing the file atomically.
+        '''
+        
+        os.makedirs(os.path.dirname(path) or '.',exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp,'wb') as f:
+            f.write(self.magic)
+            f.write(np.array([self.bits,self.blur],dtype=np.uint32).tobytes())
+            f.write(np.uint64(self.samples).tobytes())
+            f.write(self.pos.tobytes())
+            f.write(self.neg.tobytes())
+        os.replace(tmp,path)
+        
+    #end method save
+    
+    def _buffers(self,shape):
+        bufs = self.buffers.get(shape,None)
+        if bufs is None:
+            bufs = self.buffers[shape] = (
+                np.empty(shape,dtype=np.uint16),
+                np.empty(shape,dtype=np.uint16),
+                np.empty(shape,dtype=np.uint8))
+        return bufs
+    #end method _buffers
+    
+    def index(self,pixels,out=None):
+        '''
+        Returns the table index of every pixel of uint8 ndarray pixels, BGR
+        or BGRA in the last axis, as a uint16 array of pixels.shape[:-1].
+        Unless written into out, the array is a preallocated buffer that is
+        overwritten by the next call with the same shape.
+        '''
+        
+        if out is None:
+            idx, tmp, plane = self._buffers(pixels.shape[:-1])
+        else:
+            idx, tmp = out, np.empty(pixels.shape[:-1],dtype=np.uint16)
+        # (b >> shift) << 2*bits | (g >> shift) << bits | r >> shift
+        np.right_shift(pixels[...,0],self.shift,out=idx,dtype=np.uint16)
+        idx <<= 2*self.bits
+        np.right_shift(pixels[...,1],self.shift,out=tmp,dtype=np.uint16)
+        tmp <<= self.bits
+        idx |= tmp
+        np.right_shift(pixels[...,2],self.shift,out=tmp,dtype=np.uint16)
+        idx |= tmp
+        return idx
+        
+    #end method index
+    
+    def classify(self,pixels):
+        '''
+        Returns the bobber likelihood map of uint8 ndarray pixels (e.g. a
+        BGRA frame), 0 to 255 in uint8. The map is a preallocated buffer
+        that is overwritten by the next call with the same shape.
+        '''
+        
+        plane = self._buffers(pixels.shape[:-1])[2]
+        return np.take(self.table,self.index(pixels),out=plane)
+        
+    #end method classify
+    
+    def update(self,pos,neg=None):
+        '''
+        Adds uint8 ndarrays pos of bobber pixels and neg of other pixels
+        (BGR or BGRA in the last axis) to the histograms, and rebuilds the
+        table.
+        '''
+        
+        # samples vary in size, so they are not indexed into the buffers
+        n = len(self.table)
+        if len(pos):
+            idx = self.index(pos,np.empty(pos.shape[:-1],dtype=np.uint16))
+            self.pos += np.bincount(idx.ravel(),minlength=n)
+            self.samples += 1
+        if neg is not None and len(neg):
+            idx = self.index(neg,np.empty(neg.shape[:-1],dtype=np.uint16))
+            self.neg += np.bincount(idx.ravel(),minlength=n)
+        self.build()
+        
+    #end method update
+    
+    def learn(self,frame,background,others=None,min_diff=48):
+        '''
+        Updates the table from a BGRA frame showing the bobber and the same
+        area without it, background: pixels whose B, G and R differ from
+        background by more than min_diff in total are bobber pixels, and
+        the background pixels and the optional others (e.g. a subsampled
+        screenshot of the whole scene) are other pixels.
+        '''
+        
+        diff = np.abs(frame[...,:3].astype(np.int16) -
+                      background[...,:3]).sum(axis=-1)
+        neg = background[...,:3].reshape((-1,3))
+        if others is not None:
+            neg = np.concatenate([neg,others[...,:3].reshape((-1,3))])
+        self.update(frame[...,:3][diff > min_diff],neg)
+        
+    #end method learn
+    
+    def _smooth(self,hist):
+        '''
+        Returns histogram hist box blurred over self.blur bins along every
+        channel of the color cube.
+        '''
+        
+        m = 1 << self.bits
+        cube = hist.reshape((m,m,m))
+        for axis in range(3):
+            pad = [(0,0)]*3
+            pad[axis] = (self.blur,self.blur)
+            padded = np.pad(cube,pad)
+            cube = sum(np.take(padded,range(i,i+m),axis=axis)
+                       for i in range(2*self.blur+1))
+        return cube.ravel()
+        
+    #end method _smooth
+    
+    def build(self):
+        '''
+        Rebuilds the table from the histograms, as the share of the bobber
+        color density in the total color density of each color. Colors
+        never seen off the bobber are weighed against a uniform floor, so
+        one stray sample does not make a color certain.
+        '''
+        
+        pos = self._smooth(self.pos)
+        if not pos.any():
+            self.table[:] = 0
+            return
+        pos /= pos.sum()
+        neg = self._smooth(self.neg)
+        if neg.any():
+            neg /= neg.sum()
+        neg += 1./len(neg)
+        np.round(255*pos/(pos + neg),out=pos)
+        self.table[:] = pos
+        
+    #end method build
+    
+#end class ColorLUT
+
+class FrameReducer(object):
+    '''
+    Reduces BGRA screenshots to a single integer plane before analysis, which
+    is much cheaper than np.mean over the raw grab: the constant alpha
+    channel is dropped, no float64 temporaries are made, and the frame can be
+    subsampled with strides. Modes are
+        'luma' - integer Rec. 601 luma, times 256, in uint16
+        'bgr' - sum of the B, G and R channels in uint16
+        'b', 'g', 'r' - a single channel, as a view without any copy
+        'mean' - the original float64 np.mean over all four BGRA channels
+        'lut' - bobber likelihood from the ColorLUT lut, in uint8
+    Means returned by mean() and probe means times self.scale are on the
+    scale of the original np.mean over BGRA, so that thresholds like
+    bob_color_diff keep their meaning (exactly for 'bgr' and 'mean', and for
+    grey changes for the rest). In 'lut' mode a likelihood of 255 counts
+    like a single channel at 255.
+    '''
+    
+    # Rec. 601 luma weights for B, G and R, summing to 256
+    luma_weights = (29,150,77)
+    
+    def __init__(self,mode='luma',stride=1,lut=None):
+        
+        if mode not in ('luma','bgr','b','g','r','mean','lut'):
+            raise ValueError("Invalid reduce mode '" + str(mode) + "'")
+        if mode == 'lut' and lut is None:
+            raise ValueError("Reduce mode 'lut' needs a ColorLUT")
+        self.mode = mode
+        self.stride = int(stride)
+        self.lut = lut
+        if mode == 'luma':
+            self.scale = .75/256
+        elif mode in ('bgr','mean'):
+            self.scale = .25
+        else:
+            self.scale = .75
+        # largest value of a pixel of the reduced plane, which bounds the
+        # probes whose sums fit in the uint32 table of sat
+        self.peak = {'luma': 255*sum(self.luma_weights),'bgr': 3*255,
+                     'mean': 4*255}.get(mode,255)
+        self.buffers = {} # shape -> preallocated uint16 planes
+        self.sat_buffers = {} # shape -> preallocated uint32 tables
+        
+    #end method __init__
+    
+    def _buffer(self,shape,idx=0):
+        bufs = self.buffers.setdefault(shape,[])
+        while len(bufs) <= idx:
+            bufs.append(np.empty(shape,dtype=np.uint16))
+        return bufs[idx]
+    #end method _buffer
+    
+    def reduce(self,frame):
+        '''
+        Returns the reduced 2D integer plane of BGRA uint8 ndarray frame. The
+        plane is a preallocated buffer that is overwritten by the next call
+        with the same frame size.
+        '''
+        
+        if self.stride > 1:
+            frame = frame[::self.stride,::self.stride]
+        if self.mode in ('b','g','r'):
+            return frame[:,:,'bgr'.index(self.mode)]
+        if self.mode == 'lut':
+            return self.lut.classify(frame)
+        acc = self._buffer(frame.shape[:2])
+        if self.mode == 'luma':
+            tmp = self._buffer(frame.shape[:2],1)
+            wb, wg, wr = [np.uint16(w) for w in self.luma_weights]
+            np.multiply(frame[:,:,0],wb,out=acc)
+            np.multiply(frame[:,:,1],wg,out=tmp)
+            acc += tmp
+            np.multiply(frame[:,:,2],wr,out=tmp)
+            acc += tmp
+        else: # channel sum, including alpha for 'mean'
+            np.add(frame[:,:,0],frame[:,:,1],out=acc,dtype=np.uint16)
+            acc += frame[:,:,2]
+            if self.mode == 'mean':
+                acc += frame[:,:,3]
+        return acc
+        
+    #end method reduce
+    
+    def mean(self,frame):
+        '''
+        Returns the mean of frame on the scale of np.mean over BGRA.
+        '''
+        
+        if self.mode == 'mean':
+            return np.mean(frame)
+        if self.stride > 1:
+            frame = frame[::self.stride,::self.stride]
+        if self.mode == 'lut':
+            plane = self.lut.classify(frame)
+            return int(np.sum(plane,dtype=np.uint64))*self.scale/plane.size
+        # weighted sums of the channels give the mean of the reduced plane
+        # without building it
+        if self.mode == 'luma':
+            weights = self.luma_weights
+        elif self.mode == 'bgr':
+            weights = (1,1,1)
+        else:
+            weights = [int(self.mode == c) for c in 'bgr']
+        total = sum(w*int(np.sum(frame[:,:,c],dtype=np.uint64))
+                    for c, w in enumerate(weights) if w)
+        return total*self.scale/(frame.shape[0]*frame.shape[1])
+        
+    #end method mean
+    
+    def sat(self,frame):
+        '''
+        Returns the uint32 summed-area table of the reduced frame. The table
+        is a preallocated buffer that is overwritten by the next call with the
+        same frame size. Box sums of it are exact for boxes of up to
+        (2**32-1)//self.peak pixels (see probe_sums).
+        '''
+        
+        plane = self.reduce(frame)
+        shape = (plane.shape[0]+1,plane.shape[1]+1)
+        if shape not in self.sat_buffers:
+            self.sat_buffers[shape] = np.empty(shape,dtype=np.uint32)
+        return summed_area_table(
+            plane,dtype=np.uint32,out=self.sat_buffers[shape])
+        
+    #end method sat
+    
+#end class FrameReducer
+
+class BackgroundModel(object):
+    
+    def __init__(self,mode='ewma',window=8,alpha_shift=3):
+        '''
+        Rolling per-pixel background of a series of same-sized BGRA frames,
+        maintained incrementally and stored compactly. Used in place of a
+        single baseline screenshot, which is noisy on animated water.
+        
+        Arguments:
+            str mode[='ewma'] - 'ewma' for an exponentially weighted mean with
+                weight 2**-alpha_shift per frame, kept in uint16 8.8 fixed
+                point, or 'median' for the median of the last window frames,
+                kept in a uint8 ring
+            int window[=8] - number of frames in the ring ('median' only)
+            int alpha_shift[=3] - weight of a new frame is 2**-alpha_shift
+                ('ewma' only)
+        '''
+        
+        if mode not in ('ewma','median'):
+            raise ValueError("Invalid background mode '" + str(mode) + "'")
+        self.mode = mode
+        self.window = int(window)
+        self.alpha_shift = int(alpha_shift)
+        self.reset()
+        
+    #end method __init__
+    
+    def reset(self):
+        '''
+        Forgets all frames.
+        '''
+        
+        self.count = 0 # frames seen since reset
+        self.state = None # uint16 ewma or uint8 ring of frames
+        self.tmp = None # int32 scratch buffer for ewma updates
+        self.bg = None # uint8 background frame
+        
+    #end method reset
+    
+    def update(self,frame):
+        '''
+        Adds BGRA uint8 ndarray frame to the model. The model is reset if the
+        frame size changed.
+        '''
+        
+        if self.state is not None and \
+           self.state.shape[-3:] != frame.shape:
+            self.reset()
+        if self.mode == 'ewma':
+            if self.state is None:
+                self.state = np.left_shift(frame,8,dtype=np.uint16)
+                self.tmp = np.empty(frame.shape,dtype=np.int32)
+            else:
+                # state += (frame*256 - state) >> alpha_shift, in int32
+                np.left_shift(frame,8,out=self.tmp,dtype=np.int32)
+                self.tmp -= self.state
+                self.tmp >>= self.alpha_shift
+                np.add(self.state,self.tmp,out=self.state,casting='unsafe')
+        else:
+            if self.state is None:
+                self.state = np.empty((self.window,) + frame.shape,
+                                      dtype=np.uint8)
+            self.state[self.count % self.window] = frame
+        self.count += 1
+        
+    #end method update
+    
+    def background(self,out=None):
+        '''
+        Returns the current background as a BGRA uint8 ndarray, written into
+        out if given, or None if no frame was added yet.
+        '''
+        
+        if self.count == 0:
+            return None
+        if out is None:
+            if self.bg is None or self.bg.shape != self.state.shape[-3:]:
+                self.bg = np.empty(self.state.shape[-3:],dtype=np.uint8)
+            out = self.bg
+        if self.mode == 'ewma':
+            np.right_shift(self.state + 128,8,out=out,casting='unsafe')
+        else:
+            n = min(self.count,self.window)
+            np.copyto(out,np.partition(self.state[:n],n//2,axis=0)[n//2])
+        return out
+    
+    #end method background
+    
+    def restore(self,state,count):
+        '''
+        Continues from ndarray state and frame count of another model of the
+        same mode (e.g. a saved SessionProfile), instead of learning the
+        background again. Raises ValueError if state does not fit this model.
+        '''
+        
+        if self.mode == 'ewma':
+            ok = state.dtype == np.uint16 and state.ndim == 3
+        else:
+            ok = state.dtype == np.uint8 and state.ndim == 4 and \
+                len(state) == self.window
+        if not ok or count < 1:
+            raise ValueError("Background state does not fit a '" + \
+                             self.mode + "' model")
+        self.reset()
+        self.state = np.array(state)
+        if self.mode == 'ewma':
+            self.tmp = np.empty(state.shape,dtype=np.int32)
+        self.count = int(count)
+    
+    #end method restore
+
+#end class BackgroundModel
+
+class ChangeDetector(object):
+    
+    def __init__(self,mode='thresh',up=1.2,down=-4.,z=6.,drift=2.,
+                 alpha_shift=5,warmup=10,min_std=.05,history=256):
+        '''
+        Streaming detector of sudden changes in a series of splash deltas,
+        at constant cost per sample. Every delta is kept in a ring of the
+        last history samples for post-mortems (see recent).
+        
+        Arguments:
+            str mode[='thresh'] - 'thresh' compares each delta to the fixed
+                thresholds up and down. 'zscore' keeps an exponentially
+                weighted running mean and variance of the deltas and fires
+                when one is more than z standard deviations off. 'cusum'
+                accumulates z-scores beyond drift in a two-sided CUSUM and
+                fires when a sum passes z. Both follow slow drift, like
+                changing light, instead of firing on it
+            float up[=1.2], down[=-4.] - fixed thresholds. Also used by the
+                statistical modes during warmup
+            float z[=6.] - z-score threshold, or CUSUM decision threshold
+            float drift[=2.] - CUSUM allowance per sample, in standard
+                deviations
+            int alpha_shift[=5] - weight of a new sample in the running
+                statistics is 2**-alpha_shift
+            int warmup[=10] - samples before the statistics are trusted
+            float min_std[=.05] - floor of the standard deviation, so that a
+                perfectly still area does not fire on the smallest change
+            int history[=256] - size of the ring of recent deltas
+        '''
+        
+        if mode not in ('thresh','zscore','cusum'):
+            raise ValueError("Invalid change detector mode '" + str(mode) + "'")
+        self.mode = mode
+        self.up, self.down = up, down
+        self.z = z
+        self.drift = drift
+        self.alpha = 2.**-alpha_shift
+        self.warmup = warmup
+        self.min_var = min_std**2
+        self.ring = np.zeros(history,dtype=np.float64)
+        self.reset()
+        
+    #end method __init__
+    
+    def reset(self):
+        '''
+        Forgets all samples.
+        '''
+        
+        self.n = 0
+        self.mean = 0.
+        self.var = 0.
+        self.cusum_up = 0.
+        self.cusum_down = 0.
+        self.score = 0. # z-score of the last sample
+        
+    #end method reset
+    
+    def update(self,delta):
+        '''
+        Adds sample delta. Returns 1 on an upward change (a splash), -1 on a
+        downward change (the bobber fading), or 0.
+        '''
+        
+        self.ring[self.n % len(self.ring)] = delta
+        self.n += 1
+        if self.mode == 'thresh' or self.n <= self.warmup:
+            change = int(delta > self.up) - int(delta < self.down)
+            if self.mode != 'thresh':
+                self._learn(delta)
+            return change
+        
+        score = (delta - self.mean)/math.sqrt(max(self.var,self.min_var))
+        self.score = score
+        if self.mode == 'zscore':
+            change = int(score > self.z) - int(score < -self.z)
+        else:
+            self.cusum_up = max(0.,self.cusum_up + score - self.drift)
+            self.cusum_down = max(0.,self.cusum_down - score - self.drift)
+            change = int(self.cusum_up > self.z) - \
+                int(self.cusum_down > self.z)
+        # changes are not learned, so a splash does not become the new normal
+        if change == 0:
+            self._learn(delta)
+        return change
+        
+    #end method update
+    
+    def _learn(self,delta):
+        '''
+        Updates the exponentially weighted mean and variance with delta.
+        '''
+        
+        if self.n == 1:
+            self.mean = delta
+            return
+        # plain running mean and variance until 1/n drops below alpha, so
+        # the first samples are not weighed against a made up zero variance
+        alpha = max(self.alpha,1./self.n)
+        diff = delta - self.mean
+        incr = alpha*diff
+        self.mean += incr
+        self.var = (1. - alpha)*(self.var + diff*incr)
+        
+    #end method _learn
+    
+    def recent(self):
+        '''
+        Returns ndarray of the last deltas added, oldest first.
+        '''
+        
+        size = len(self.ring)
+        if self.n <= size:
+            return self.ring[:self.n].copy()
+        start = self.n % size
+        return np.concatenate([self.ring[start:],self.ring[:start]])
+        
+    #end method recent
+    
+#end class ChangeDetector
@@ -0,0 +1,522 @@
+#!/usr/bin/python
+
+#Essential imports. MSS is imported when the first MSSFrameSource is made
+import time, math, contextlib
+import numpy as np
+
+def _frame_source(source):
+    '''
+    Returns a context manager yielding source, or a fresh MSSFrameSource that
+    is closed on exit if source is None.
+    '''
+
+    if source is None:
+        return MSSFrameSource()
+    return contextlib.nullcontext(source)
+
+#end function _frame_source
+
+class FrameSource(object):
+    '''
+    Base class for the screenshot backends used by BobTracker and NatPagle.
+    A frame source returns screenshots as BGRA uint8 ndarrays with shape
+    (height,width,4), and owns the clock that detection is timed against, so
+    that non-realtime sources can run faster than the wall clock.
+    '''
+
+    def grab(self,area,out=None):
+        '''
+        Returns a screenshot of area, a dict with keys 'top', 'left', 'width'
+        and 'height' in screen coordinates (same format as cap_area). If
+        ndarray out is given, the screenshot is written into it and out is
+        returned. The returned array may be a view over a buffer owned by the
+        source, so callers that hold on to a frame should pass their own out.
+        '''
+        raise NotImplementedError
+    #end method grab
+
+    def snapshot(self,area):
+        '''
+        Returns a copy of a screenshot of area that the caller owns. Meant for
+        one-off grabs, such as a full monitor screenshot.
+        '''
+        return np.array(self.grab(area))
+    #end method snapshot
+
+    def monitor(self,idx=1):
+        '''
+        Returns the area of monitor idx, as a dict in cap_area format.
+        '''
+        raise NotImplementedError
+    #end method monitor
+
+    def mark(self,event):
+        '''
+        Called with str event at points of interest, such as 'cast' right
+        after the cast key is pressed. Does nothing by default.
+        '''
+        pass
+    #end method mark
+
+    def now(self):
+        '''
+        Returns the current time in seconds.
+        '''
+        return time.time()
+    #end method now
+
+    def sleep(self,secs):
+        '''
+        Sleeps for secs seconds on this source's clock.
+        '''
+        time.sleep(secs)
+    #end method sleep
+
+    def close(self):
+        pass
+    #end method close
+
+    def __enter__(self):
+        return self
+    #end method __enter__
+
+    def __exit__(self,*exc):
+        self.close()
+    #end method __exit__
+
+#end class FrameSource
+
+class MSSFrameSource(FrameSource):
+    '''
+    Takes real screenshots using MSS. Frames are returned as zero-copy views
+    over the raw BGRA buffer of each MSS screenshot.
+    '''
+
+    def __init__(self):
+        from mss import mss # only imported once screenshots are needed
+        self.sct = mss()
+    #end method __init__
+
+    def grab(self,area,out=None):
+        shot = self.sct.grab(area)
+        frame = np.frombuffer(shot.raw,dtype=np.uint8).reshape(
+            (shot.height,shot.width,4))
+        if out is None:
+            return frame
+        np.copyto(out,frame)
+        return out
+    #end method grab
+
+    def monitor(self,idx=1):
+        return self.sct.monitors[idx]
+    #end method monitor
+
+    def close(self):
+        self.sct.close()
+    #end method close
+
+#end class MSSFrameSource
+
+class CaptureSession(FrameSource):
+
+    def __init__(self,source=None,ring_size=2,recorder=None,tracer=None):
+        '''
+        Long-lived capture session, owned by NatPagle and reused across casts.
+        Wraps another FrameSource (a new MSSFrameSource if None) and writes
+        every grab into a fixed ring of preallocated arrays, one ring per
+        frame shape, so the steady-state splash loop does no per-frame
+        allocation. A frame returned by grab stays valid for the next
+        ring_size-1 grabs of the same shape; pass out to keep one longer.
+        Every grab and mark is also passed to the optional FrameRecorder
+        recorder, which is marked 'start' on the source's clock here and
+        closed with the session, and added to the optional Tracer tracer as
+        a span or instant event.
+        
+        Arguments:
+            FrameSource source[=None] - backend to take screenshots from
+            int ring_size[=2] - number of preallocated frames per shape
+            FrameRecorder recorder[=None] - records the frames grabbed
+            Tracer tracer[=None] - traces the grabs and marks
+        '''
+        
+        self.source = MSSFrameSource() if source is None else source
+        self.ring_size = ring_size
+        self.rings = {} # (height,width) -> [list of frames, next index]
+        self.recorder = recorder
+        self.tracer = tracer
+        if recorder is not None:
+            recorder.mark('start',self.source.now())
+        
+    #end method __init__
+    
+    def grab(self,area,out=None):
+        if out is None:
+            out = self.next_buffer((int(area['height']),int(area['width'])))
+        if self.tracer is not None:
+            start = time.perf_counter()
+            frame = self.source.grab(area,out=out)
+            self.tracer.complete(
+                'grab',start,time.perf_counter()-start,cat='grab',
+                width=int(area['width']),height=int(area['height']))
+        else:
+            frame = self.source.grab(area,out=out)
+        if self.recorder is not None:
+            self.recorder.record(area,frame,self.source.now())
+        return frame
+    #end method grab
+    
+    def next_buffer(self,shape):
+        '''
+        Returns the next frame of the ring for frames of (height,width) shape.
+        Ring frames are allocated on first use.
+        '''
+        
+        ring = self.rings.setdefault(shape,[[],0])
+        frames, idx = ring
+        if len(frames) < self.ring_size:
+            frames.append(np.empty(shape + (4,),dtype=np.uint8))
+        ring[1] = (idx + 1) % self.ring_size
+        return frames[idx]
+        
+    #end method next_buffer
+    
+    def snapshot(self,area):
+        # bypass the ring, so that one-off grabs do not pin large buffers
+        return self.source.snapshot(area)
+    #end method snapshot
+    
+    def monitor(self,idx=1):
+        return self.source.monitor(idx)
+    #end method monitor
+    
+    def mark(self,event):
+        self.source.mark(event)
+        if self.tracer is not None:
+            self.tracer.instant(event)
+        if self.recorder is not None:
+            self.recorder.mark(event,self.source.now())
+    #end method mark
+    
+    def now(self):
+        return self.source.now()
+    #end method now
+    
+    def sleep(self,secs):
+        self.source.sleep(secs)
+    #end method sleep
+    
+    def close(self):
+        self.rings = {}
+        if self.recorder is not None:
+            self.recorder.close()
+        self.source.close()
+    #end method close
+    
+#end class CaptureSession
+
+class FramePacer(object):
+
+    def __init__(self,fps=60.,min_fps=5.,cpu_budget=.25,margin=1.,ramp=2.,
+                 quantiles=(.05,.95),min_bites=5,history=32):
+        '''
+        Paces the frames of the splash wait. Bites come at fairly regular
+        times after the cast, so frames are sampled slowly right after the
+        cast and at the full rate fps only in the bite window, estimated
+        online from the times of the last history bites (see record_bite).
+        Before the window, the rate ramps up from min_fps over ramp seconds
+        and is also capped so that analysis takes at most cpu_budget of a
+        core. From the start of the window on the rate stays at fps, so late
+        bites are caught as quickly as usual ones. Until min_bites bites
+        were seen, every frame runs at fps.
+
+        Arguments:
+            float fps[=60.] - frame rate in the bite window. As fast as
+                possible if None or 0
+            float min_fps[=5.] - frame rate right after the cast
+            float cpu_budget[=.25] - fraction of a core that frames outside
+                the bite window may take. No cap if None
+            float margin[=1.] - seconds the bite window is widened by
+            float ramp[=2.] - seconds over which the rate ramps up to fps
+                before the bite window
+            tuple quantiles[=(.05,.95)] - quantiles of the recent bite times
+                that bound the bite window
+            int min_bites[=5] - bites needed before the window is trusted
+            int history[=32] - number of recent bite times kept
+        '''
+
+        self.fps = fps
+        self.min_fps = min_fps
+        self.cpu_budget = cpu_budget
+        self.margin = margin
+        self.ramp = ramp
+        self.quantiles = quantiles
+        self.min_bites = min_bites
+        self.bites = np.zeros(history,dtype=np.float64) # ring of bite times
+        self.n = 0
+        self.last = None # clock time the last frame was paced to
+
+    #end method __init__
+
+    def record_bite(self,secs):
+        '''
+        Adds a bite secs seconds after the cast to the recent bite times.
+        '''
+
+        self.bites[self.n % len(self.bites)] = secs
+        self.n += 1
+
+    #end method record_bite
+
+    def window(self):
+        '''
+        Returns (start,end) of the bite window in seconds after the cast, or
+        None if fewer than min_bites bites were seen.
+        '''
+
+        if self.n < self.min_bites:
+            return None
+        lo, hi = np.quantile(self.bites[:min(self.n,len(self.bites))],
+                             self.quantiles)
+        return max(0.,lo - self.margin), hi + self.margin
+
+    #end method window
+
+    def rate(self,elapsed,cost=0.):
+        '''
+        Returns the frame rate elapsed seconds after the cast, for frames
+        that take cost seconds of CPU each. None means as fast as possible.
+        '''
+
+        window = self.window()
+        if not self.fps or window is None or elapsed >= window[0]:
+            return self.fps or None
+        # ramp up linearly to fps in the ramp seconds before the window
+        to_go = window[0] - elapsed
+        rate = self.fps - (self.fps - self.min_fps)*min(to_go/self.ramp,1.)
+        if self.cpu_budget and cost > 0:
+            rate = min(rate,self.cpu_budget/cost)
+        return max(rate,self.min_fps)
+
+    #end method rate
+
+    def start(self,now):
+        '''
+        Starts pacing a new splash wait at clock time now.
+        '''
+
+        self.last = now
+
+    #end method start
+
+    def delay(self,now,elapsed,cost=0.):
+        '''
+        Returns seconds to wait before the next frame, at clock time now,
+        elapsed seconds after the cast, when the last frame took cost
+        seconds of CPU. The frame period is counted from the last frame, so
+        time spent grabbing and analyzing is not waited again.
+        '''
+
+        rate = self.rate(elapsed,cost)
+        if rate is None or self.last is None:
+            self.last = now
+            return 0.
+        wait = max(0.,self.last + 1./rate - now)
+        self.last = now + wait
+        return wait
+
+    #end method delay
+
+#end class FramePacer
+
+class SyntheticFrameSource(FrameSource):
+
+    def __init__(self,width=1920,height=1080,bob_pos=None,bob_radius=14,
+                 appear_delay=1.,splash_delay=8.,fade_delay=None,
+                 distractors=2,water_noise=6.,light_drift=0.,fps=60.,seed=0,
+                 bob_wobble=0.):
+        '''
+        Procedural, display-free frame source. Renders animated water noise,
+        a bobber that appears at bob_pos appear_delay seconds after a 'cast'
+        mark, a splash splash_delay seconds after the cast, and distractors
+        (bright blobs, like passing players) that cross the screen. Time is
+        virtual: each grab advances the clock by 1/fps seconds, and sleep
+        advances it without sleeping, so runs are deterministic for a given
+        seed and much faster than realtime.
+
+        Arguments:
+            int width[=1920], height[=1080] - size of the virtual monitor
+            tuple bob_pos[=None] - (x,y) screen coordinates of the bobber.
+                Picked at random from the middle of the screen if None
+            int bob_radius[=14] - radius of the bobber in pixels
+            float appear_delay[=1.] - seconds between cast and bobber showing
+            float splash_delay[=8.] - seconds between cast and splash. No
+                splash if None
+            float fade_delay[=None] - seconds between cast and bobber fading
+                away. Defaults to 1.5 seconds after the splash, or 30 seconds
+                after the cast if there is no splash
+            int distractors[=2] - number of passing distractors
+            float water_noise[=6.] - amplitude of the water noise
+            float light_drift[=0.] - change of the water brightness per
+                second, like a sunset
+            float fps[=60.] - virtual frames per second
+            int seed[=0] - random seed for noise, bobber and distractors
+            float bob_wobble[=0.] - pixels the bobber drifts around bob_pos
+                on every axis, irregularly, like on rough water
+        '''
+
+        self.width, self.height = width, height
+        self.bob_radius = bob_radius
+        self.appear_delay = appear_delay
+        self.splash_delay = splash_delay
+        if fade_delay is None:
+            fade_delay = 30. if splash_delay is None else splash_delay + 1.5
+        self.fade_delay = fade_delay
+        self.water_noise = water_noise
+        self.light_drift = light_drift
+        self.fps = fps
+        rng = np.random.default_rng(seed)
+        if bob_pos is None:
+            bob_pos = (int(rng.uniform(.3,.7)*width),
+                       int(rng.uniform(.3,.7)*height))
+        self.bob_pos = bob_pos
+
+        # smoothed, periodic noise tile. Two shifted copies of it make the
+        # animated water surface
+        tile = rng.normal(0.,1.,(256,256))
+        for axis in (0,1):
+            tile = sum(np.roll(tile,i,axis=axis) for i in range(4))
+        self.tile = (tile/np.std(tile)).astype(np.float32)
+
+        # each distractor is (x0,y,vx,radius,bgr color)
+        self.distractors = [(
+            rng.uniform(0,width),
+            rng.uniform(0,height),
+            rng.choice([-1,1])*rng.uniform(60,160),
+            int(rng.integers(20,36)),
+            tuple(int(c) for c in rng.integers(150,256,3)))
+            for i in range(distractors)]
+
+        # phases of the sums of sines the bobber wobbles by
+        self.bob_wobble = bob_wobble
+        self.wobble_phases = rng.uniform(0,2*math.pi,4)
+
+        self.t = 0. # virtual clock
+        self.cast_t = None # virtual time of the last cast
+
+    #end method __init__
+
+    def mark(self,event):
+        if event == 'cast':
+            self.cast_t = self.t
+    #end method mark
+
+    def now(self):
+        return self.t
+    #end method now
+
+    def sleep(self,secs):
+        self.t += secs
+    #end method sleep
+
+    def monitor(self,idx=1):
+        return {'top': 0, 'left': 0, 'width': self.width, 'height': self.height}
+    #end method monitor
+
+    def splash_time(self):
+        '''
+        Returns the virtual time of the splash following the last cast, or
+        None if there was no cast or no splash.
+        '''
+        if self.cast_t is None or self.splash_delay is None:
+            return None
+        return self.cast_t + self.splash_delay
+    #end method splash_time
+
+    def grab(self,area,out=None):
+        frame = self.render(area,self.t,out)
+        self.t += 1./self.fps
+        return frame
+    #end method grab
+
+    def render(self,area,t,out=None):
+        '''
+        Renders the scene in area at virtual time t as a BGRA uint8 ndarray,
+        into out if given.
+        '''
+
+        top, left = int(area['top']), int(area['left'])
+        h, w = int(area['height']), int(area['width'])
+        ys = np.arange(top,top+h)
+        xs = np.arange(left,left+w)
+        n = self.tile.shape[0]
+
+        # water: two copies of the noise tile drifting in different directions
+        water = self.tile[np.ix_((ys+int(t*8))%n,(xs+int(t*5))%n)] + \
+            self.tile.T[np.ix_((ys-int(t*6))%n,(xs+int(t*3))%n)]
+        water *= self.water_noise/np.sqrt(2)
+        water += self.light_drift*t
+        frame = np.empty((h,w,4),dtype=np.uint8) if out is None else out
+        for c, base, gain in ((0,90.,1.),(1,70.,.8),(2,40.,.5)):
+            frame[:,:,c] = np.clip(base + gain*water,0,255)
+        frame[:,:,3] = 255
+
+        for x0, y, vx, r, color in self.distractors:
+            span = self.width + 4*r
+            x = (x0 + vx*t) % span - 2*r
+            self._paint_disc(frame,top,left,x,y,r,color)
+
+        if self.cast_t is not None:
+            dt = t - self.cast_t
+            bx, by = self.bob_pos
+            # bobber bobs up and down a little
+            by = by + 1.5*math.sin(2*math.pi*.6*t)
+            if self.bob_wobble:
+                p = self.wobble_phases
+                bx = bx + self.bob_wobble*(
+                    .6*math.sin(2*math.pi*.4*t+p[0]) +
+                    .4*math.sin(2*math.pi*.7*t+p[1]))
+                by = by + self.bob_wobble*(
+                    .6*math.sin(2*math.pi*.5*t+p[2]) +
+                    .4*math.sin(2*math.pi*.8*t+p[3]))
+            if self.appear_delay <= dt < self.fade_delay:
+                # white feather with a red top
+                r = self.bob_radius
+                self._paint_disc(frame,top,left,bx,by,r,(220,220,220))
+                self._paint_disc(frame,top,left,bx,by,r,(40,40,210),
+                                 top_only=True)
+            if self.splash_delay is not None and \
+               0 <= dt - self.splash_delay < 1.:
+                ds = dt - self.splash_delay
+                self._paint_disc(frame,top,left,bx,by,
+                                 2*self.bob_radius*(1+ds),(230,230,230),
+                                 alpha=.8*(1-ds))
+
+        return frame
+
+    #end method render
+
+    def _paint_disc(self,frame,top,left,cx,cy,r,color,alpha=1.,
+                    top_only=False):
+        '''
+        Alpha blends a disc of bgr color with center cx,cy and radius r
+        (screen coordinates) into frame, whose top left corner is at top,left.
+        If top_only, only the upper half of the disc is painted.
+        '''
+
+        h, w = frame.shape[:2]
+        y0, y1 = max(int(cy-r)-top,0), min(int(cy+r)+1-top,h)
+        x0, x1 = max(int(cx-r)-left,0), min(int(cx+r)+1-left,w)
+        if y0 >= y1 or x0 >= x1:
+            return
+        yy, xx = np.ogrid[y0+top:y1+top,x0+left:x1+left]
+        mask = (yy-cy)**2 + (xx-cx)**2 <= r**2
+        if top_only:
+            mask &= yy <= cy
+        patch = frame[y0:y1,x0:x1,:3]
+        px = patch[mask].astype(np.float32)
+        px += alpha*(np.array(color,dtype=np.float32) - px)
+        patch[mask] = np.clip(px,0,255)
+
+    #end method _paint_disc
+
+#end class SyntheticFrameSource
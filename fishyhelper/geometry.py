@@ -0,0 +1,176 @@
+#!/usr/bin/python
+
+#Essential imports
+import numpy as np
+
+def _as_quads(quads):
+    '''
+    Returns quads, a single quad or OpenCV polygons of four vertices, as a
+    float (N,4,2) ndarray.
+    '''
+
+    return np.asarray(quads,dtype=np.float64).reshape((-1,4,2))
+
+#end function _as_quads
+
+def quad_angles(quads):
+    '''
+    Returns (N,4) ndarray of the angles in degrees between the consecutive
+    sides of every quad in (N,4,2) ndarray quads. Angles at a side of zero
+    length are NaN.
+    '''
+
+    quads = _as_quads(quads)
+    # s1[:,i] = p[i] - p[i+1], s2[:,i] = p[i+1] - p[i+2]
+    s1 = quads - np.roll(quads,-1,axis=1)
+    s2 = np.roll(s1,-1,axis=1)
+    lower = np.linalg.norm(s1,axis=2)*np.linalg.norm(s2,axis=2)
+    dot = np.einsum('nij,nij->ni',s1,s2)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        cos = np.where(lower > 0,dot/lower,np.nan)
+    return np.degrees(np.arccos(np.clip(cos,-1.,1.)))
+
+#end function quad_angles
+
+def are_like_rects(quads,ang_range=(70,120)):
+    '''
+    Batched is_like_rect. Returns (N,) bool ndarray, True for the quads in
+    (N,4,2) ndarray quads whose angles all lie in ang_range.
+    '''
+
+    angles = quad_angles(quads)
+    # NaN compares False, so degenerate quads are never rectangle-like
+    ok = (angles >= ang_range[0]) & (angles <= ang_range[1])
+    return np.all(ok,axis=1)
+
+#end function are_like_rects
+
+def is_like_rect(points,ang_range=(70,120)):
+    '''
+    Given four points as ndarray, determines if the shape is rectangle-like
+    by calculating the angle between each of the polygon's sides.
+    '''
+
+    return bool(are_like_rects(points,ang_range)[0])
+
+#end function is_like_rect
+
+def quad_bounds(quads):
+    '''
+    Batched rect_bounds. Returns (N,4) ndarray of x_min, x_max, y_min, y_max
+    of every quad (or polygon) in (N,K,2) ndarray quads.
+    '''
+
+    quads = np.asarray(quads)
+    lo = quads.min(axis=1)
+    hi = quads.max(axis=1)
+    return np.stack([lo[:,0],hi[:,0],lo[:,1],hi[:,1]],axis=1)
+
+#end function quad_bounds
+
+def rect_bounds(pts):
+
+    x_min = np.min(pts[:,0])
+    x_max = np.max(pts[:,0])
+    y_min = np.min(pts[:,1])
+    y_max = np.max(pts[:,1])
+    return(x_min,x_max,y_min,y_max)
+
+#end function rect_bounds
+
+def pts_in_boxes(query,subjects):
+    '''
+    Batched pts_in_box. Returns (N,M) bool ndarray, True where point m of
+    (M,2) ndarray query lies strictly inside the bounding box of polygon n
+    of (N,K,2) ndarray subjects, e.g. quads or pairs of rectangle corners.
+    A single (K,2) polygon counts as N=1. Raises ValueError for other
+    shapes.
+    '''
+
+    subjects = np.asarray(subjects)
+    if subjects.ndim == 2:
+        subjects = subjects[None]
+    if subjects.ndim != 3 or subjects.shape[1] == 0 or \
+       subjects.shape[2] != 2:
+        raise ValueError("subjects must be (N,K,2) or (K,2) points, not " + \
+                         "of shape " + str(subjects.shape))
+    query = np.asarray(query)
+    if query.size == 0:
+        query = query.reshape((0,2))
+    if query.ndim != 2 or query.shape[1] != 2:
+        raise ValueError("query must be (M,2) points, not of shape " + \
+                         str(query.shape))
+    bounds = quad_bounds(subjects)[:,:,None]
+    x, y = query[None,:,0], query[None,:,1]
+    return (bounds[:,0] < x) & (x < bounds[:,1]) & \
+        (bounds[:,2] < y) & (y < bounds[:,3])
+
+#end function pts_in_boxes
+
+def pts_in_box(query,subject):
+    '''
+    Determines which pts in query lie inside rectangle defined by
+    subject
+    '''
+
+    return pts_in_boxes(query,subject)[0]
+
+#end function pts_in_box
+
+def sortquads_clockwise(quads):
+    '''
+    Batched sortpts_clockwise. Returns (N,4,2) ndarray of every quad in
+    (N,4,2) ndarray quads ordered top left, top right, bottom right, bottom
+    left.
+    '''
+
+    quads = np.asarray(quads).reshape((-1,4,2))
+    # sort on y, the top two points are then sorted on x
+    by_y = np.take_along_axis(
+        quads,np.argsort(quads[:,:,1],axis=1,kind='stable')[:,:,None],axis=1)
+    top2 = by_y[:,:2]
+    top2 = np.take_along_axis(
+        top2,np.argsort(top2[:,:,0],axis=1,kind='stable')[:,:,None],axis=1)
+    # the bottom point furthest from the top left one is the bottom right
+    bottom2 = by_y[:,2:]
+    sqdists = np.sum((bottom2 - top2[:,:1])**2,axis=2)
+    bottom2 = np.take_along_axis(
+        bottom2,np.argsort(-sqdists,axis=1,kind='stable')[:,:,None],axis=1)
+    return np.concatenate([top2,bottom2],axis=1)
+
+#end function sortquads_clockwise
+
+def sortpts_clockwise(A):
+    '''
+    Given four 2D points in array A, sorts points clockwise.
+    Taken from
+    https://stackoverflow.com/questions/30088697/4-1-2-numpy-array-sort-clockwise
+    '''
+
+    return sortquads_clockwise(A)[0]
+
+#end function sortpts_clockwise
+
+def approx_rects(quads,scale):
+    '''
+    Batched approx_rect. Returns (N,4,2) ndarray of the axis-aligned
+    rectangle approximations, scaled by scale around their center, of the
+    quads in (N,4,2) ndarray quads (or OpenCV polygons of four vertices).
+    '''
+
+    quads = _as_quads(quads)
+    cent = np.mean(quads,axis=1,keepdims=True)
+    to_cent_vect = scale*(quads - cent)
+    to_cent_mean = np.mean(np.abs(to_cent_vect),axis=1,keepdims=True)
+    return np.sign(to_cent_vect)*to_cent_mean + cent
+
+#end function approx_rects
+
+def approx_rect(poly,scale):
+    '''
+    Given polygon with four vertices poly, returns a rectangle approximation.
+    '''
+
+    return approx_rects(poly,scale)[0]
+
+#end function approx_rect
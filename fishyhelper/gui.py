@@ -0,0 +1,262 @@
+#!/usr/bin/python
+
+#Essential imports. OpenCV is imported when the GUI is first shown
+import numpy as np
+
+def show_img(img):
+    '''
+    Dev function to show image
+    '''
+    
+    import cv2
+    cv2.imshow('image',img)
+    cv2.waitKey()
+    cv2.destroyAllWindows()
+    
+#end function show_img
+
+class GUIParamSet(object):
+    '''
+    Requires OpenCV (cv2 module)
+    '''
+    
+    def __init__(self,og_sct,max_size=1600):
+        '''
+        Responsible for retrieving params from the user via OpenCV GUI.
+        
+        Arguments:
+            cv2.img og_sct - OpenCV (cv2) type image to display in GUI screen
+            int max_size[=1600] - longest side in pixels of the image shown.
+                Bigger images (e.g. HiDPI screenshots) are shown downscaled,
+                and the rectangle is mapped back to og_sct coordinates
+        '''
+        
+        self.og_sct = og_sct
+        self.max_size = max_size
+        self.usr_rect = ((0,0),(0,0)) #rectangle defined by the user
+        self.window_text = 'HereFishy  |  Select bobber...'
+        
+        #messages displayed in each view
+        self.nozoom_txt = [
+            "Please inscribe bobber in as tight a box as possible",
+            "Mouse=select box  [Esc]=close  [Enter]=accept box",
+            "[z]=zoom to box  [shift+z]=reset zoom"]
+        self.zoom_txt = "zoom mode: shift+z to reset"
+        
+        
+    #end function __init__
+    
+    def _preview(self,img,sc):
+        '''
+        Returns img downscaled by factor sc (>= 1), for display.
+        '''
+        
+        import cv2
+        if sc <= 1.:
+            return img
+        h, w = img.shape[:2]
+        return cv2.resize(
+            img,(max(1,int(round(w/sc))),max(1,int(round(h/sc)))),
+            interpolation=cv2.INTER_AREA)
+        
+    #end method _preview
+    
+    def _draw(self,rect,color):
+        '''
+        Erases the last rectangle drawn on self.temp_sct and draws rect
+        ((x0,x1),(y0,y1)) in color instead. Only the pixels under the two
+        outlines are touched, not the whole image.
+        '''
+        
+        import cv2
+        if self.shown_rect is not None:
+            ((x0,x1),(y0,y1)) = self.shown_rect
+            h, w = self.sct.shape[:2]
+            x0, x1 = sorted((min(max(x0,0),w-1),min(max(x1,0),w-1)))
+            y0, y1 = sorted((min(max(y0,0),h-1),min(max(y1,0),h-1)))
+            for ys, xs in (
+                    (slice(y0,y0+1),slice(x0,x1+1)),
+                    (slice(y1,y1+1),slice(x0,x1+1)),
+                    (slice(y0,y1+1),slice(x0,x0+1)),
+                    (slice(y0,y1+1),slice(x1,x1+1))):
+                self.temp_sct[ys,xs] = self.sct[ys,xs]
+        ((x0,x1),(y0,y1)) = rect
+        cv2.rectangle(self.temp_sct,(x0,y0),(x1,y1),color,1)
+        self.shown_rect = rect
+        self.dirty = True
+        
+    #end method _draw
+    
+    @staticmethod
+    def view_to_full(rect,sc,pt=(0,0)):
+        '''
+        Maps rect ((x0,x1),(y0,y1)) drawn on a view that shows self.og_sct
+        scaled down by sc and translated by pt (the og_sct coordinates of
+        the view's top left corner) to og_sct coordinates. Returns list of
+        lists ((x_min,x_max),(y_min,y_max)) of ints.
+        '''
+        
+        no_xform = np.array([sorted(x) for x in rect])
+        return [[int(round(v)) for v in x]
+                for x in (no_xform*sc) + np.array(pt)[:,None]]
+        
+    #end method view_to_full
+    
+    @staticmethod
+    def full_to_view(rect,sc,pt=(0,0)):
+        '''
+        Inverse of view_to_full. Maps rect ((x_min,x_max),(y_min,y_max)) in
+        og_sct coordinates to the view, and returns it as tuple of tuples of
+        ints.
+        '''
+        
+        no_xform = (np.array(rect,dtype=np.float64) - np.array(pt)[:,None])/sc
+        return tuple(tuple(int(round(v)) for v in x) for x in no_xform)
+        
+    #end method full_to_view
+    
+    def get_usr_rect(self):
+        '''
+        Instantiates OpenCV GUI window with self.og_sct image. Tracks the
+        rectangle that the user draws, and changes self.usr_rect with every
+        mouse up event. Returns self.usr_rect as tuple of tuples.
+        
+        Arguments:
+            none
+        Returns:
+            tuple self.usr_rect - tuple of tuples defining the rectangle drawn
+                by user. Formatted as ((x_min,x_max),(y_min,y_max)).
+        '''
+        
+        import cv2
+        
+        def draw_rect(event,x,y,flags,param):
+            '''
+            Mouse callback function
+            '''
+            if event == cv2.EVENT_LBUTTONDOWN:
+                self.drawing = True
+                self.ix,self.iy = x,y
+            elif event == cv2.EVENT_MOUSEMOVE:
+                if self.drawing == True:
+                    self._draw(((self.ix,x),(self.iy,y)),(200,200,200))
+            elif event == cv2.EVENT_LBUTTONUP:
+                self.drawing = False
+                self._draw(((self.ix,x),(self.iy,y)),(0,255,0))
+                self.temp_rect = ((self.ix,x),(self.iy,y))
+        #end function draw_rect
+        
+        def add_text(img,text,pos=(20,50)):
+            '''
+            Adds black str text to top left corner of img. Copies img and
+            returns modified img with text.
+            '''
+            
+            img_mod = np.copy(img)
+            if type(text) == str:
+                text = [text]
+            elif type(text) == list:
+                pass
+            else:
+                raise TypeError("Invalid str type")
+            x, y = pos
+            for line in text:
+                cv2.putText(
+                    img_mod,line,(x,y),cv2.FONT_HERSHEY_SIMPLEX,1, (255,255,255),2)
+                y += 40
+            return img_mod
+        #end function show_text
+        
+        def show(img):
+            '''
+            Makes img the view, with nothing drawn on it yet.
+            '''
+            
+            self.sct = img
+            self.temp_sct = np.copy(self.sct)
+            self.shown_rect = None
+            self.dirty = True
+        #end function show
+        
+        #Transform values from the view to self.og_sct. These are applied to
+        #self.usr_rect upon ENTER keypress. xform_sc is the x and y scaling
+        #factors, and xform_pt the translation. Big images are shown
+        #downscaled by preview_sc
+        h, w = self.og_sct.shape[:2]
+        preview_sc = max(1.,max(h,w)/self.max_size)
+        xform_sc = preview_sc
+        xform_pt = (0,0)
+        
+        #Initialization attrs
+        nozoom_sct = add_text(
+            self._preview(self.og_sct,preview_sc),self.nozoom_txt)
+        show(nozoom_sct) #downscaled copy of original image with txt
+        view_h, view_w = self.sct.shape[:2]
+        self.temp_rect = self.full_to_view(self.usr_rect,preview_sc) #in view
+        self.drawing = False # true if mouse is pressed
+        self.ix,self.iy = -1,-1 # initial rectangle origin
+        zoomed = False #true if z has been pressed
+        
+        #Instantiate window and track keypresses. Redraws only after events,
+        #and sleeps in waitKey (which also runs the mouse callback) otherwise
+        cv2.namedWindow(self.window_text)
+        cv2.setMouseCallback(self.window_text,draw_rect)
+        while(1):
+            if self.dirty:
+                cv2.imshow(self.window_text,self.temp_sct)
+                self.dirty = False
+            k = cv2.waitKey(20) & 0xFF
+            if k == 27: #esc key
+                print("Set param cancelled")
+                break
+            elif k == 255: #no keypress
+                if cv2.getWindowProperty(
+                        self.window_text,cv2.WND_PROP_VISIBLE) < 1:
+                    print("Set param cancelled")
+                    break
+            elif k == 13: #enter key
+                #add scaling and translation vectors
+                self.usr_rect = self.view_to_full(
+                    self.temp_rect,xform_sc,xform_pt)
+                print("Rectangle drawn at " + str(self.usr_rect))
+                break
+            elif k == ord('z'): #z key for zoom
+                if self.temp_rect == ((0,0),(0,0)):
+                    print("No rectangle to zoom on!")
+                    continue
+                if zoomed == True:
+                    print("Can only zoom once. shift+z to reset zoom")
+                    continue
+                #Get translation transform, in og_sct coordinates
+                ((x_min,x_max),(y_min,y_max)) = self.view_to_full(
+                    self.temp_rect,xform_sc,xform_pt)
+                if x_max <= x_min or y_max <= y_min:
+                    print("No rectangle to zoom on!")
+                    continue
+                xform_pt = (x_min,y_min)
+                #Get scaling transform, so the box fills the view
+                xform_sc = min([(x_max-x_min)/view_w,(y_max-y_min)/view_h])
+                #resize cropped image, zooming by xform_sc in both x and y dims
+                zoom_sct = cv2.resize(
+                    self.og_sct[y_min:y_max,x_min:x_max],
+                    None,
+                    fx=(1/xform_sc),
+                    fy=(1/xform_sc),
+                    interpolation=cv2.INTER_LINEAR)
+                show(add_text(zoom_sct,self.zoom_txt)) #add zoomed text
+                self.temp_rect = ((0,0),(0,0))
+                zoomed = True
+            elif k == 90: #shift+z to reset zoom
+                zoomed = False
+                show(nozoom_sct)
+                xform_sc = preview_sc
+                xform_pt = (0,0)
+                #the last accepted rectangle, mapped back into the view
+                self.temp_rect = self.full_to_view(
+                    self.usr_rect,xform_sc,xform_pt)
+        cv2.destroyAllWindows()
+        return self.usr_rect
+        
+    #end method get_usr_rect
+    
+#end class GUIParamSet
@@ -0,0 +1,262 @@
+#!/usr/bin/python
+
+#Essential imports
+import time, os
+import numpy as np
+
+class ParamTracker(object):
+    
+    # one fixed-width record per cast. The *_thresh, probe and mode columns
+    # are the params in use, so that casts can be grouped by them
+    dtype = np.dtype([
+        ('time','f8'),            # time of the cast, on the source's clock
+        ('outcome','u1'),         # index into ParamTracker.outcomes
+        ('search_ms','f4'),       # time spent in search_bob
+        ('hits','u2'),            # verified probe hits
+        ('blobs','u1'),           # blobs the hits formed
+        ('bob_x','i2'),           # bobber position, -1 if not found
+        ('bob_y','i2'),
+        ('wait_s','f4'),          # time from cast to the splash outcome
+        ('splash_frames','u4'),   # splash area frames analyzed
+        ('splash_min','f4'),      # min, max, mean and last splash delta
+        ('splash_max','f4'),
+        ('splash_mean','f4'),
+        ('splash_last','f4'),
+        ('bob_color_diff','f4'),
+        ('splash_diff_thresh','f4'),
+        ('bob_fade_thresh','f4'),
+        ('bob_track_probe','u2'),
+        ('splash_radius','u2'),
+        ('sct_check_iters','u1'),
+        ('search_mode','u1'),     # index into ParamTracker.search_modes
+        ('reduce_stride','u1')])
+    
+    outcomes = ('unknown','no_bobber','splash','faded','timeout')
+    search_modes = ('probe','integral','pyramid')
+    
+    # cast log file header: magic and record size
+    magic = b'HFCASTS1'
+    header_size = 16
+    
+    def __init__(self,params,path=None):
+        '''
+        In charge of logging and relaying cast history, as well as recommending
+        parameters based on previous successes. Every cast is one record of
+        ParamTracker.dtype. Records are appended to the binary file at path
+        (UD param cast_log if None), which is opened on the first cast, and
+        read back as a memory-mapped structured array, so even months of
+        casts stay small and quick to aggregate. With no path at all,
+        history is kept in memory only. Times are those passed in by the
+        caller, on one clock, e.g. the frame source's.
+        '''
+        
+        self.params = params
+        self.path = path if path is not None else params.get('cast_log',None)
+        
+        # record of the cast in progress, None between casts
+        self.cur = None
+        
+        # in-memory history when there is no file
+        self._mem = np.zeros(64,dtype=self.dtype)
+        self._n = 0
+        
+        self._file = None
+        
+    #end method __init__
+    
+    def _open(self):
+        '''
+        Opens the cast log file at self.path for appending, writing its
+        header if it is new. Raises ValueError if it is not a cast log of
+        this version.
+        '''
+        
+        if self._file is None and self.path:
+            self._file = open(self.path,'ab+')
+            self._file.seek(0)
+            header = self._file.read(self.header_size)
+            if len(header) == 0:
+                self._file.write(self.magic + np.uint32(
+                    self.dtype.itemsize).tobytes().ljust(8,b'\0'))
+                self._file.flush()
+            elif header[:8] != self.magic or np.frombuffer(
+                    header[8:12],dtype=np.uint32)[0] != self.dtype.itemsize:
+                self._file.close()
+                self._file = None
+                raise ValueError("'" + self.path + "' is not a cast log " + \
+                                 "of this version of HereFishy")
+        
+    #end method _open
+    
+    def log_cast(self,t=None):
+        '''
+        Starts the record of a new cast, cast at time t (now if None).
+        '''
+        
+        self._open()
+        params = self.params
+        if t is None:
+            t = time.time()
+        rec = np.zeros((),dtype=self.dtype)
+        rec['time'] = t
+        rec['bob_x'] = rec['bob_y'] = -1
+        rec['bob_color_diff'] = params['bob_color_diff']
+        rec['splash_diff_thresh'] = params['splash_diff_thresh']
+        rec['bob_fade_thresh'] = params['bob_fade_thresh']
+        rec['bob_track_probe'] = params['bob_track_probe']
+        rec['splash_radius'] = params['splash_radius']
+        rec['sct_check_iters'] = params['sct_check_iters']
+        mode = params.get('bob_search_mode','probe')
+        rec['search_mode'] = self.search_modes.index(mode) \
+            if mode in self.search_modes else 0
+        rec['reduce_stride'] = params.get('reduce_stride',1)
+        self.cur = rec
+        self.cast_t = t
+        # running splash delta summary, kept as floats until the outcome
+        self.deltas = [0,float('inf'),float('-inf'),0.,0.]
+        
+    #end method log_cast
+    
+    def log_find_bob(self,search_secs,hits,blobs,loc,t=None):
+        '''
+        Logs the result of search_bob: time spent, number of verified hits
+        and blobs, and bobber location loc (or None if no bobber was found,
+        which ends the cast at time t, now if None).
+        '''
+        
+        if self.cur is None:
+            self.log_cast(t)
+        rec = self.cur
+        rec['search_ms'] = 1e3*search_secs
+        rec['hits'] = min(hits,np.iinfo(np.uint16).max)
+        rec['blobs'] = min(blobs,np.iinfo(np.uint8).max)
+        if loc:
+            rec['bob_x'], rec['bob_y'] = int(round(loc[0])), int(round(loc[1]))
+        else:
+            self.log_splash_detect('no_bobber',t)
+        
+    #end method log_find_bob
+    
+    def log_splash_delta(self,delta):
+        '''
+        Logs the splash delta of one frame of the splash area.
+        '''
+        
+        d = self.deltas
+        d[0] += 1
+        d[1] = min(d[1],delta)
+        d[2] = max(d[2],delta)
+        d[3] += delta
+        d[4] = delta
+        
+    #end method log_splash_delta
+    
+    def log_splash_detect(self,outcome,t=None):
+        '''
+        Ends the cast in progress with outcome (one of ParamTracker.outcomes)
+        at time t (now if None), and appends its record to the history.
+        '''
+        
+        if self.cur is None:
+            return
+        rec = self.cur
+        rec['outcome'] = self.outcomes.index(outcome)
+        rec['wait_s'] = (time.time() if t is None else t) - self.cast_t
+        n, lo, hi, total, last = self.deltas
+        if n > 0:
+            rec['splash_frames'] = n
+            rec['splash_min'], rec['splash_max'] = lo, hi
+            rec['splash_mean'] = total/n
+            rec['splash_last'] = last
+        self._append(rec)
+        self.cur = None
+        
+    #end method log_splash_detect
+    
+    def _append(self,rec):
+        '''
+        Appends record rec to the cast log file, or to the in-memory history.
+        '''
+        
+        if self._file is not None:
+            self._file.write(rec.tobytes())
+            self._file.flush()
+            return
+        if self._n == len(self._mem):
+            self._mem = np.concatenate([self._mem,np.zeros_like(self._mem)])
+        self._mem[self._n] = rec
+        self._n += 1
+        
+    #end method _append
+    
+    def history(self):
+        '''
+        Returns structured array of ParamTracker.dtype with one record per
+        logged cast, oldest first. From a cast log file, this is a read-only
+        memory map, so only the columns used are read from disk.
+        '''
+        
+        if not self.path:
+            return self._mem[:self._n]
+        if not os.path.exists(self.path):
+            return np.zeros(0,dtype=self.dtype)
+        n = (os.path.getsize(self.path) - self.header_size) // \
+            self.dtype.itemsize
+        if n <= 0:
+            return np.zeros(0,dtype=self.dtype)
+        return np.memmap(self.path,dtype=self.dtype,mode='r',
+                         offset=self.header_size,shape=(n,))
+        
+    #end method history
+    
+    def summary(self,by=('bob_color_diff','splash_diff_thresh')):
+        '''
+        Aggregates the history per combination of the param columns in by.
+        Returns list of dicts with the param values, the number of casts, the
+        fraction of them per outcome, and the mean search_ms and wait_s,
+        most casts first.
+        '''
+        
+        hist = self.history()
+        if len(hist) == 0:
+            return []
+        keys, inv = np.unique(
+            hist[list(by)],return_inverse=True)
+        inv = inv.ravel()
+        casts = np.bincount(inv,minlength=len(keys))
+        per_outcome = np.bincount(
+            inv*len(self.outcomes) + hist['outcome'],
+            minlength=len(keys)*len(self.outcomes)).reshape(
+            (len(keys),len(self.outcomes)))
+        search_ms = np.bincount(inv,weights=hist['search_ms'],
+                                minlength=len(keys))/casts
+        wait_s = np.bincount(inv,weights=hist['wait_s'],
+                             minlength=len(keys))/casts
+        rows = []
+        for i in np.argsort(-casts,kind='stable'):
+            # float32 columns are rounded back to the params they came from
+            row = {name: round(keys[i][name].item(),6)
+                   if keys[i][name].dtype.kind == 'f' else keys[i][name].item()
+                   for name in by}
+            row['casts'] = int(casts[i])
+            for j, outcome in enumerate(self.outcomes):
+                row[outcome] = float(per_outcome[i,j]/casts[i])
+            row['search_ms'] = float(search_ms[i])
+            row['wait_s'] = float(wait_s[i])
+            rows.append(row)
+        return rows
+        
+    #end method summary
+    
+    def close(self):
+        '''
+        Closes the cast log file.
+        '''
+        
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        
+    #end method close
+    
+#end class ParamTracker
@@ -0,0 +1,363 @@
+#!/usr/bin/python
+
+#Essential imports. Quartz is imported when the first MacMouser is made
+import time
+
+class Mouser(object):
+    '''
+    Interface of the input backends (MacMouser, WinMouser, NullMouser,
+    RecordingMouser). Subclasses post mousemove, leftclick, rightclick,
+    keydown and keyup; presskey, shiftrightclick and loot are built from
+    those. Time comes from an optional clock with now() and sleep(secs),
+    e.g. the FrameSource that frames are grabbed from, so that input
+    deadlines can be measured from frame timestamps. Wall clock time if
+    None.
+    '''
+    
+    # key code of the shift key
+    shift_key = 0x38
+    
+    def __init__(self,clock=None):
+        self.clock = clock
+    #end method __init__
+    
+    def mousemove(self,posx,posy):
+        raise NotImplementedError
+    #end method mousemove
+    
+    def leftclick(self,posx,posy):
+        raise NotImplementedError
+    #end method leftclick
+    
+    def rightclick(self,posx,posy):
+        raise NotImplementedError
+    #end method rightclick
+    
+    def keydown(self,code):
+        raise NotImplementedError
+    #end method keydown
+    
+    def keyup(self,code):
+        raise NotImplementedError
+    #end method keyup
+    
+    def now(self):
+        '''
+        Returns the current time in seconds, on the clock.
+        '''
+        return time.time() if self.clock is None else self.clock.now()
+    #end method now
+    
+    def sleep_until(self,deadline):
+        '''
+        Sleeps until time deadline on the clock. Returns right away if it
+        has passed.
+        '''
+        delay = deadline - self.now()
+        if delay > 0:
+            if self.clock is None:
+                time.sleep(delay)
+            else:
+                self.clock.sleep(delay)
+    #end method sleep_until
+    
+    def presskey(self,code,speed=0.1):
+        '''
+        Presses key with arg code, holding it down for speed seconds.
+        '''
+        
+        start = self.now()
+        self.keydown(code)
+        self.sleep_until(start + speed)
+        self.keyup(code)
+        
+    #end method presskey
+    
+    def shiftrightclick(self,posx,posy,speed=0.1):
+        '''
+        Shift right clicks at posx,posy. Shift goes down speed seconds before
+        the click and comes up speed seconds after it.
+        '''
+        
+        start = self.now()
+        self.keydown(self.shift_key)
+        self.sleep_until(start + speed)
+        self.rightclick(posx,posy)
+        self.sleep_until(start + 2*speed)
+        self.keyup(self.shift_key)
+        
+    #end method shiftrightclick
+    
+    def loot(self,posx,posy,start,move_delay=.4,click_delay=.8,speed=0.1):
+        '''
+        Loots the bobber at posx,posy: moves the mouse there move_delay
+        seconds after time start (the splash frame's timestamp) and shift
+        right clicks it click_delay seconds after start, with shift held
+        speed seconds around the click. Every step is scheduled against its
+        own deadline from start, so time lost before or during the sequence
+        is caught up instead of adding up. Returns the latency from start to
+        the click in seconds.
+        '''
+        
+        self.sleep_until(start + move_delay)
+        self.mousemove(posx,posy)
+        self.sleep_until(start + click_delay - speed)
+        self.keydown(self.shift_key)
+        self.sleep_until(start + click_delay)
+        self.rightclick(posx,posy)
+        latency = self.now() - start
+        self.sleep_until(start + click_delay + speed)
+        self.keyup(self.shift_key)
+        return latency
+        
+    #end method loot
+    
+#end class Mouser
+
+class MacMouser(Mouser):
+    '''
+    Handles mouse events on Mac OS X. Developed and tested on OS X 10.11
+    '''
+    
+    def __init__(self,clock=None):
+        Mouser.__init__(self,clock)
+        # Quartz CoreGraphics, only imported once a MacMouser is needed
+        import Quartz.CoreGraphics
+        self.cg = Quartz.CoreGraphics
+    #end method __init__
+    
+    def mouseEvent(self,evt_type,posx,posy):
+        cg = self.cg
+        theEvent = cg.CGEventCreateMouseEvent(
+            None,
+            evt_type,
+            (posx,posy),
+            cg.kCGMouseButtonLeft)
+        cg.CGEventPost(cg.kCGHIDEventTap, theEvent)
+    #end method mouseEvent
+    
+    def mousemove(self,posx,posy):
+        self.mouseEvent(self.cg.kCGEventMouseMoved, posx,posy)
+    #end method mousemove
+    
+    def leftclick(self,posx,posy):
+        # uncomment this line if you want to force the mouse 
+        # to MOVE to the click location first (I found it was not necessary).
+        self.mouseEvent(self.cg.kCGEventMouseMoved, posx,posy)
+        self.mouseEvent(self.cg.kCGEventLeftMouseDown, posx,posy)
+        self.mouseEvent(self.cg.kCGEventLeftMouseUp, posx,posy)
+    #end method leftclick
+    
+    def rightclick(self,posx,posy):
+        # uncomment this line if you want to force the mouse 
+        # to MOVE to the click location first (I found it was not necessary).
+        self.mouseEvent(self.cg.kCGEventMouseMoved, posx,posy)
+        self.mouseEvent(self.cg.kCGEventRightMouseDown, posx,posy)
+        self.mouseEvent(self.cg.kCGEventRightMouseUp, posx,posy)
+    #end method rightclick
+    
+    def keydown(self,code):
+        cg = self.cg
+        cg.CGEventPost(cg.kCGHIDEventTap,
+                       cg.CGEventCreateKeyboardEvent(None, code, True))
+    #end method keydown
+    
+    def keyup(self,code):
+        cg = self.cg
+        cg.CGEventPost(cg.kCGHIDEventTap,
+                       cg.CGEventCreateKeyboardEvent(None, code, False))
+    #end method keyup
+    
+    # old/dev functions
+    def _dev_get_pos(self):
+        '''
+        Returns (x,y) current position of the mouse using pyautogui.
+        '''
+        import pyautogui
+        return pyautogui.position()
+    #end method get_pos
+    
+    def _old_shiftrightclick(self,posx,posy):
+        '''
+        Shift right clicks using pyautogui.
+        '''
+        
+        import pyautogui
+        pyautogui.keyDown('shift')
+        pyautogui.press('right')
+        pyautogui.keyUp('shift')
+        
+    #end method _old_shiftrightclick
+    
+#end class MacMouser
+
+class WinMouser(Mouser):
+    '''
+    Handles mouse events on Windows 10. Developed and tested on Windows
+    10.*******
+    '''
+    
+    def get_pos(self):
+        '''
+        Returns (x,y) current position of the mouse using pyautogui.
+        '''
+        #return pyautogui.position()
+        pass
+    #end method get_pos
+    
+    def mousemove(self,posx,posy):
+        pass
+        #self.mouseEvent(self.cg.kCGEventMouseMoved, posx,posy)
+    #end method mousemove
+    
+    def leftclick(self,posx,posy):
+        pass
+    #end method leftclick
+    
+    def rightclick(self,posx,posy):
+        pass
+    #end method rightclick
+    
+#end class MacMouser
+
+class NullMouser(Mouser):
+    '''
+    Mouser that does nothing. Used to run HereFishy headless, e.g. against a
+    SyntheticFrameSource on a machine without a display.
+    '''
+    
+    def mousemove(self,posx,posy):
+        pass
+    #end method mousemove
+    
+    def leftclick(self,posx,posy):
+        pass
+    #end method leftclick
+    
+    def rightclick(self,posx,posy):
+        pass
+    #end method rightclick
+    
+    def keydown(self,code):
+        pass
+    #end method keydown
+    
+    def keyup(self,code):
+        pass
+    #end method keyup
+    
+    def shiftrightclick(self,posx,posy,speed=0.1):
+        pass
+    #end method shiftrightclick
+    
+    def presskey(self,code,speed=0.1):
+        pass
+    #end method presskey
+    
+#end class NullMouser
+
+class RecordingMouser(Mouser):
+    '''
+    Mouser that posts nothing but records every event with its timestamp on
+    the clock, as tuples (t,event,args...) in self.events. Runs headless, so
+    input timing can be checked in benchmarks, e.g. with the
+    SyntheticFrameSource being analyzed as the clock.
+    '''
+    
+    def __init__(self,clock=None):
+        Mouser.__init__(self,clock)
+        self.events = []
+    #end method __init__
+    
+    def mousemove(self,posx,posy):
+        self.events.append((self.now(),'mousemove',posx,posy))
+    #end method mousemove
+    
+    def leftclick(self,posx,posy):
+        self.events.append((self.now(),'leftclick',posx,posy))
+    #end method leftclick
+    
+    def rightclick(self,posx,posy):
+        self.events.append((self.now(),'rightclick',posx,posy))
+    #end method rightclick
+    
+    def keydown(self,code):
+        self.events.append((self.now(),'keydown',code))
+    #end method keydown
+    
+    def keyup(self,code):
+        self.events.append((self.now(),'keyup',code))
+    #end method keyup
+    
+    def last(self,event):
+        '''
+        Returns the timestamp of the last recorded event, or None.
+        '''
+        for evt in reversed(self.events):
+            if evt[1] == event:
+                return evt[0]
+        return None
+    #end method last
+    
+#end class RecordingMouser
+
+class LockedMouser(Mouser):
+    
+    def __init__(self,mouser,lock):
+        '''
+        Wraps mouser so that every input it posts holds lock, a
+        multiprocessing.RLock shared by all sessions of a FishingSupervisor.
+        loot holds it from moving to the bobber to clicking it, so that no
+        other session's input lands in between.
+        '''
+        
+        Mouser.__init__(self,mouser.clock)
+        self.mouser = mouser
+        self.lock = lock
+        
+    #end method __init__
+    
+    def mousemove(self,posx,posy):
+        with self.lock:
+            self.mouser.mousemove(posx,posy)
+    #end method mousemove
+    
+    def leftclick(self,posx,posy):
+        with self.lock:
+            self.mouser.leftclick(posx,posy)
+    #end method leftclick
+    
+    def rightclick(self,posx,posy):
+        with self.lock:
+            self.mouser.rightclick(posx,posy)
+    #end method rightclick
+    
+    def keydown(self,code):
+        with self.lock:
+            self.mouser.keydown(code)
+    #end method keydown
+    
+    def keyup(self,code):
+        with self.lock:
+            self.mouser.keyup(code)
+    #end method keyup
+    
+    def shiftrightclick(self,posx,posy,speed=0.1):
+        with self.lock:
+            self.mouser.shiftrightclick(posx,posy,speed)
+    #end method shiftrightclick
+    
+    def presskey(self,code,speed=0.1):
+        with self.lock:
+            self.mouser.presskey(code,speed)
+    #end method presskey
+    
+    def loot(self,posx,posy,start,move_delay=.4,click_delay=.8,speed=0.1):
+        # hold the lock from the move to the click, but not while waiting
+        self.sleep_until(start + move_delay)
+        with self.lock:
+            return self.mouser.loot(
+                posx,posy,start,move_delay,click_delay,speed)
+    #end method loot
+    
+#end class LockedMouser
@@ -0,0 +1,190 @@
+#!/usr/bin/python
+
+#Essential imports
+import time, os, json, bisect, contextlib
+
+class Metrics(object):
+    
+    # upper bounds in seconds of the histogram buckets, roughly 2.5x apart.
+    # Covers a fraction of a millisecond for frame analysis up to the
+    # longest splash wait
+    buckets = (
+        .0001,.00025,.0005,.001,.0025,.005,.01,.025,.05,.1,.25,.5,
+        1.,2.5,5.,10.,25.,60.)
+    
+    def __init__(self,path=None,interval=60.,tracer=None):
+        '''
+        Streaming timing histograms and counters of the fishing loop. Time
+        stages with timer(), count events with inc(), and call
+        maybe_export() regularly to write everything to the file at path
+        every interval seconds. Files ending in '.prom' are written in the
+        Prometheus text format (e.g. for the node_exporter textfile
+        collector), anything else as JSON. With no path, metrics are only
+        kept in memory (see snapshot). Every observed duration is also added
+        as a span, ending now, to the optional Tracer tracer.
+        '''
+        
+        self.path = path
+        self.tracer = tracer
+        self.interval = interval
+        self.start = time.time()
+        self.last_export = time.perf_counter()
+        
+        # stage -> [bucket counts (last one is +Inf),sum,max]
+        self.stages = {}
+        # counter name -> count
+        self.counters = {}
+        
+    #end method __init__
+    
+    def observe(self,stage,secs):
+        '''
+        Adds a duration of secs seconds to the histogram of stage.
+        '''
+        
+        if self.tracer is not None:
+            self.tracer.complete(stage,time.perf_counter()-secs,secs)
+        hist = self.stages.get(stage,None)
+        if hist is None:
+            hist = self.stages[stage] = [[0]*(len(self.buckets)+1),0.,0.]
+        hist[0][bisect.bisect_left(self.buckets,secs)] += 1
+        hist[1] += secs
+        if secs > hist[2]:
+            hist[2] = secs
+        
+    #end method observe
+    
+    @contextlib.contextmanager
+    def timer(self,stage):
+        '''
+        Context manager that observes the wall time spent in it as stage.
+        '''
+        
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage,time.perf_counter()-start)
+        
+    #end method timer
+    
+    def inc(self,counter,n=1):
+        '''
+        Adds n to counter.
+        '''
+        
+        self.counters[counter] = self.counters.get(counter,0) + n
+        
+    #end method inc
+    
+    def quantile(self,stage,q):
+        '''
+        Estimates quantile q (0 to 1) of stage by interpolating within its
+        histogram buckets, like Prometheus' histogram_quantile.
+        '''
+        
+        counts, total, top = self.stages[stage]
+        n = sum(counts)
+        rank = q*n
+        seen = 0
+        for i, count in enumerate(counts):
+            if count > 0 and seen + count >= rank:
+                lo = self.buckets[i-1] if i > 0 else 0.
+                hi = self.buckets[i] if i < len(self.buckets) else top
+                return min(lo + (hi-lo)*(rank-seen)/count,top)
+            seen += count
+        return top
+        
+    #end method quantile
+    
+    def snapshot(self):
+        '''
+        Returns dict of all counters, and count, sum, mean, max, estimated
+        percentiles and cumulative buckets of every stage.
+        '''
+        
+        stages = {}
+        for stage, (counts, total, top) in self.stages.items():
+            n = sum(counts)
+            cum = 0
+            buckets = []
+            for le, count in zip(self.buckets + ('+Inf',),counts):
+                cum += count
+                buckets.append([le,cum])
+            stages[stage] = {
+                'count': n,
+                'sum': total,
+                'mean': total/n if n else 0.,
+                'max': top,
+                'p50': self.quantile(stage,.5),
+                'p90': self.quantile(stage,.9),
+                'p99': self.quantile(stage,.99),
+                'buckets': buckets}
+        return {
+            'time': time.time(),
+            'uptime': time.time() - self.start,
+            'counters': dict(self.counters),
+            'stages': stages}
+        
+    #end method snapshot
+    
+    def prometheus(self):
+        '''
+        Returns all metrics in the Prometheus text exposition format.
+        '''
+        
+        snap = self.snapshot()
+        lines = [
+            '# HELP herefishy_uptime_seconds Time since HereFishy started.',
+            '# TYPE herefishy_uptime_seconds gauge',
+            'herefishy_uptime_seconds ' + repr(snap['uptime'])]
+        for name, count in sorted(snap['counters'].items()):
+            lines.append('# TYPE herefishy_' + name + '_total counter')
+            lines.append('herefishy_' + name + '_total ' + str(count))
+        lines.append('# HELP herefishy_stage_seconds Wall time per stage.')
+        lines.append('# TYPE herefishy_stage_seconds histogram')
+        for stage, stats in sorted(snap['stages'].items()):
+            label = 'stage="' + stage + '"'
+            for le, cum in stats['buckets']:
+                lines.append('herefishy_stage_seconds_bucket{' + label + \
+                             ',le="' + str(le) + '"} ' + str(cum))
+            lines.append('herefishy_stage_seconds_sum{' + label + '} ' + \
+                         repr(stats['sum']))
+            lines.append('herefishy_stage_seconds_count{' + label + '} ' + \
+                         str(stats['count']))
+        return '\n'.join(lines) + '\n'
+        
+    #end method prometheus
+    
+    def export(self):
+        '''
+        Writes all metrics to self.path, replacing the file atomically so
+        readers never see half of it.
+        '''
+        
+        self.last_export = time.perf_counter()
+        if not self.path:
+            return
+        if self.path.endswith('.prom'):
+            text = self.prometheus()
+        else:
+            text = json.dumps(self.snapshot(),indent=2)
+        tmp = self.path + '.tmp'
+        with open(tmp,'w') as f:
+            f.write(text)
+        os.replace(tmp,self.path)
+        
+    #end method export
+    
+    def maybe_export(self):
+        '''
+        Exports if more than self.interval seconds passed since the last
+        export.
+        '''
+        
+        if time.perf_counter() - self.last_export >= self.interval:
+            self.export()
+        
+    #end method maybe_export
+    
+#end class Metrics
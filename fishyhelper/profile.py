@@ -0,0 +1,197 @@
+#!/usr/bin/python
+
+#Essential imports
+import time, os, json
+import numpy as np
+
+class SessionProfile(object):
+
+    # params that are saved with the profile and used again on resume
+    tuned_params = (
+        'bob_color_diff','splash_diff_thresh','bob_fade_thresh',
+        'bob_track_probe','splash_radius','sct_check_iters','splash_detect',
+        'splash_z','splash_drift','splash_alpha_shift')
+
+    # profile file header: magic, then the length of the JSON header that
+    # describes the raw arrays following it
+    magic = b'HFPROF01'
+    align = 64
+
+    def __init__(self,name,dirname='profiles'):
+        '''
+        Named warm-start state of a fishing session, saved to
+        dirname/name.hfp so that a restarted session resumes right away
+        instead of selecting the search area and learning the background
+        again. Holds the search area, the capture geometry (cap_area and
+        monitor), the params of the last cast that was looted (see
+        tuned_params), the rolling background state and the last baseline
+        screenshot. Arrays are stored raw behind a small JSON header, so
+        loading is one read per array.
+        '''
+
+        self.name = name
+        self.path = os.path.join(dirname,name + '.hfp')
+        self.saved = None # wall clock time of the last save or load
+        self.search_area = None
+        self.cap_area = None
+        self.monitor = None
+        self.params = {}
+        self.bg_mode = None # mode, frame count and state of the background
+        self.bg_count = 0
+        self.bg_state = None
+        self.baseline = None
+
+    #end method __init__
+
+    @classmethod
+    def load(cls,name,dirname='profiles'):
+        '''
+        Returns the SessionProfile saved as name in dirname, or None if there
+        is none. Raises ValueError if the file is not a profile.
+        '''
+
+        prof = cls(name,dirname)
+        if not os.path.exists(prof.path):
+            return None
+        with open(prof.path,'rb') as f:
+            head = f.read(16)
+            if head[:8] != cls.magic:
+                raise ValueError("'" + prof.path + "' is not a session " + \
+                                 "profile of this version of HereFishy")
+            size = int(np.frombuffer(head[8:12],dtype=np.uint32)[0])
+            meta = json.loads(f.read(size).decode('utf-8'))
+            arrays = {}
+            for key, spec in meta['arrays'].items():
+                f.seek(spec['offset'])
+                arrays[key] = np.fromfile(
+                    f,dtype=spec['dtype'],
+                    count=int(np.prod(spec['shape']))).reshape(spec['shape'])
+        prof.saved = meta['saved']
+        prof.search_area = meta['search_area']
+        prof.cap_area = meta['cap_area']
+        prof.monitor = meta['monitor']
+        prof.params = meta['params']
+        prof.bg_mode = meta['bg_mode']
+        prof.bg_count = meta['bg_count']
+        prof.bg_state = arrays.get('bg_state',None)
+        prof.baseline = arrays.get('baseline',None)
+        return prof
+
+    #end method load
+
+    def update(self,params,background=None,baseline=None):
+        '''
+        Takes the capture geometry and tuned params from params, and the
+        state of BackgroundModel background and baseline screenshot
+        ndarray if given. Call after a good cast, then save.
+        '''
+
+        self.cap_area = dict(params['cap_area'])
+        self.monitor = params.get('monitor',1)
+        self.params = {key: params[key] for key in self.tuned_params
+                       if key in params}
+        if background is not None and background.count:
+            self.bg_mode = background.mode
+            self.bg_count = background.count
+            self.bg_state = background.state
+        if baseline is not None:
+            self.baseline = baseline
+
+    #end method update
+
+    def save(self):
+        '''
+        Writes the profile to self.path, replacing the file atomically so a
+        crash never leaves half a profile behind.
+        '''
+
+        arrays = {}
+        if self.bg_state is not None:
+            arrays['bg_state'] = self.bg_state
+        if self.baseline is not None:
+            arrays['baseline'] = self.baseline
+        self.saved = time.time()
+        meta = {
+            'name': self.name, 'saved': self.saved,
+            'search_area': self.search_area, 'cap_area': self.cap_area,
+            'monitor': self.monitor, 'params': self.params,
+            'bg_mode': self.bg_mode, 'bg_count': self.bg_count,
+            'arrays': {}}
+        # array offsets depend on the header size, which depends on the
+        # offsets, so lay out with room for the longest offsets first
+        for key, arr in arrays.items():
+            meta['arrays'][key] = {
+                'dtype': arr.dtype.str, 'shape': list(arr.shape),
+                'offset': 10**12}
+        size = len(json.dumps(meta).encode('utf-8'))
+        offset = 16 + size
+        for key, arr in arrays.items():
+            offset = -(-offset // self.align)*self.align
+            meta['arrays'][key]['offset'] = offset
+            offset += arr.nbytes
+        header = json.dumps(meta).encode('utf-8').ljust(size)
+
+        os.makedirs(os.path.dirname(self.path) or '.',exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp,'wb') as f:
+            f.write(self.magic + np.uint32(size).tobytes().ljust(8,b'\0'))
+            f.write(header)
+            for key, arr in arrays.items():
+                f.write(b'\0'*(meta['arrays'][key]['offset'] - f.tell()))
+                f.write(np.ascontiguousarray(arr).tobytes())
+        os.replace(tmp,self.path)
+
+    #end method save
+
+    def apply(self,params):
+        '''
+        Returns a copy of params with the capture geometry and tuned params
+        of the profile.
+        '''
+
+        params = dict(params)
+        if self.cap_area is not None:
+            params['cap_area'] = dict(self.cap_area)
+        if self.monitor is not None:
+            params['monitor'] = self.monitor
+        params.update(self.params)
+        return params
+
+    #end method apply
+
+    def restore_background(self,background):
+        '''
+        Loads the saved background state into BackgroundModel background.
+        Returns True if it was restored, False if there is none or it was
+        saved by a model of another mode or size.
+        '''
+
+        if self.bg_state is None or background is None or \
+           background.mode != self.bg_mode:
+            return False
+        try:
+            background.restore(self.bg_state,self.bg_count)
+        except ValueError:
+            return False
+        return True
+
+    #end method restore_background
+
+    def scene_diff(self,frame,step=8):
+        '''
+        Returns the mean absolute difference per channel between BGRA
+        ndarray frame of cap_area and the saved baseline, on every step-th
+        pixel, or None if there is no baseline of that size. A big
+        difference means the camera or the game window moved since the
+        profile was saved.
+        '''
+
+        if self.baseline is None or self.baseline.shape != frame.shape:
+            return None
+        a = self.baseline[::step,::step,:3].astype(np.int16)
+        b = frame[::step,::step,:3].astype(np.int16)
+        return float(np.mean(np.abs(a - b)))
+
+    #end method scene_diff
+
+#end class SessionProfile
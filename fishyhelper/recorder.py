@@ -0,0 +1,431 @@
+#!/usr/bin/python
+
+#Essential imports
+import time, os, glob, threading, collections
+import numpy as np
+from .capture import FrameSource
+
+class FrameRecorder(object):
+
+    # one fixed-size index record per frame or mark. Pixels of a frame are
+    # stored as raw BGR uint8 at offset in the chunk's .dat file
+    index_dtype = np.dtype([
+        ('t','f8'),               # time on the frame source's clock
+        ('mono','f8'),            # time.monotonic() of the grab
+        ('kind','u1'),            # 0 for a frame, 1 for a mark
+        ('event','S15'),          # name of a mark, e.g. 'cast'
+        ('top','i4'),             # area of a frame, in screen coordinates
+        ('left','i4'),
+        ('height','u2'),
+        ('width','u2'),
+        ('offset','u8')])
+
+    # index file header: magic and record size
+    magic = b'HFFRAME1'
+    header_size = 16
+
+    def __init__(self,dirname,max_bytes=2**31,chunk_bytes=2**26,
+                 splash_only=False,queue_size=64,interval=.05):
+        '''
+        Records the frames grabbed by a CaptureSession, with timestamps and
+        marks (casts etc.), to a chunked store in directory dirname, so that
+        failed casts can be looked at and replayed later (see FrameReplay
+        and ReplayFrameSource). Each chunk is a preallocated, memory-mapped
+        .dat file of chunk_bytes holding the BGR pixels of its frames back
+        to back, and a .idx file of index_dtype records pointing into it.
+        When the chunks take more than max_bytes, the oldest ones are
+        deleted. Recording never blocks the caller: a frame is copied and
+        queued, and a background thread writes the queued frames every
+        interval seconds, in batches, so it does not wake up (and take the
+        GIL) once per frame. If more than queue_size frames are waiting,
+        new frames are dropped and counted in self.dropped.
+
+        Arguments:
+            str dirname - directory of the chunks. Created if missing, and
+                new chunks are numbered after the ones already in it
+            int max_bytes[=2**31] - disk usage cap of all chunks
+            int chunk_bytes[=2**26] - size of a chunk's pixel file. Frames
+                bigger than this are dropped
+            bool splash_only[=False] - only record the frames grabbed
+                between a 'splash_start' mark and the next mark, i.e. the
+                splash area crops of wait_for_splash, and not the grabs of
+                take_baseline and find_bob
+            int queue_size[=64] - frames waiting to be written at most
+            float interval[=.05] - seconds between batches of writes
+        '''
+
+        self.dirname = dirname
+        self.max_bytes = max_bytes
+        self.chunk_bytes = chunk_bytes
+        self.splash_only = splash_only
+        self._gated = splash_only # True while frames are not recorded
+        self.dropped = 0
+        self.written = 0
+        os.makedirs(dirname,exist_ok=True)
+        seqs = [seq for seq, path in _chunks(dirname)]
+        self.seq = max(seqs) if seqs else 0
+
+        # current chunk, only touched by the writer thread
+        self._dat = None
+        self._idx = None
+        self._used = 0
+
+        # frames and marks waiting for the writer thread. deque appends and
+        # pops are atomic, so the caller never waits on a lock
+        self.queue_size = queue_size
+        self.interval = interval
+        self._pending = collections.deque()
+        self._busy = False
+        self._closing = threading.Event()
+        self._thread = threading.Thread(
+            target=self._write_loop,name='FrameRecorder',daemon=True)
+        self._thread.start()
+
+    #end method __init__
+
+    def record(self,area,frame,t):
+        '''
+        Records BGRA ndarray frame of area (in cap_area format), grabbed at
+        time t of the frame source's clock. Returns at once.
+        '''
+
+        if self._gated:
+            return
+        h, w = frame.shape[:2]
+        if h*w*3 > self.chunk_bytes or \
+           len(self._pending) >= self.queue_size:
+            self.dropped += 1
+            return
+        self._pending.append(
+            (t,time.monotonic(),'',(int(area['top']),int(area['left'])),
+             frame.copy()))
+
+    #end method record
+
+    def mark(self,event,t):
+        '''
+        Records mark str event at time t of the frame source's clock.
+        '''
+
+        if self.splash_only:
+            self._gated = event != 'splash_start'
+        self._pending.append((t,time.monotonic(),event,None,None))
+
+    #end method mark
+
+    def flush(self):
+        '''
+        Waits until every queued frame is written.
+        '''
+
+        while self._thread is not None and (self._pending or self._busy):
+            time.sleep(self.interval/10)
+
+    #end method flush
+
+    def close(self):
+        '''
+        Writes the queued frames, closes the current chunk and stops the
+        writer thread.
+        '''
+
+        if self._thread is None:
+            return
+        self._closing.set()
+        self._thread.join()
+        self._thread = None
+
+    #end method close
+
+    def _write_loop(self):
+        '''
+        Writer thread. Writes the queued frames and marks every
+        self.interval seconds, until closed.
+        '''
+
+        try:
+            while True:
+                closing = self._closing.wait(self.interval)
+                self._busy = True
+                while self._pending:
+                    self._write(*self._pending.popleft())
+                    # hand the GIL back between frames, instead of holding
+                    # it for a whole switch interval while the capture
+                    # thread waits
+                    time.sleep(0)
+                if self._idx is not None:
+                    # so that a FrameReplay of the store sees the frames
+                    self._idx.flush()
+                self._busy = False
+                if closing:
+                    return
+        finally:
+            self._close_chunk()
+
+    #end method _write_loop
+
+    def _write(self,t,mono,event,pos,frame):
+        '''
+        Writes one frame (or mark, if frame is None) to the current chunk,
+        starting a new chunk if it is full.
+        '''
+
+        rec = np.zeros((),dtype=self.index_dtype)
+        rec['t'], rec['mono'] = t, mono
+        if frame is None:
+            if self._idx is None:
+                self._open_chunk()
+            rec['kind'] = 1
+            rec['event'] = event.encode('ascii','replace')[:15]
+        else:
+            h, w = frame.shape[:2]
+            size = h*w*3
+            if self._dat is None or self._used + size > self.chunk_bytes:
+                self._close_chunk()
+                self._open_chunk()
+            self._dat[self._used:self._used+size].reshape((h,w,3))[...] = \
+                frame[:,:,:3]
+            rec['top'], rec['left'] = pos
+            rec['height'], rec['width'] = h, w
+            rec['offset'] = self._used
+            self._used += size
+            self.written += 1
+        self._idx.write(rec.tobytes())
+
+    #end method _write
+
+    def _open_chunk(self):
+        '''
+        Starts the next chunk, deleting the oldest ones over max_bytes.
+        '''
+
+        self.seq += 1
+        base = os.path.join(self.dirname,'chunk-{:06d}'.format(self.seq))
+        self._prune(self.max_bytes - self.chunk_bytes)
+        with open(base + '.dat','wb') as f:
+            f.truncate(self.chunk_bytes)
+        self._dat = np.memmap(base + '.dat',dtype=np.uint8,mode='r+',
+                              shape=(self.chunk_bytes,))
+        self._idx = open(base + '.idx','wb')
+        self._idx.write(self.magic + np.uint32(
+            self.index_dtype.itemsize).tobytes().ljust(8,b'\0'))
+        self._used = 0
+        self._base = base
+
+    #end method _open_chunk
+
+    def _close_chunk(self):
+        '''
+        Closes the current chunk and trims its pixel file to what was used.
+        '''
+
+        if self._idx is None:
+            return
+        self._idx.close()
+        self._idx = None
+        if self._dat is not None:
+            self._dat.flush()
+            self._dat = None
+            os.truncate(self._base + '.dat',self._used)
+
+    #end method _close_chunk
+
+    def _prune(self,budget):
+        '''
+        Deletes the oldest chunks until all of them take at most budget
+        bytes.
+        '''
+
+        chunks = _chunks(self.dirname)
+        sizes = [os.path.getsize(p + '.dat') + os.path.getsize(p + '.idx')
+                 for seq, p in chunks]
+        total = sum(sizes)
+        for (seq, path), size in zip(chunks,sizes):
+            if total <= budget:
+                break
+            for ext in ('.dat','.idx'):
+                os.remove(path + ext)
+            total -= size
+
+    #end method _prune
+
+#end class FrameRecorder
+
+def _chunks(dirname):
+    '''
+    Returns list of (seq,path without extension) of the complete chunks in
+    directory dirname, oldest first.
+    '''
+
+    chunks = []
+    for path in glob.glob(os.path.join(dirname,'chunk-*.idx')):
+        base = path[:-4]
+        try:
+            seq = int(os.path.basename(base)[6:])
+        except ValueError:
+            continue
+        if os.path.exists(base + '.dat'):
+            chunks.append((seq,base))
+    return sorted(chunks)
+
+#end function _chunks
+
+class FrameReplay(object):
+
+    def __init__(self,dirname):
+        '''
+        Reads a FrameRecorder store. self.index is the structured array of
+        all index records (see FrameRecorder.index_dtype) in recording
+        order, with an extra 'chunk' column. Pixels are memory-mapped, so
+        only the frames looked at are read.
+        '''
+
+        self.dirname = dirname
+        dtype = FrameRecorder.index_dtype
+        parts = []
+        self._dats = []
+        for i, (seq, base) in enumerate(_chunks(dirname)):
+            with open(base + '.idx','rb') as f:
+                header = f.read(FrameRecorder.header_size)
+                if header[:8] != FrameRecorder.magic or np.frombuffer(
+                        header[8:12],dtype=np.uint32)[0] != dtype.itemsize:
+                    raise ValueError("'" + base + ".idx' is not a frame " + \
+                                     "index of this version of HereFishy")
+                # a chunk still being written may end in half a record
+                data = f.read()
+                recs = np.frombuffer(
+                    data[:len(data)//dtype.itemsize*dtype.itemsize],
+                    dtype=dtype)
+            part = np.zeros(len(recs),dtype=dtype.descr + [('chunk','u4')])
+            for name in dtype.names:
+                part[name] = recs[name]
+            part['chunk'] = i
+            parts.append(part)
+            size = os.path.getsize(base + '.dat')
+            self._dats.append(
+                np.memmap(base + '.dat',dtype=np.uint8,mode='r',shape=(size,))
+                if size else np.zeros(0,dtype=np.uint8))
+        self.index = np.concatenate(parts) if parts else \
+            np.zeros(0,dtype=dtype.descr + [('chunk','u4')])
+
+    #end method __init__
+
+    def __len__(self):
+        return len(self.index)
+    #end method __len__
+
+    def frame(self,i,out=None):
+        '''
+        Returns the frame of index record i as a BGRA uint8 ndarray, written
+        into out if given.
+        '''
+
+        rec = self.index[i]
+        h, w = int(rec['height']), int(rec['width'])
+        off = int(rec['offset'])
+        bgr = self._dats[rec['chunk']][off:off+h*w*3].reshape((h,w,3))
+        if out is None:
+            out = np.empty((h,w,4),dtype=np.uint8)
+        out[:,:,:3] = bgr
+        out[:,:,3] = 255
+        return out
+
+    #end method frame
+
+    def events(self):
+        '''
+        Returns list of (t,event) of all marks.
+        '''
+
+        marks = self.index[self.index['kind'] == 1]
+        return [(float(m['t']),m['event'].decode('ascii')) for m in marks]
+
+    #end method events
+
+    def frames(self):
+        '''
+        Yields (record,frame) of every frame in recording order.
+        '''
+
+        for i in np.flatnonzero(self.index['kind'] == 0):
+            yield self.index[i], self.frame(i)
+
+    #end method frames
+
+#end class FrameReplay
+
+class ReplayFrameSource(FrameSource):
+
+    def __init__(self,replay,speed=None,start=0):
+        '''
+        Frame source that plays back a FrameRecorder store (a FrameReplay or
+        the directory of one) to BobTracker. Every grab returns the next
+        recorded frame of the same size as the area asked for, skipping
+        the others. The clock (now) is the recorded time of the last frame
+        returned, plus sleeps since. With speed, frames are paced at speed
+        times their original rate, by their monotonic timestamps. With speed
+        None they are returned as fast as possible. Raises EOFError when
+        the recording runs out.
+
+        Arguments:
+            FrameReplay replay - recording, or str directory of one
+            float speed[=None] - playback speed, e.g. 1. for the original
+                speed. As fast as possible if None
+            int start[=0] - index record to start at
+        '''
+
+        if isinstance(replay,str):
+            replay = FrameReplay(replay)
+        self.replay = replay
+        self.speed = speed
+        self.pos = start
+        self.clock = float(replay.index['t'][start]) \
+            if start < len(replay) else 0.
+        self.wall0 = None # wall clock and recorded time of the first grab
+        self.mono0 = None
+
+    #end method __init__
+
+    def grab(self,area,out=None):
+        index = self.replay.index
+        shape = (int(area['height']),int(area['width']))
+        while self.pos < len(index):
+            rec = index[self.pos]
+            self.pos += 1
+            if rec['kind'] == 0 and (rec['height'],rec['width']) == shape:
+                break
+        else:
+            raise EOFError("End of the recording in '" + \
+                           self.replay.dirname + "'")
+        if self.speed:
+            if self.wall0 is None:
+                self.wall0, self.mono0 = time.monotonic(), rec['mono']
+            delay = self.wall0 + (rec['mono']-self.mono0)/self.speed - \
+                time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self.clock = float(rec['t'])
+        return self.replay.frame(self.pos-1,out)
+    #end method grab
+
+    def monitor(self,idx=1):
+        frames = self.replay.index[self.replay.index['kind'] == 0]
+        if len(frames) == 0:
+            return {'top': 0, 'left': 0, 'width': 0, 'height': 0}
+        top, left = int(frames['top'].min()), int(frames['left'].min())
+        return {
+            'top': top, 'left': left,
+            'width': int((frames['left'] + frames['width']).max()) - left,
+            'height': int((frames['top'] + frames['height']).max()) - top}
+    #end method monitor
+
+    def now(self):
+        return self.clock
+    #end method now
+
+    def sleep(self,secs):
+        # the recording already holds the gap, so only the clock moves
+        self.clock += secs
+    #end method sleep
+
+#end class ReplayFrameSource
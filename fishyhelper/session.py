@@ -0,0 +1,626 @@
+#!/usr/bin/python
+
+#Essential imports
+import time, os, asyncio, functools
+import concurrent.futures, multiprocessing
+from .analysis import BackgroundModel, ColorLUT
+from .capture import CaptureSession, FramePacer, _frame_source
+from .recorder import FrameRecorder
+from .inputs import MacMouser, NullMouser, LockedMouser
+from .gui import GUIParamSet
+from .tracker import BobTracker
+from .history import ParamTracker
+from .metrics import Metrics
+from .profile import SessionProfile
+from .trace import Tracer, trace_level
+
+class NatPagle(object):
+    
+    def __init__(self,params,source=None,input_lock=None,mouser=None):
+        '''
+        Instantiates NatPagle object, which handles the central processes
+        of HereFishy. He oversees iterative calls to Mouser, BobTracker,
+        GUIParamSet, and ParamStat objects. Takes an optional FrameSource
+        that all screenshots are taken from. MSS is used if None. Either way
+        it is wrapped in a CaptureSession that lives as long as NatPagle, so
+        the same capture handle and frame buffers are reused across casts.
+        With UD param record_dir set, every frame grabbed is also recorded
+        there by a FrameRecorder, for replaying failed casts later.
+        Takes an optional input_lock (multiprocessing.RLock) shared with
+        other NatPagles running at the same time, see FishingSupervisor.
+        Inputs are posted by an optional Mouser mouser, e.g. a
+        RecordingMouser to run the loop headless and check its input
+        timing, or by the one picked by UD param input_backend if None.
+        With UD param profile set, the session is resumed from that
+        SessionProfile if it was saved before (see load_profile). Messages,
+        stage timings, grabs and input events go to one Tracer, and with UD
+        param trace_dir set, the trace of every cast is dumped there.
+        '''
+        
+        # structured event log of the session, printed off the hot loops
+        self.tracer = Tracer(trace_level(params))
+        
+        # warm-start state, saved every profile_save_interval seconds after
+        # a good cast. warm is True if a saved profile was resumed
+        self.profile = None
+        self.warm = False
+        self.search_area = None
+        if params.get('profile',None):
+            params = self.load_profile(params)
+        
+        self.params = params
+        self.input_lock = input_lock
+        self.mouser = mouser
+        recorder = None
+        if params.get('record_dir',None):
+            recorder = FrameRecorder(
+                params['record_dir'],
+                int(params.get('record_max_mb',2048)*2**20),
+                int(params.get('record_chunk_mb',64)*2**20),
+                not params.get('record_full_frames',True))
+        self.source = CaptureSession(
+            source,params.get('capture_ring_size',2),recorder,self.tracer)
+        
+        # rolling background of cap_area, fed between casts
+        self.background = None
+        if params.get('bg_model',None):
+            self.background = BackgroundModel(
+                params['bg_model'],params.get('bg_window',8),
+                params.get('bg_alpha_shift',3))
+            if self.warm and not self.profile.restore_background(
+                    self.background):
+                self.tracer.info("|-- Profile has no matching background, " + \
+                                 "learning it again")
+                self.warm = False
+        
+        # cast history, kept across BobTracker instances
+        self.pt = ParamTracker(params)
+        
+        # bobber color table of the search, learned across casts and saved
+        # to UD param bob_color_lut on exit
+        self.color_lut = None
+        if params.get('bob_color_lut',None):
+            self.color_lut = ColorLUT.load(params['bob_color_lut']) or \
+                ColorLUT(params.get('color_lut_bits',5))
+        
+        # splash wait frame pacer, learns the bite times across casts
+        self.pacer = FramePacer(
+            params.get('splash_fps',60.),params.get('splash_min_fps',5.),
+            params.get('splash_cpu_budget',.25),
+            params.get('bite_window_margin',1.))
+        
+        # stage timings and counters, exported to UD param metrics_file
+        self.metrics = Metrics(
+            params.get('metrics_file',None),params.get('metrics_interval',60),
+            self.tracer)
+        # seconds from the last splash frame to its loot click
+        self.click_latency = None
+        self.profile_saved = time.perf_counter()
+    
+    #end method __init__
+    
+    def load_profile(self,params):
+        '''
+        Loads the SessionProfile named by UD param profile from UD param
+        profile_dir into self.profile, or starts a new one if it was never
+        saved. A saved profile sets self.search_area and self.warm, and its
+        capture geometry and tuned params replace those in params. Returns
+        the params to use.
+        '''
+        
+        name = params['profile']
+        dirname = params.get('profile_dir','profiles')
+        prof = SessionProfile.load(name,dirname)
+        if prof is None:
+            self.profile = SessionProfile(name,dirname)
+            return params
+        self.profile = prof
+        self.search_area = prof.search_area
+        self.warm = True
+        new = prof.apply(params)
+        changed = [key for key in prof.params
+                   if params.get(key,None) != new[key]]
+        self.tracer.info(
+            "|-- Resuming profile '" + name + "' saved " + \
+            time.strftime('%Y-%m-%d %H:%M',time.localtime(prof.saved)))
+        if changed:
+            self.tracer.info("|-- Using the profile's " + ', '.join(changed) + \
+                             " instead of herefishy.py's")
+        return new
+        
+    #end method load_profile
+    
+    def check_profile(self):
+        '''
+        Compares a screenshot of cap_area to the baseline of the resumed
+        profile. If the scene changed more than UD param profile_max_diff
+        (e.g. the camera moved), the profile's background is dropped and
+        self.warm is reset, so the session warms up like a new one. Returns
+        self.warm.
+        '''
+        
+        if not self.warm:
+            return False
+        frame = self.source.grab(self.params['cap_area'])
+        diff = self.profile.scene_diff(frame)
+        if diff is not None and diff > self.params.get('profile_max_diff',24.):
+            self.tracer.info("|-- Scene changed since the profile was " + \
+                             "saved (diff " + "{:.1f}".format(diff) + \
+                             "), warming up again")
+            if self.background is not None:
+                self.background.reset()
+            self.warm = False
+        return self.warm
+        
+    #end method check_profile
+    
+    def save_profile(self,tracker=None,force=False):
+        '''
+        Saves the search area, capture geometry, params, background and the
+        baseline of BobTracker tracker to self.profile, if there is one.
+        Unless force, only saves if UD param profile_save_interval seconds
+        passed since the last save. Call after a good cast.
+        '''
+        
+        if self.profile is None:
+            return
+        if not force and time.perf_counter() - self.profile_saved < \
+           self.params.get('profile_save_interval',60):
+            return
+        self.profile.search_area = self.search_area
+        self.profile.update(
+            self.params,self.background,
+            None if tracker is None else tracker.baseline)
+        self.profile.save()
+        self.profile_saved = time.perf_counter()
+        
+    #end method save_profile
+    
+    def save_color_lut(self):
+        '''
+        Saves the bobber color table to UD param bob_color_lut, if there is
+        one.
+        '''
+        
+        if self.color_lut is not None:
+            self.color_lut.save(self.params['bob_color_lut'])
+        
+    #end method save_color_lut
+    
+    def update_background(self):
+        '''
+        Adds a screenshot of cap_area to the rolling background, if there is
+        one. Called between casts, while the bobber is not on screen.
+        '''
+        
+        if self.background is not None:
+            self.background.update(self.source.grab(self.params['cap_area']))
+        
+    #end method update_background
+    
+    def make_mouser(self):
+        '''
+        Returns the Mouser given to NatPagle, or else a new one of UD param
+        input_backend: 'mac' for MacMouser, 'null' for NullMouser, or the
+        one of this OS if None. Either way it is wrapped in a LockedMouser
+        if there is an input lock. Raises ValueError for 'win', as WinMouser
+        cannot press keys to cast yet.
+        '''
+        
+        mouser = self.mouser
+        if mouser is None:
+            backend = self.params.get('input_backend',None)
+            if backend is None:
+                backend = {'posix': 'mac', 'nt': 'win'}.get(os.name,None)
+            if backend == 'mac':
+                mouser = MacMouser(self.source)
+            elif backend == 'win':
+                raise ValueError("Input backend 'win' is not supported yet, " + \
+                                 "WinMouser cannot press keys. Use 'null' " + \
+                                 "to post no inputs")
+            elif backend == 'null':
+                mouser = NullMouser(self.source)
+            elif backend is None:
+                raise Exception("No input backend for this operating " + \
+                                "system (os.name='" + os.name + "'). Set " + \
+                                "input_backend to 'null' to post no inputs.")
+            else:
+                raise ValueError("Invalid input backend '" + str(backend) + \
+                                 "'")
+        if self.input_lock is not None:
+            mouser = LockedMouser(mouser,self.input_lock)
+        return mouser
+        
+    #end method make_mouser
+    
+    def loot_click(self,mouser,x,y,start=None):
+        '''
+        Loots the bobber at x,y with mouser.loot, on deadlines measured from
+        time start (the timestamp of the splash frame, or now if None) set
+        by UD params loot_move_delay, loot_click_delay and
+        shift_right_speed. Records the splash-to-click latency in
+        self.click_latency and the metrics, and returns it.
+        '''
+        
+        if start is None:
+            start = mouser.now()
+        self.tracer.instant('loot',x=float(x),y=float(y))
+        self.click_latency = mouser.loot(
+            x,y,start,self.params.get('loot_move_delay',.4),
+            self.params.get('loot_click_delay',.8),
+            self.params.get('shift_right_speed',.1))
+        self.metrics.observe('splash_to_click',self.click_latency)
+        return self.click_latency
+        
+    #end method loot_click
+    
+    def dump_trace(self,tracker,outcome=None):
+        '''
+        Dumps the trace of the last cast of BobTracker tracker, from its cast
+        up to now, to a Chrome trace JSON file in UD param trace_dir named
+        after the cast time and outcome (tracker.outcome if None), if
+        trace_dir is set. The file is written by the tracer's thread.
+        '''
+        
+        trace_dir = self.params.get('trace_dir',None)
+        if not trace_dir or tracker.cast_perf is None:
+            return
+        if outcome is None:
+            outcome = tracker.outcome or 'none'
+        # wall clock time of the cast, from its perf_counter time
+        cast_time = time.time() - (time.perf_counter() - tracker.cast_perf)
+        name = 'cast-' + time.strftime(
+            '%Y%m%d-%H%M%S',time.localtime(cast_time)) + \
+            '-{:03d}'.format(int(cast_time % 1*1000)) + '-' + outcome + '.json'
+        self.tracer.dump(os.path.join(trace_dir,name),tracker.cast_perf)
+        
+    #end method dump_trace
+    
+    def get_search_area(self,source=None,reselect=False):
+        '''
+        Takes screenshot using MSS (or arg source, or self.source) and uses
+        GUIParamSet to retrieve user-defined search area. Updates
+        self.search_area attr and returns search area. The search area of a
+        resumed profile is returned as is, unless reselect.
+        '''
+        
+        if self.search_area is not None and not reselect:
+            return self.search_area
+        if source is None:
+            source = self.source
+        with _frame_source(source) as src:
+            img = src.snapshot(src.monitor(self.params.get('monitor',1)))
+        area_getter = GUIParamSet(img,self.params.get('gui_max_size',1600))
+        area_getter.window_text = "HereFishy  |  Select search area..."
+        area_getter.nozoom_txt = [
+            "Select area in which bobber will definitely land",
+            "Mouse=select box  [Esc]=close  [Enter]=accept box",
+            "[z]=zoom to box  [shift+z]=reset zoom"]
+        self.search_area = area_getter.get_usr_rect()
+        self.save_profile(force=True)
+        return self.search_area
+        
+    #end method get_search_area
+    
+    def gofishin(self):
+        '''
+        Instantiates one BobTracker, then iteratively presses '1' key, waits
+        a few seconds, listens for splash event, shift-right clicks, waits a
+        few seconds, and repeats. Runs gofishin_async instead if UD param
+        async_loop is on.
+        '''
+        
+        if self.params.get('async_loop',False):
+            try:
+                asyncio.run(self.gofishin_async())
+            except KeyboardInterrupt:
+                print("Aborted Nat Pagle")
+            return
+        
+        #Instantiate Mouser object based on os
+        mouser = self.make_mouser()
+        
+        #Give user some time to navigate to the WoW window, unless resuming
+        #a profile. Its background is warm, so the first countdown is
+        #skipped too
+        warm = self.check_profile()
+        for ct in range(0 if warm else self.params['init_wait_time']):
+            print('|-- Enter WoW in the next ' + \
+                  str(self.params['init_wait_time']-ct) + " seconds...\r",end='')
+            time.sleep(1)
+        print()
+        
+        # one BobTracker for all casts, so its baseline, reducer and
+        # summed-area table buffers are reused
+        tracker = BobTracker(
+            self.params,self.pt,mouser,background=self.background,
+            metrics=self.metrics,pacer=self.pacer,tracer=self.tracer,
+            color_lut=self.color_lut)
+        try:
+            while True:
+                
+                # count down to the cast
+                self.metrics.maybe_export()
+                with self.metrics.timer('countdown'):
+                    wait = 0 if warm else self.params['init_wait_time']
+                    warm = False
+                    for ct in range(wait):
+                        print("Casting line in " + \
+                              str(self.params['init_wait_time']-ct) + \
+                              "...\r",end='')
+                        time.sleep(1)
+                        self.update_background()
+                
+                # press 1 key to cast and find bobber using difference map
+                bob_loc = tracker.find_bob(
+                    self.params['bob_track_probe'],source=self.source)
+                
+                # recast line if bobber was not found
+                if not bob_loc:
+                    self.tracer.info("|-- No bobber was found. Recasting...")
+                    self.dump_trace(tracker,'nobob')
+                    continue
+                
+                # draw box around bobber and wait for color value in box to spike,
+                # which indicates splash event
+                self.tracer.info("|-- Waiting for splash...")
+                splashing = tracker.wait_for_splash(
+                    bob_loc[0],bob_loc[1],source=self.source)
+                if splashing:
+                    with self.metrics.timer('click'):
+                        self.loot_click(
+                            mouser,bob_loc[0],bob_loc[1],tracker.splash_t)
+                    self.metrics.inc('clicks')
+                    self.save_profile(tracker)
+                self.dump_trace(tracker)
+        except KeyboardInterrupt:
+            self.tracer.info("Aborted Nat Pagle")
+            return
+        finally:
+            self.save_profile(tracker,force=True)
+            self.save_color_lut()
+            self.source.close()
+            self.pt.close()
+            self.metrics.export()
+            self.tracer.close()
+        #end try
+        
+    #end method gofishin
+    
+    async def gofishin_async(self):
+        '''
+        asyncio version of gofishin. Capture and analysis run in one worker
+        thread and input in another, so that blocking grabs and input posts
+        never stall the event loop, while countdowns and logging run as
+        coroutines on it. Dead time between casts is overlapped: the
+        countdown to the next cast starts as soon as the splash is detected
+        and runs alongside the loot click, and the baseline for the next cast
+        is grabbed as soon as the click has settled, during the last second
+        of the countdown. The splash wait ends when max_wait_time runs out on
+        the source's clock, like in gofishin, with the last pause cut short
+        at the deadline instead of running on to the next frame.
+        '''
+        
+        #Instantiate Mouser object based on os
+        mouser = self.make_mouser()
+        
+        loop = asyncio.get_running_loop()
+        capture = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        inputs = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        def run(executor,func,*args):
+            return loop.run_in_executor(
+                executor,functools.partial(func,*args))
+        
+        tracker = BobTracker(
+            self.params,self.pt,mouser,background=self.background,
+            metrics=self.metrics,pacer=self.pacer,tracer=self.tracer,
+            color_lut=self.color_lut)
+        src = self.source
+        wait = self.params['init_wait_time']
+        
+        #Give user some time to navigate to the WoW window, unless resuming
+        #a profile. Its background is warm, so the first countdown is
+        #skipped too
+        warm = await run(capture,self.check_profile)
+        await self._countdown(
+            '|-- Enter WoW in the next {} seconds...',0 if warm else wait)
+        print()
+        
+        loot = None # loot click of the previous cast, if any
+        try:
+            while True:
+                
+                # count down to the cast while the previous loot click
+                # settles, then feed the background until the last second
+                # and grab the baseline
+                self.metrics.maybe_export()
+                cast_wait = 0 if warm else wait
+                warm = False
+                cast_at = loop.time() + cast_wait
+                countdown = asyncio.ensure_future(
+                    self._countdown("Casting line in {}...",cast_wait))
+                if loot is not None:
+                    await loot
+                    loot = None
+                while loop.time() < cast_at - 1.:
+                    await asyncio.sleep(min(1.,cast_at - 1. - loop.time()))
+                    await run(capture,self.update_background)
+                await run(capture,tracker.take_baseline,src)
+                await countdown
+                self.metrics.observe('countdown',loop.time()-cast_at+cast_wait)
+                
+                # press 1 key to cast and find bobber using difference map
+                await run(inputs,tracker.cast,src)
+                # wait for bobber to appear, on the source's clock
+                await run(capture,src.sleep,2)
+                bob_loc = await run(
+                    capture,tracker.search_bob,src,
+                    self.params['bob_track_probe'])
+                
+                # recast line if bobber was not found
+                if not bob_loc:
+                    self.tracer.info("|-- No bobber was found. Recasting...")
+                    self.dump_trace(tracker,'nobob')
+                    continue
+                
+                # draw box around bobber and wait for color value in box to
+                # spike, which indicates splash event
+                self.tracer.info("|-- Waiting for splash...")
+                await run(capture,tracker.splash_start,src,
+                          bob_loc[0],bob_loc[1])
+                splashing = await self._watch_splash(
+                    run,capture,tracker,src,self.params['max_wait_time'])
+                if splashing:
+                    loot = asyncio.ensure_future(self._loot(
+                        run,inputs,mouser,bob_loc[0],bob_loc[1],
+                        tracker.splash_t,tracker))
+                    await run(capture,self.save_profile,tracker)
+                else:
+                    self.dump_trace(tracker)
+        finally:
+            if loot is not None:
+                loot.cancel()
+            self.save_profile(tracker,force=True)
+            self.save_color_lut()
+            # let a splash step in flight finish before the source closes
+            capture.shutdown(wait=True)
+            inputs.shutdown(wait=False)
+            self.source.close()
+            self.pt.close()
+            self.metrics.export()
+            self.tracer.close()
+        #end try
+        
+    #end method gofishin_async
+    
+    async def _countdown(self,msg,secs):
+        '''
+        Prints msg formatted with the seconds left, once per second.
+        '''
+        
+        for ct in range(secs):
+            print(msg.format(secs-ct) + "\r",end='')
+            await asyncio.sleep(1)
+        
+    #end method _countdown
+    
+    async def _watch_splash(self,run,executor,tracker,src,max_wait):
+        '''
+        Runs tracker.splash_step in executor until it returns a result,
+        paced by tracker.splash_delay, or until max_wait seconds passed on
+        the clock of src. The timeout is handled in executor too, after the
+        last step has finished, so that a step and tracker.splash_timeout
+        never run at the same time.
+        '''
+        
+        deadline = src.now() + max_wait
+        while src.now() < deadline:
+            splashing = await run(executor,tracker.splash_step,src)
+            if splashing is not None:
+                return splashing
+            delay = min(tracker.splash_delay(src),deadline - src.now())
+            if delay > 0:
+                await run(executor,src.sleep,delay)
+        return await run(executor,tracker.splash_timeout,src)
+        
+    #end method _watch_splash
+    
+    async def _loot(self,run,executor,mouser,x,y,start,tracker):
+        '''
+        Loots the bobber at x,y with loot_click in executor, on deadlines
+        measured from the splash frame timestamp start, then dumps the trace
+        of the cast of BobTracker tracker.
+        '''
+        
+        with self.metrics.timer('click'):
+            await run(executor,self.loot_click,mouser,x,y,start)
+        self.metrics.inc('clicks')
+        self.dump_trace(tracker)
+        
+    #end method _loot
+    
+#end class NatPagle
+
+# input lock of a FishingSupervisor worker process, see _init_session
+_session_lock = None
+
+def _init_session(lock):
+    '''
+    Initializer of FishingSupervisor worker processes. Keeps the shared input
+    lock, which can only be handed to a process when it starts.
+    '''
+    
+    global _session_lock
+    _session_lock = lock
+    
+#end function _init_session
+
+def _run_session(params):
+    '''
+    Runs one NatPagle fishing session in a FishingSupervisor worker process.
+    '''
+    
+    NatPagle(params,input_lock=_session_lock).gofishin()
+    
+#end function _run_session
+
+class FishingSupervisor(object):
+    
+    def __init__(self,sessions):
+        '''
+        Runs several independent NatPagle sessions at once, each in its own
+        process so that their screenshot analysis runs on separate cores
+        instead of sharing one GIL. sessions is a list of complete params
+        dicts, one per session, each with its own cap_area (and monitor for
+        get_search_area). Screen coordinates span all monitors, so a session
+        on the second monitor simply has a cap_area on it. All sessions share
+        one input lock, so casts and loot clicks of different sessions never
+        interleave. Sessions logging to the same cast_log, metrics_file,
+        record_dir or trace_dir, or using the same profile or bob_color_lut,
+        get a numbered one each.
+        '''
+        
+        self.sessions = []
+        for i, params in enumerate(sessions):
+            params = dict(params)
+            for key in ('cast_log','metrics_file','profile','record_dir',
+                        'trace_dir','bob_color_lut'):
+                path = params.get(key,None)
+                if path and sum(p.get(key,None) == path for p in sessions) > 1:
+                    root, ext = os.path.splitext(path)
+                    params[key] = root + '.' + str(i+1) + ext
+            self.sessions.append(params)
+        
+    #end method __init__
+    
+    def run(self):
+        '''
+        Starts every session and waits until all of them end. Ctrl+C stops
+        all of them. Returns list of the exception each session ended with,
+        or None if it ended normally.
+        '''
+        
+        ctx = multiprocessing.get_context('spawn')
+        lock = ctx.RLock()
+        pool = concurrent.futures.ProcessPoolExecutor(
+            len(self.sessions),mp_context=ctx,initializer=_init_session,
+            initargs=(lock,))
+        errors = []
+        try:
+            futures = [pool.submit(_run_session,params)
+                       for params in self.sessions]
+            for i, fut in enumerate(futures):
+                err = fut.exception()
+                if err is not None:
+                    print("|-- Session " + str(i+1) + " stopped: " + repr(err))
+                errors.append(err)
+        except KeyboardInterrupt:
+            # the sessions got the Ctrl+C too and stop on their own
+            print("Aborted all sessions")
+        finally:
+            pool.shutdown(wait=True,cancel_futures=True)
+        return errors
+        
+    #end method run
+    
+#end class FishingSupervisor
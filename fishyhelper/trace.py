@@ -0,0 +1,359 @@
+#!/usr/bin/python
+
+#Essential imports
+import time, os, sys, json, atexit, itertools, threading, _thread
+
+def trace_level(params):
+    '''
+    Returns the Tracer level set by params: 'debug' in developer mode, UD
+    param trace_level otherwise.
+    '''
+
+    if params.get('_dev_mode',False):
+        return 'debug'
+    return params.get('trace_level','info')
+
+#end function trace_level
+
+def shared_tracer(level='info'):
+    '''
+    Returns the Tracer of str level shared by everything that was not given
+    one of its own, e.g. BobTrackers made outside of a NatPagle. It is made
+    on first use, and flushed when the interpreter exits.
+    '''
+
+    with _shared_lock:
+        tracer = _shared.get(level,None)
+        if tracer is None:
+            tracer = _shared[level] = Tracer(level)
+            atexit.register(tracer.close)
+    return tracer
+
+#end function shared_tracer
+
+class Tracer(object):
+
+    levels = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+
+    def __init__(self,level='info',capacity=65536,interval=.25,stream=None):
+        '''
+        Structured event log of the fishing loop, cheap enough for the hot
+        loops. Events at or above level are appended to a ring of the last
+        capacity events and nothing else happens on the caller's thread:
+        a background thread prints the messages (to stream, stdout if None)
+        every interval seconds and writes trace dumps. Events are spans
+        (see span and complete) and instants (see instant and log), and any
+        stretch of the ring can be dumped in the Chrome trace event format
+        (see dump), to look at in chrome://tracing or ui.perfetto.dev.
+
+        Arguments:
+            str level[='info'] - least level of the events kept, one of
+                'debug', 'info', 'warning' and 'error'
+            int capacity[=65536] - events kept in the ring
+            float interval[=.25] - seconds between prints of the messages
+            file stream[=None] - where messages are printed
+        '''
+
+        self.level = self.levels[level]
+        self.capacity = capacity
+        self.interval = interval
+        self.stream = stream
+        self.pid = os.getpid()
+        self.ring = [None]*capacity
+        # number of the event in each slot of the ring, -1 if empty. It is
+        # set after the event, so a slot whose number is not the one looked
+        # for is still being written or was overwritten
+        self.seqs = [-1]*capacity
+        # next(self._count) is atomic, so threads never share a slot
+        self._count = itertools.count()
+        # next event to print. Only the writer (holding self._lock) reads
+        # or moves it
+        self.printed = 0
+        self.threads = {} # thread ident -> name
+        self._dumps = [] # (path,start,end) waiting for the writer thread
+        self._thread = None
+        self._closing = None
+        self._lock = _thread.allocate_lock() # one _write at a time
+
+    #end method __init__
+
+    def enabled(self,level):
+        '''
+        Returns True if events of str level are kept.
+        '''
+
+        return self.levels[level] >= self.level
+
+    #end method enabled
+
+    def _add(self,level,ts,dur,name,cat,msg,args):
+        '''
+        Appends one event to the ring.
+        '''
+
+        tid = _thread.get_ident()
+        if tid not in self.threads:
+            self.threads[tid] = threading.current_thread().name
+        i = next(self._count)
+        slot = i % self.capacity
+        self.ring[slot] = (ts,dur,name,cat,level,tid,msg,args)
+        self.seqs[slot] = i
+        if msg is not None and self._thread is None:
+            self._start()
+
+    #end method _add
+
+    def complete(self,name,start,dur,level='info',cat='stage',**args):
+        '''
+        Adds a span name that started at time.perf_counter() start and took
+        dur seconds, with args shown in the trace.
+        '''
+
+        if self.levels[level] >= self.level:
+            self._add(level,start,dur,name,cat,None,args)
+
+    #end method complete
+
+    def span(self,name,level='info',cat='stage',**args):
+        '''
+        Returns a context manager that adds the time spent in it as span
+        name.
+        '''
+
+        if self.levels[level] < self.level:
+            return _NO_SPAN
+        return _Span(self,name,level,cat,args)
+
+    #end method span
+
+    def instant(self,name,level='info',cat='event',**args):
+        '''
+        Adds an instant event name, such as an input event.
+        '''
+
+        if self.levels[level] >= self.level:
+            self._add(level,time.perf_counter(),None,name,cat,None,args)
+
+    #end method instant
+
+    def log(self,level,msg,**args):
+        '''
+        Adds str msg as an instant event, printed by the writer thread.
+        '''
+
+        if self.levels[level] >= self.level:
+            self._add(level,time.perf_counter(),None,'log','log',msg,args)
+
+    #end method log
+
+    def debug(self,msg,**args):
+        self.log('debug',msg,**args)
+    #end method debug
+
+    def info(self,msg,**args):
+        self.log('info',msg,**args)
+    #end method info
+
+    def warning(self,msg,**args):
+        self.log('warning',msg,**args)
+    #end method warning
+
+    def events(self,start=None,end=None):
+        '''
+        Returns list of the events in the ring that started between
+        time.perf_counter() times start and end (all if None), oldest
+        first.
+        '''
+
+        evs = sorted((seq, ev) for seq, ev in zip(list(self.seqs),
+                                                  list(self.ring))
+                     if seq >= 0 and ev is not None)
+        return [ev for seq, ev in evs if
+                (start is None or ev[0] >= start) and
+                (end is None or ev[0] <= end)]
+
+    #end method events
+
+    def chrome_trace(self,start=None,end=None):
+        '''
+        Returns dict of the events between start and end in the Chrome trace
+        event format. Times are in microseconds from start (or the first
+        event).
+        '''
+
+        evs = self.events(start,end)
+        t0 = start if start is not None else (evs[0][0] if evs else 0.)
+        out = [{'name': 'thread_name','ph': 'M','pid': self.pid,'tid': tid,
+                'args': {'name': name}}
+               for tid, name in list(self.threads.items())]
+        for ts, dur, name, cat, level, tid, msg, args in evs:
+            ev = {'name': name if msg is None else msg,'cat': cat,
+                  'ts': 1e6*(ts-t0),'pid': self.pid,'tid': tid,
+                  'args': dict(args,level=level)}
+            if dur is None:
+                ev['ph'], ev['s'] = 'i', 't'
+            else:
+                ev['ph'], ev['dur'] = 'X', 1e6*dur
+            out.append(ev)
+        return {'traceEvents': out,'displayTimeUnit': 'ms'}
+
+    #end method chrome_trace
+
+    def dump(self,path,start=None,end=None):
+        '''
+        Writes the events between start and end (e.g. one cast) to the
+        Chrome trace JSON file path, from the writer thread. Returns at
+        once.
+        '''
+
+        if end is None:
+            end = time.perf_counter()
+        self._dumps.append((path,start,end))
+        if self._thread is None:
+            self._start()
+
+    #end method dump
+
+    def flush(self):
+        '''
+        Prints the waiting messages and writes the waiting dumps now.
+        '''
+
+        self._write()
+
+    #end method flush
+
+    def close(self):
+        '''
+        Flushes and stops the writer thread.
+        '''
+
+        if self._thread is not None:
+            self._closing.set()
+            self._thread.join()
+            self._thread = None
+        self._write()
+
+    #end method close
+
+    def _start(self):
+        '''
+        Starts the writer thread.
+        '''
+
+        self._closing = threading.Event()
+        self._thread = threading.Thread(
+            target=self._write_loop,name='Tracer',daemon=True)
+        self._thread.start()
+
+    #end method _start
+
+    def _write_loop(self):
+        '''
+        Writer thread. Prints messages and writes dumps every self.interval
+        seconds until closed.
+        '''
+
+        while not self._closing.wait(self.interval):
+            self._write()
+
+    #end method _write_loop
+
+    def _write(self):
+        '''
+        Prints the messages added since the last call, and writes the
+        waiting dumps.
+        '''
+
+        with self._lock:
+            self._write_locked()
+
+    #end method _write
+
+    def _write_locked(self):
+        '''
+        _write, with self._lock held.
+        '''
+
+        stream = self.stream or sys.stdout
+        i = self.printed
+        while True:
+            slot = i % self.capacity
+            seq = self.seqs[slot]
+            if seq < i:
+                # not added yet, or still being written
+                break
+            if seq > i:
+                # overwritten before it was printed. Skips to the oldest
+                # event the ring can still hold
+                oldest = max(self.seqs) - self.capacity + 1
+                stream.write("|-- " + str(oldest - i) + \
+                             " trace events dropped\n")
+                i = oldest
+                continue
+            ev = self.ring[slot]
+            if self.seqs[slot] != i:
+                continue # overwritten while it was read
+            if ev[6] is not None:
+                stream.write(ev[6] + '\n')
+            i += 1
+        self.printed = i
+        stream.flush()
+        while self._dumps:
+            path, start, end = self._dumps.pop(0)
+            os.makedirs(os.path.dirname(path) or '.',exist_ok=True)
+            with open(path,'w') as f:
+                json.dump(self.chrome_trace(start,end),f)
+
+    #end method _write_locked
+
+#end class Tracer
+
+class _Span(object):
+    '''
+    Context manager of Tracer.span.
+    '''
+
+    __slots__ = ('tracer','name','level','cat','args','start')
+
+    def __init__(self,tracer,name,level,cat,args):
+        self.tracer = tracer
+        self.name = name
+        self.level = level
+        self.cat = cat
+        self.args = args
+    #end method __init__
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    #end method __enter__
+
+    def __exit__(self,*exc):
+        self.tracer._add(self.level,self.start,
+                         time.perf_counter()-self.start,self.name,self.cat,
+                         None,self.args)
+    #end method __exit__
+
+#end class _Span
+
+class _NoSpan(object):
+    '''
+    Span of a level that is not kept. Does nothing.
+    '''
+
+    def __enter__(self):
+        return self
+    #end method __enter__
+
+    def __exit__(self,*exc):
+        pass
+    #end method __exit__
+
+#end class _NoSpan
+
+_NO_SPAN = _NoSpan()
+
+# Tracers of shared_tracer, by level
+_shared = {}
+_shared_lock = threading.Lock()
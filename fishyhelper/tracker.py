@@ -0,0 +1,881 @@
+#!/usr/bin/python
+
+#Essential imports
+import time
+import numpy as np
+from .analysis import probe_grid, probe_means, cluster_hits, \
+    match_template, ColorLUT, FrameReducer, BackgroundModel, ChangeDetector
+from .geometry import rect_bounds
+from .capture import _frame_source, FramePacer
+from .inputs import MacMouser
+from .metrics import Metrics
+from .trace import shared_tracer, trace_level
+
+class BobTracker(object):
+    
+    def __init__(self,params,paramtracker,mouser=None,background=None,
+                 metrics=None,pacer=None,tracer=None,color_lut=None):
+        '''
+        Instantiates BobTracker, which is responsible for finding the bobber
+        on the screen and waiting for a splash event. Takes an optional mouser
+        object to use instead of the OS default, e.g. a NullMouser when
+        running headless against a SyntheticFrameSource, an optional
+        BackgroundModel of cap_area that find_bob diffs against instead of a
+        single baseline screenshot, an optional Metrics object that
+        stage timings and counters are recorded in, and an optional
+        FramePacer that paces the splash wait and learns the bite times
+        (one is made from the UD params if None; pass the same one to every
+        BobTracker of a session to keep what it learned). Messages, spans of
+        the stages and input events go to Tracer tracer, which prints the
+        messages from a background thread (the shared_tracer of UD param
+        trace_level if None). With UD param bob_color_lut set, find_bob searches
+        a bobber likelihood map of ColorLUT color_lut (loaded from that file
+        if None) instead of brightness, once the table has learned from
+        color_lut_min_casts casts that ended in a splash.
+        '''
+        
+        # parameter dictionary
+        self.params = params
+
+        # mouse handler
+        if mouser is not None:
+            self.mouser = mouser
+        elif params['os'] == "posix": #Mac OS X
+            self.mouser = MacMouser()
+        else:
+            raise Exception("No OS other than Mac OS X supported at this time.")
+        
+        # takes a ParamTracker object
+        self.pt = paramtracker
+        
+        # structured event log, printed off the hot loops
+        self.trace = tracer if tracer is not None else \
+            shared_tracer(trace_level(params))
+        
+        # stage timings and counters, in memory only if none given
+        self.metrics = metrics if metrics is not None else \
+            Metrics(tracer=self.trace)
+        
+        # preallocated baseline screenshot of cap_area, reused across casts
+        self.baseline = None
+        
+        # rolling background of cap_area, maintained between casts
+        self.background = background
+        # rolling background of the splash area during wait_for_splash
+        self.splash_bg = None
+        # timestamp of the frame that showed the last splash
+        self.splash_t = None
+        
+        # blobs of hits found by the last find_bob call, best first, and
+        # the color differences of its hits in every screenshot
+        self.blobs = []
+        self.hit_diffs = None
+        
+        # reduces screenshots to one integer plane before analysis
+        self.reducer = FrameReducer(
+            params.get('reduce_mode','luma'),params.get('reduce_stride',1))
+        # heavily subsampled reducer for the coarse level of pyramid search
+        self.coarse_reducer = FrameReducer(
+            params.get('reduce_mode','luma'),
+            params.get('reduce_stride',1)*params.get('pyramid_factor',8))
+        # full resolution reducer for template matching the bobber
+        self.track_reducer = FrameReducer(params.get('reduce_mode','luma'))
+        
+        # bobber color classifier and the reducers of the search that use
+        # it, if UD param bob_color_lut
+        if color_lut is None and params.get('bob_color_lut',None):
+            color_lut = ColorLUT.load(params['bob_color_lut']) or \
+                ColorLUT(params.get('color_lut_bits',5))
+        self.color_lut = color_lut
+        if color_lut is not None:
+            self.lut_reducer = FrameReducer(
+                'lut',params.get('reduce_stride',1),color_lut)
+            self.lut_coarse_reducer = FrameReducer(
+                'lut',params.get('reduce_stride',1)*
+                params.get('pyramid_factor',8),color_lut)
+        # reducers of the current search, see search_bob
+        self.search_reducer = self.reducer
+        self.search_coarse_reducer = self.coarse_reducer
+        # bobber and background crops of the splash area, learned from if
+        # the cast ends in a splash
+        self.color_sample = None
+        
+        # bobber patch that the splash ROI follows, if UD param splash_track
+        self.template = None
+        
+        # paces the frames of the splash wait around the usual bite times
+        if pacer is None:
+            pacer = FramePacer(
+                params.get('splash_fps',60.),params.get('splash_min_fps',5.),
+                params.get('splash_cpu_budget',.25),
+                params.get('bite_window_margin',1.))
+        self.pacer = pacer
+        # clock time of the last cast, and CPU seconds of the last splash
+        # frame
+        self.cast_t = None
+        self.step_cost = 0.
+        # time.perf_counter() of the last cast, where its trace starts, and
+        # how its splash wait ended
+        self.cast_perf = None
+        self.outcome = None
+        
+    #end method __init__
+    
+    def find_bob(self,res=40,source=None,all_blobs=False):
+        '''
+        Finds the bobber via difference map method. Takes an initial screenshot
+        in area defined by arg cap_area before bobber is on screen. Then presses
+        '1' to cast line, waits 2 seconds, and starts sampling 2D points in the
+        cap_area grid. find_bob takes a screenshot of every column of sample
+        points and looks at the square with sides 2*res around each point.
+        Each sample point is separated by res in both x and y axes. Calculates the mean color values of the screenshot at the
+        sample point, and of the cropped initial screenshot. If the
+        difference between the mean color values of the sample point screenshot
+        and the initial screenshot is above UD param bob_color_diff, find_bob
+        logs a hit at coordinates x and y. In the past, find_bob has found false
+        positives if there are other changes to the cap_area, such as a player
+        passing by, another fisher, or a water effect. To mitigate this, find_bob
+        takes UD param sct_check_iters more screenshots and only logs a hit if
+        all of them pass the difference threshold. Calculates the arithmetic
+        mean point of all the hits, weighted by the magnitude of the difference
+        of means, moves the mouse to this mean location, and returns these
+        coordinates as tuple. If UD param bob_localize is 'blob', hits are
+        first grouped into connected blobs (see cluster_hits) and only the
+        best scoring blob is averaged. Blobs are scored by how close their
+        size is to the bobber's, and blobs that move more than UD param
+        bob_max_motion pixels between the verification screenshots are
+        dropped as passing players, unless all of them do, in which case
+        the best scoring one is kept. The bobber's size is UD param
+        bob_size. All kept blobs are in self.blobs. If UD
+        param bob_search_mode is 'integral', the whole cap_area is grabbed
+        once instead and every probe is scored from summed-area tables in one
+        pass (see _integral_search). If it is
+        'pyramid', only the hottest cells of a subsampled difference map are
+        scored at full resolution (see _pyramid_search).
+
+        Arguments:
+            dict cap_area - dictionary defining the screenshot capture area. See
+                params section of herefishy.py for details.
+            int res[=40] - probe size in pixels. Determines grid spacing as
+                well as the size of the screenshot taken at each sample point
+            FrameSource source[=None] - frame source to take screenshots
+                from. A new MSSFrameSource is used if None
+            bool all_blobs[=False] - return all blobs of hits instead
+        Returns:
+            tuple - coordinates of find_bob's best guess of the bobber location
+                (or list of blob dicts from cluster_hits if all_blobs)
+        '''
+        
+        with _frame_source(source) as src: # start taking screenshots
+            self.take_baseline(src)
+            self.cast(src)
+            src.sleep(2) #wait for bobber to appear
+            return self.search_bob(src,res,all_blobs)
+        
+    #end method find_bob
+    
+    def take_baseline(self,src):
+        '''
+        Takes the initial screenshot of cap_area that find_bob compares
+        against, before the bobber is on screen. It is kept in self.baseline,
+        a buffer of our own since frames from a CaptureSession are reused.
+        With a BackgroundModel, the screenshot is added to the model and the
+        baseline is the model's background instead.
+        '''
+        
+        self.learn_colors()
+        cap_area = self.params['cap_area']
+        shape = (cap_area['height'],cap_area['width'],4)
+        if self.baseline is None or self.baseline.shape != shape:
+            self.baseline = np.empty(shape,dtype=np.uint8)
+        with self.metrics.timer('baseline'):
+            if self.background is None:
+                return src.grab(cap_area,out=self.baseline)
+            self.background.update(src.grab(cap_area))
+            return self.background.background(out=self.baseline)
+        
+    #end method take_baseline
+    
+    def cast(self,src):
+        '''
+        Presses '1' to cast line, and marks the cast on src.
+        '''
+        
+        self.cast_perf = time.perf_counter()
+        with self.metrics.timer('cast'):
+            # press '1' key using Quartz CoreGraphics
+            self.mouser.presskey(0x12)
+        self.trace.instant('presskey',key=0x12)
+        src.mark('cast')
+        self.cast_t = src.now()
+        self.outcome = None
+        self.metrics.inc('casts')
+        if self.pt is not None:
+            self.pt.log_cast(self.cast_t)
+        
+    #end method cast
+    
+    def search_bob(self,src,res=40,all_blobs=False):
+        '''
+        Second half of find_bob, once the bobber is on screen: searches the
+        cap_area for differences to self.baseline and locates the bobber.
+        Arguments and return value are the same as find_bob.
+        '''
+        
+        start = time.perf_counter()
+        # pre-calculate the screen capture area (cap_area) in forms that are
+        # convenient for MSS, Numpy array splicing, and for loops
+        cap_area = self.params['cap_area']
+        area_pts = np.array([
+            [cap_area['left'], cap_area['top']],
+            [cap_area['left'] + cap_area['width'],cap_area['top'] + cap_area['height']]
+            ])
+        bounds = rect_bounds(area_pts)
+        init_sct = self.baseline
+        
+        # search the bobber likelihood map once the color table has learned
+        # enough, brightness until then
+        lut = self.color_lut
+        if lut is not None and \
+           lut.samples >= self.params.get('color_lut_min_casts',3):
+            self.search_reducer = self.lut_reducer
+            self.search_coarse_reducer = self.lut_coarse_reducer
+        else:
+            self.search_reducer = self.reducer
+            self.search_coarse_reducer = self.coarse_reducer
+        
+        mode = self.params.get('bob_search_mode','probe')
+        if mode == 'integral':
+            bob_loc_lst, weight_lst = self._integral_search(
+                src,init_sct,res)
+        elif mode == 'pyramid':
+            bob_loc_lst, weight_lst = self._pyramid_search(
+                src,init_sct,res)
+        else:
+            bob_loc_lst, weight_lst = self._probe_search(
+                src,init_sct,res,bounds)
+        # a bobber about bob_size pixels across is hit by the probes with
+        # sides 2*res whose squares overlap it, bob_size//res + 2 of them
+        # along each axis on the stride res grid. Blobs moving more than
+        # bob_max_motion pixels between the verification screenshots are
+        # passing players, not the bobber, unless every blob moves that
+        # much, e.g. a bobber rocking on rough water
+        localize = self.params.get('bob_localize','blob')
+        footprint = (self.params.get('bob_size',28)//res + 2)**2
+        max_motion = self.params.get('bob_max_motion',5.)
+        self.blobs = cluster_hits(
+            bob_loc_lst,weight_lst,res,grab_weights=self.hit_diffs,
+            footprint=footprint)
+        still = [blob for blob in self.blobs if blob['motion'] <= max_motion]
+        if self.blobs and not still:
+            self.trace.info("|-- All blobs moved, using the best one")
+        self.blobs = still or self.blobs[:1]
+        # return false if no color difference was detected
+        if len(bob_loc_lst) == len(weight_lst) == 0 or \
+           (localize == 'blob' and not self.blobs):
+            self.metrics.observe('search',time.perf_counter()-start)
+            self.metrics.inc('no_bobber')
+            if self.pt is not None:
+                self.pt.log_find_bob(time.perf_counter()-start,0,0,None,
+                                     src.now())
+            return [] if all_blobs else False
+        if all_blobs:
+            return self.blobs
+        if localize == 'blob':
+            # centroid of the best scoring blob of hits. A passing player
+            # elsewhere in the area makes a separate, moving blob and is
+            # ignored
+            x, y = self.blobs[0]['x'], self.blobs[0]['y']
+            if len(self.blobs) > 1:
+                self.trace.info("|-- " + str(len(self.blobs)) + \
+                                " blobs found, using the best one")
+        else:
+            # convert to arrays
+            bob_loc_arr = np.array(bob_loc_lst)
+            weight_arr = np.array(weight_lst)
+            # calculate the weighted average of the difference map
+            x = np.sum(np.multiply(weight_arr,bob_loc_arr[:,0]))/np.sum(weight_arr)
+            y = np.sum(np.multiply(weight_arr,bob_loc_arr[:,1]))/np.sum(weight_arr)
+        self.metrics.observe('search',time.perf_counter()-start)
+        self.metrics.inc('hits',len(bob_loc_lst))
+        if self.pt is not None:
+            self.pt.log_find_bob(time.perf_counter()-start,len(bob_loc_lst),
+                                 len(self.blobs),(x,y),src.now())
+        # move mouse to estimated location and return tuple coords
+        self.mouser.mousemove(x,y)
+        self.trace.instant('mousemove',x=float(x),y=float(y))
+        return (x,y)
+        
+    #end method search_bob
+    
+    def _probe_search(self,src,init_sct,res,bounds):
+        '''
+        Original find_bob search. Walks the cap_area grid one column of
+        sample points at a time, and compares the square with sides 2*res
+        around every point to the same crop of init_sct. Each column is
+        taken in one screenshot, so that the walk stays well within the
+        time the bobber floats. Candidates are verified together by
+        _verify_candidates as soon as a column without candidates closes
+        the blob they are part of, while the change that made them is still
+        on screen, rather than after the whole walk. See find_bob docs for
+        details.
+        
+        Arguments:
+            FrameSource src - open frame source
+            ndarray init_sct - screenshot of cap_area taken before casting
+            int res - probe size in pixels
+            tuple bounds - (x_min,x_max,y_min,y_max) of cap_area
+        Returns:
+            tuple - (bob_loc_lst,weight_lst) of verified hits and their mean
+                color differences. The color differences of the hits in
+                every screenshot are kept in self.hit_diffs
+        '''
+        
+        cap_area = self.params['cap_area']
+        red = self.search_reducer
+        # sample points whose probe lies inside cap_area. Near the edge of
+        # the screen the probe would be cut off and cannot be compared
+        ys = np.arange(bounds[2],bounds[3],res)
+        ys = ys[(ys-res >= cap_area['top']) &
+                (ys+res <= cap_area['top']+cap_area['height'])]
+        # unverified candidates, and the verified hits with the color
+        # differences of all their screenshots
+        cand_x = []
+        cand_y = []
+        cand_diff = []
+        bob_loc_lst = []
+        weight_lst = []
+        hit_diffs = []
+        def verify():
+            locs, weights = self._verify_candidates(
+                src,init_sct,np.array(cand_x,dtype=int),
+                np.array(cand_y,dtype=int),np.array(cand_diff),res)
+            bob_loc_lst.extend(locs)
+            weight_lst.extend(weights)
+            if len(locs):
+                hit_diffs.append(self.hit_diffs)
+            del cand_x[:], cand_y[:], cand_diff[:]
+        for x in range(bounds[0],bounds[1],res): # scroll down screen
+            if x-res < cap_area['left'] or \
+               x+res > cap_area['left']+cap_area['width']:
+                continue
+            # take one screenshot of the column of squares with sides
+            # 2*res around its sample points, and crop the init_sct to the
+            # same size and location
+            strip = {
+                "top": cap_area['top'],
+                "left": x-res,
+                "width": 2*res,
+                "height": cap_area['height']}
+            lsct = src.grab(strip)
+            cropped = init_sct[:,x-res-cap_area['left']:
+                                 x+res-cap_area['left']]
+            xs = np.array([x])
+            diff = (probe_means(red.sat(lsct),xs,ys,strip,res,red.stride,
+                                peak=red.peak) -
+                    probe_means(red.sat(cropped),xs,ys,strip,res,red.stride,
+                                peak=red.peak))[:,0] * red.scale
+            # more dev mode printing
+            if self.trace.enabled('debug'):
+                self.trace.debug(str(diff))
+            # asks if the difference in means is above the param color
+            # value threshold
+            hits = np.flatnonzero(diff > self.params['bob_color_diff'])
+            for i in hits:
+                # moves mouse if in dev mode. slower this way
+                if self.params['_dev_mode']:
+                    self.mouser.mousemove(x,ys[i])
+                cand_x.append(x)
+                cand_y.append(ys[i])
+                cand_diff.append(diff[i])
+            if len(hits) == 0 and cand_x:
+                verify()
+        if cand_x:
+            verify()
+        # the hits of separate verifications stand side by side, each
+        # with the screenshots of its own verification
+        self.hit_diffs = np.concatenate(hit_diffs,axis=1) if hit_diffs \
+            else np.zeros((1,0))
+        return bob_loc_lst, weight_lst
+        
+    #end method _probe_search
+    
+    def _integral_search(self,src,init_sct,res):
+        '''
+        Whole-frame find_bob search. Grabs the entire cap_area once, builds a
+        summed-area table for both init_sct and the new frame, and computes
+        the mean color difference of every probe in the cap_area grid in a
+        single Numpy pass. Probes are the same squares with sides 2*res that
+        _probe_search samples, so bob_color_diff keeps its meaning. Candidates
+        are then verified together by _verify_candidates.
+        
+        Arguments:
+            FrameSource src - open frame source
+            ndarray init_sct - screenshot of cap_area taken before casting
+            int res - probe size in pixels
+        Returns:
+            tuple - (bob_loc_lst,weight_lst) of verified hits and their mean
+                color differences
+        '''
+        
+        cap_area = self.params['cap_area']
+        red = self.search_reducer
+        xs, ys = probe_grid(cap_area,res)
+        init_means = probe_means(
+            red.sat(init_sct),xs,ys,cap_area,res,red.stride,peak=red.peak)
+        diff = (probe_means(
+            red.sat(src.grab(cap_area)),xs,ys,cap_area,res,red.stride,
+            peak=red.peak) - init_means) * red.scale
+        if self.trace.enabled('debug'):
+            self.trace.debug(str(diff))
+        # indices of probes above the color value threshold
+        iy, ix = np.nonzero(diff > self.params['bob_color_diff'])
+        return self._verify_candidates(
+            src,init_sct,xs[ix],ys[iy],diff[iy,ix],res)
+        
+    #end method _integral_search
+    
+    def _pyramid_search(self,src,init_sct,res):
+        '''
+        Coarse-to-fine find_bob search. Grabs the entire cap_area once and
+        computes the difference map of probes with sides 4*res on the frame
+        pair subsampled by params['pyramid_factor']. Only the
+        params['pyramid_top_k'] hottest coarse cells, no two of them adjacent,
+        are then refined with the regular probes with sides 2*res at full resolution, so search cost
+        stays close to constant as the screen grows. Candidates are verified
+        together by _verify_candidates.
+        
+        Arguments:
+            FrameSource src - open frame source
+            ndarray init_sct - screenshot of cap_area taken before casting
+            int res - probe size in pixels
+        Returns:
+            tuple - (bob_loc_lst,weight_lst) of verified hits and their mean
+                color differences
+        '''
+        
+        cap_area = self.params['cap_area']
+        frame = src.grab(cap_area)
+        
+        # coarse difference map on the subsampled frame pair
+        coarse = self.search_coarse_reducer
+        cxs, cys = probe_grid(cap_area,2*res)
+        cdiff = probe_means(
+            coarse.sat(frame),cxs,cys,cap_area,2*res,coarse.stride,
+            peak=coarse.peak) - \
+            probe_means(
+            coarse.sat(init_sct),cxs,cys,cap_area,2*res,coarse.stride,
+            peak=coarse.peak)
+        if self.trace.enabled('debug'):
+            self.trace.debug(str(cdiff*coarse.scale))
+        # hottest cells, at most one per 3x3 neighbourhood, so that one big
+        # passing player cannot take every spot from the bobber
+        k = self.params.get('pyramid_top_k',4)
+        hot = []
+        for i in np.argsort(-cdiff,axis=None):
+            if len(hot) == k or cdiff.flat[i] <= 0:
+                break
+            iy, ix = np.unravel_index(i,cdiff.shape)
+            if all(abs(iy-jy) > 1 or abs(ix-jx) > 1 for jy, jx in hot):
+                hot.append((iy,ix))
+        
+        # refine every hot cell with the full resolution probes that overlap
+        # it, scored on crops of the frame pair around the cell
+        red = self.search_reducer
+        xs, ys = probe_grid(cap_area,res)
+        cap_bounds = rect_bounds(np.array([
+            [cap_area['left'],cap_area['top']],
+            [cap_area['left']+cap_area['width'],
+             cap_area['top']+cap_area['height']]]))
+        cands = {} # (x,y) -> color difference
+        for iy, ix in hot:
+            cx, cy = cxs[ix], cys[iy]
+            x_min, x_max, y_min, y_max = rect_bounds(np.array([
+                [max(cx-3*res,cap_bounds[0]),max(cy-3*res,cap_bounds[2])],
+                [min(cx+3*res,cap_bounds[1]),min(cy+3*res,cap_bounds[3])]]))
+            sel_x = xs[(xs-res >= x_min) & (xs+res <= x_max)]
+            sel_y = ys[(ys-res >= y_min) & (ys+res <= y_max)]
+            if len(sel_x) == 0 or len(sel_y) == 0:
+                continue
+            region = {
+                'top': y_min,
+                'left': x_min,
+                'width': x_max-x_min,
+                'height': y_max-y_min}
+            rows = slice(y_min-cap_area['top'],y_max-cap_area['top'])
+            cols = slice(x_min-cap_area['left'],x_max-cap_area['left'])
+            diff = (probe_means(
+                red.sat(frame[rows,cols]),sel_x,sel_y,region,res,red.stride,
+                peak=red.peak) - \
+                probe_means(
+                red.sat(init_sct[rows,cols]),sel_x,sel_y,region,res,
+                red.stride,peak=red.peak)) * red.scale
+            for jy, jx in zip(*np.nonzero(diff > self.params['bob_color_diff'])):
+                cands[(sel_x[jx],sel_y[jy])] = diff[jy,jx]
+        pts = np.array(list(cands.keys()),dtype=int).reshape((-1,2))
+        return self._verify_candidates(
+            src,init_sct,pts[:,0],pts[:,1],
+            np.array(list(cands.values())),res)
+        
+    #end method _pyramid_search
+    
+    def _verify_candidates(self,src,init_sct,xs,ys,diffs,res):
+        '''
+        Color difference passed the threshold at the candidate points xs,ys.
+        These may be the bobber, but could also be a water effect or a passing
+        player. Takes params['sct_check_iters'] more screenshots of the
+        bounding box of all candidate probes at once, pausing
+        params['sct_check_pause'] seconds between them, and drops every
+        candidate whose difference falls below the threshold in any of them.
+        Verification therefore costs the same handful of grabs no matter how
+        many candidates there are.
+        
+        Arguments:
+            FrameSource src - open frame source
+            ndarray init_sct - screenshot of cap_area taken before casting
+            ndarray xs, ys - screen coordinates of the candidate points
+            ndarray diffs - first-pass color difference of every candidate
+            int res - probe size in pixels
+        Returns:
+            tuple - (bob_loc_lst,weight_lst) of verified hits and the mean
+                color differences over all their screenshots. The color
+                differences of the hits in every screenshot are kept in
+                self.hit_diffs, an (M,N) ndarray
+        '''
+        
+        start = time.perf_counter()
+        cap_area = self.params['cap_area']
+        red = self.search_reducer
+        diffs = [diffs]
+        for i in range(self.params['sct_check_iters']):
+            if len(xs) == 0:
+                break
+            if i > 0:
+                src.sleep(self.params['sct_check_pause'])
+            # bounding box of the remaining candidate probes
+            box = {
+                'top': int(np.min(ys)) - res,
+                'left': int(np.min(xs)) - res,
+                'width': int(np.max(xs) - np.min(xs)) + 2*res,
+                'height': int(np.max(ys) - np.min(ys)) + 2*res}
+            cropped = init_sct[
+                box['top']-cap_area['top']:
+                box['top']-cap_area['top']+box['height'],
+                box['left']-cap_area['left']:
+                box['left']-cap_area['left']+box['width']]
+            init_means = probe_means(
+                red.sat(cropped),xs,ys,box,res,red.stride,grid=False,
+                peak=red.peak)
+            new_diff = (probe_means(
+                red.sat(src.grab(box)),xs,ys,box,res,red.stride,
+                grid=False,peak=red.peak) - init_means) * red.scale
+            keep = new_diff >= self.params['bob_color_diff']
+            xs, ys = xs[keep], ys[keep]
+            diffs = [d[keep] for d in diffs] + [new_diff[keep]]
+        self.metrics.observe('verify',time.perf_counter()-start)
+        self.hit_diffs = np.array(diffs)
+        weights = np.mean(diffs,axis=0)
+        bob_loc_lst = []
+        weight_lst = []
+        for x, y, w in zip(xs,ys,weights):
+            self.trace.info("|-- Color difference of " + str(w) + " detected")
+            bob_loc_lst.append([x,y])
+            weight_lst.append(w)
+            # noticeable pause for each hit in dev mode
+            if self.params['_dev_mode']:
+                self.mouser.mousemove(x,y)
+                src.sleep(.1)
+        return bob_loc_lst, weight_lst
+        
+    #end method _verify_candidates
+    
+    def wait_for_splash(self,x,y,source=None):
+        '''
+        Waits for splash event at estimated bobber location x,y. Takes an
+        initial screenshot and tracks the change in the mean color value
+        in a square area with sides splash_radius around x,y. Similar algorighm
+        to find_bob (see above docs). Returns True when difference of mean color
+        value surpasses param splash_diff_thresh, or False if it falls below
+        param bob_fade_thresh. Frames are paced by self.pacer (see
+        splash_delay).
+        
+        Arguments:
+            float x - x coordinate of estimated bobber location
+            float y - y coordinate of estimated bobber location
+            FrameSource source[=None] - frame source to take screenshots
+                from. A new MSSFrameSource is used if None
+        Returns:
+            boolean - see above
+        '''
+        
+        # start taking screenshots
+        with _frame_source(source) as src:
+            self.splash_start(src,x,y)
+            start = src.now()
+            # sets a hard time cap on how long to wait for splash
+            while src.now() - start < self.params['max_wait_time']:
+                splashing = self.splash_step(src)
+                if splashing is not None:
+                    return splashing
+                src.sleep(self.splash_delay(src))
+            return self.splash_timeout(src)
+    
+    #end method wait_for_splash
+    
+    def splash_start(self,src,x,y):
+        '''
+        First half of wait_for_splash. Sets up the splash area around x,y and
+        takes the initial screenshot that later frames are compared to.
+        '''
+        
+        self.splash_t0 = time.perf_counter()
+        # pre-arrange cap_area in most convenient format for MSS and
+        # Numpy array slicing
+        srad = self.params['splash_radius']
+        self.splash_area = {
+            "top": y-srad,
+            "left": x-srad,
+            "width": 2*srad,
+            "height": 2*srad}
+        bob_box = [
+            [x-srad,y-srad],
+            [x-srad,y+srad],
+            [x+srad,y+srad],
+            [x+srad,y-srad]]
+        
+        # DEV: loop around box once
+        for pt in bob_box:
+            src.sleep(.2)
+            self.mouser.mousemove(pt[0],pt[1])
+        src.sleep(.2)
+        # get cursor out of the way
+        self.mouser.mousemove(x-200,y-200)
+        self.trace.instant('mousemove',x=float(x-200),y=float(y-200))
+        # decides on splash or fade from the series of deltas
+        params = self.params
+        self.detector = ChangeDetector(
+            params.get('splash_detect','thresh'),params['splash_diff_thresh'],
+            params['bob_fade_thresh'],params.get('splash_z',6.),
+            params.get('splash_drift',2.),params.get('splash_alpha_shift',5))
+        # the splash area grabs run from here to the outcome mark of
+        # _splash_end, for recorders that only keep those (FrameRecorder)
+        src.mark('splash_start')
+        # paces the frames from here on. Bite times count from the cast, or
+        # from now if the cast was not pressed by this tracker
+        self.pacer.start(src.now())
+        if self.cast_t is None:
+            self.cast_t = src.now()
+        # or follows the bobber with a tight ROI
+        self.template = None
+        self.color_sample = None
+        # reset before the tracking branch returns, so a background of the
+        # last cast is never compared against the tracked ROI
+        self.splash_bg = None
+        if self.params.get('splash_track',False):
+            self._track_start(src,x,y)
+            if self.color_lut is not None:
+                self._sample_colors(src.grab(self.splash_area))
+            return
+        # takes initial screenshot and calculates the mean
+        init_sct = src.grab(self.splash_area)
+        self.init_mean = self.reducer.mean(init_sct)
+        if self.color_lut is not None:
+            self._sample_colors(init_sct)
+        # or starts a rolling background of the splash area from it
+        if self.params.get('bg_model',None):
+            self.splash_bg = BackgroundModel(
+                self.params['bg_model'],self.params.get('bg_window',8),
+                self.params.get('bg_alpha_shift',3))
+            self.splash_bg.update(init_sct)
+        
+    #end method splash_start
+    
+    def _sample_colors(self,frame):
+        '''
+        Keeps copies of BGRA ndarray frame of the splash area, showing the
+        bobber, and of the same crop of self.baseline in self.color_sample,
+        for self.color_lut to learn from if the cast ends in a splash. Skips
+        splash areas that are not entirely inside cap_area.
+        '''
+        
+        cap_area = self.params['cap_area']
+        top = int(self.splash_area['top']) - cap_area['top']
+        left = int(self.splash_area['left']) - cap_area['left']
+        h, w = frame.shape[:2]
+        if self.baseline is None or top < 0 or left < 0 or \
+           top + h > self.baseline.shape[0] or \
+           left + w > self.baseline.shape[1]:
+            return
+        self.color_sample = (
+            np.array(frame),np.array(self.baseline[top:top+h,left:left+w]))
+        
+    #end method _sample_colors
+    
+    def learn_colors(self):
+        '''
+        Teaches self.color_lut the bobber colors of the last cast, if a
+        splash confirmed that the splash area showed the bobber. The rest of
+        the baseline, subsampled, counts as other colors too. Called by
+        take_baseline before the next cast rather than on the splash, to
+        keep it off the way to the loot click; call it after the click when
+        the tracker is not reused.
+        '''
+        
+        if self.color_sample is None or self.outcome != 'splash':
+            return
+        with self.metrics.timer('learn_colors'):
+            frame, background = self.color_sample
+            self.color_lut.learn(frame,background,self.baseline[::8,::8])
+        self.color_sample = None
+        
+    #end method learn_colors
+    
+    def _track_start(self,src,x,y):
+        '''
+        Starts tracking the bobber at x,y for splash_step: grabs a square
+        ROI with sides 2*track_radius around it, keeps its reduced plane as
+        the template that later frames are matched against, and its mean as
+        self.init_mean. A change confined to the ROI moves its mean more than
+        the mean of the whole splash area, so ROI deltas are scaled by
+        self.track_scale, the ratio of their areas, to keep the thresholds
+        meaningful.
+        '''
+        
+        r = self.params.get('track_radius',16)
+        self.track_home = (int(round(x)),int(round(y)))
+        self.track_center = list(self.track_home)
+        roi = src.grab(self._track_area(0))
+        self.template = self.track_reducer.reduce(roi).copy()
+        self.init_mean = self.track_reducer.mean(roi)
+        self.track_scale = (r/self.params['splash_radius'])**2
+        
+    #end method _track_start
+    
+    def _track_area(self,margin=None):
+        '''
+        Returns the screen area of the tracked ROI, widened by margin pixels
+        on every side (UD param track_search if None).
+        '''
+        
+        if margin is None:
+            margin = self.params.get('track_search',4)
+        half = self.params.get('track_radius',16) + margin
+        return {
+            'top': self.track_center[1]-half,
+            'left': self.track_center[0]-half,
+            'width': 2*half,
+            'height': 2*half}
+        
+    #end method _track_area
+    
+    def _track(self,frame):
+        '''
+        Finds the bobber in frame, a grab of _track_area(), by SAD template
+        matching, and moves the ROI onto it. The ROI stays within the splash
+        area set up by splash_start. Returns the mean of the ROI.
+        '''
+        
+        red = self.track_reducer
+        iy, ix, sad = match_template(red.reduce(frame),self.template,2)
+        margin = self.params.get('track_search',4)
+        reach = max(self.params['splash_radius'] - \
+                    self.params.get('track_radius',16),0)
+        for i, shift in enumerate((ix-margin,iy-margin)):
+            self.track_center[i] = min(max(
+                self.track_center[i]+shift,self.track_home[i]-reach),
+                self.track_home[i]+reach)
+        size = self.template.shape
+        return red.mean(frame[iy:iy+size[0],ix:ix+size[1]])
+        
+    #end method _track
+    
+    def splash_delay(self,src):
+        '''
+        Returns seconds to wait before the next splash_step, as paced by
+        self.pacer from the time since the cast and the CPU time of the last
+        frame.
+        '''
+        
+        now = src.now()
+        return self.pacer.delay(now,now-self.cast_t,self.step_cost)
+        
+    #end method splash_delay
+    
+    def splash_timeout(self,src):
+        '''
+        Ends wait_for_splash after max_wait_time without a result. Returns
+        False.
+        '''
+        
+        self.trace.info("|-- Waiting for splash timed out")
+        self._splash_end(src,'timeout')
+        return False
+        
+    #end method splash_timeout
+    
+    def _splash_end(self,src,outcome):
+        '''
+        Records the end of the splash wait with outcome 'splash', 'faded' or
+        'timeout', and marks it on src.
+        '''
+        
+        self.outcome = outcome
+        src.mark(outcome)
+        self.metrics.observe('splash_wait',time.perf_counter()-self.splash_t0)
+        self.metrics.inc(
+            {'splash': 'splashes','faded': 'fades','timeout': 'timeouts'}[outcome])
+        if self.pt is not None:
+            self.pt.log_splash_detect(outcome,src.now())
+        
+    #end method _splash_end
+    
+    def splash_step(self,src):
+        '''
+        Grabs and analyzes one frame of the splash area set up by
+        splash_start. Returns True if a splash was detected, False if the
+        bobber faded away, or None if neither happened yet, as decided by
+        self.detector (see ChangeDetector and UD param splash_detect). The
+        timestamp of the splash frame is kept in self.splash_t, and the
+        last deltas in self.detector.recent(). Splashes are recorded as
+        bites in self.pacer.
+        '''
+        
+        cpu_start = time.thread_time()
+        frame_t = src.now()
+        if self.template is not None:
+            cur_sct = src.grab(self._track_area())
+            start = time.perf_counter()
+            cur_mean = self.init_mean + \
+                (self._track(cur_sct) - self.init_mean)*self.track_scale
+        else:
+            cur_sct = src.grab(self.splash_area)
+            start = time.perf_counter()
+            cur_mean = self.reducer.mean(cur_sct)
+        if self.splash_bg is not None:
+            # compare against the background of the frames before this one
+            self.init_mean = self.reducer.mean(self.splash_bg.background())
+            self.splash_bg.update(cur_sct)
+        delta = cur_mean-self.init_mean
+        change = self.detector.update(delta)
+        self.metrics.observe('splash_frame',time.perf_counter()-start)
+        self.metrics.inc('frames')
+        if self.trace.enabled('debug'):
+            self.trace.debug(str(delta))
+        if self.pt is not None:
+            self.pt.log_splash_delta(delta)
+        self.step_cost = time.thread_time() - cpu_start
+        if change > 0:
+            self.trace.info("|-- Splash detected!",delta=float(delta))
+            self.splash_t = frame_t
+            self.pacer.record_bite(frame_t - self.cast_t)
+            self._splash_end(src,'splash')
+            return True # splash event detected
+        elif change < 0:
+            self.trace.info("|-- Bobber fade away detected",delta=float(delta))
+            self._splash_end(src,'faded')
+            return False # bobber has faded away
+        return None
+        
+    #end method splash_step
+    
+#end class BobTracker
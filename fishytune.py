@@ -0,0 +1,207 @@
+#!/usr/bin/python
+
+#Imports
+import os, sys, json, time, random, argparse, itertools
+import concurrent.futures
+import numpy as np
+from fishyhelper import *
+from fishybench import sizes, run_cast
+from herefishy import params as default_params
+
+'''
+**********************************  GUIDE  *************************************
+
+Tunes the detection thresholds of herefishy.py offline. Every candidate set
+of params is scored by replaying the same synthetic casts (SyntheticFrameSource
+scenes, see --water-noise and --distractors) through BobTracker, spread over
+a pool of processes. Run from the repository root:
+
+python fishytune.py
+python fishytune.py --search grid --casts 6 --workers 8 --out tune.json
+python fishytune.py --search random --samples 200 --size 1920x1080
+
+Each candidate gets, over --casts casts:
+    detect_rate - casts where the real splash was detected
+    fp_rate     - casts where a splash was reported before the real one
+                  (casts watching the wrong spot count as misses)
+    latency_ms  - mean time from the splash to its detection, in
+                  milliseconds of virtual (screen) time
+    search_ms   - mean wall time of find_bob, excluding sleeps
+
+The Pareto front of latency_ms against fp_rate over the candidates that
+detect at least --min-detect of the splashes is printed at the end, lowest
+fp_rate first. Copy the params of the row you like into herefishy.py.
+
+********************************************************************************
+'''
+
+# values tried for every tuned param. Grid search tries all combinations,
+# random search draws from these
+space = {
+    'bob_color_diff': [1.,1.5,2.,3.],
+    'splash_diff_thresh': [.8,1.,1.2,1.6,2.],
+    'bob_fade_thresh': [-8.,-4.,-2.],
+    'bob_track_probe': [15,20,30],
+    'splash_radius': [30,40,60],
+    'sct_check_iters': [1,2,3]}
+
+def candidates(search,samples,seed):
+    '''
+    Returns list of dicts of param values to try. search is 'grid' for every
+    combination in space, or 'random' for up to samples distinct draws.
+    '''
+
+    names = list(space)
+    if search == 'grid':
+        return [dict(zip(names,vals))
+                for vals in itertools.product(*(space[n] for n in names))]
+    rng = random.Random(seed)
+    total = int(np.prod([len(space[n]) for n in names]))
+    seen = set()
+    cands = []
+    while len(cands) < min(samples,total):
+        vals = tuple(rng.choice(space[n]) for n in names)
+        if vals not in seen:
+            seen.add(vals)
+            cands.append(dict(zip(names,vals)))
+    return cands
+
+#end function candidates
+
+def evaluate(job):
+    '''
+    Runs the casts of job tuple
+    (cand,params,size,casts,distractors,water_noise,seed) in a worker
+    process. Returns dict of cand and its scores.
+    '''
+
+    cand, params, size, casts, distractors, water_noise, seed = job
+    width, height = sizes[size]
+    params = dict(params)
+    params.update(cand)
+    params['_dev_mode'] = False
+    params['cap_area'] = {'top': 0, 'left': 0, 'width': width, 'height': height}
+    tracker = BobTracker(params,None,mouser=NullMouser(),
+                         tracer=Tracer('warning'))
+
+    outcomes = {}
+    latency = []
+    search = []
+    for i in range(casts):
+        # the same scenes for every candidate
+        source = SyntheticFrameSource(
+            width,height,distractors=distractors,water_noise=water_noise,
+            seed=seed+i)
+        samples, outcome = run_cast(tracker,source,params)
+        outcomes[outcome] = outcomes.get(outcome,0) + 1
+        latency.extend(samples.get('splash_to_detect',[]))
+        search.extend(samples.get('find_bob',[]))
+    return {
+        'params': cand,
+        'outcomes': outcomes,
+        'detect_rate': outcomes.get('detected',0)/casts,
+        'fp_rate': outcomes.get('false_splash',0)/casts,
+        'latency_ms': float(np.mean(latency)) if latency else None,
+        'search_ms': float(np.mean(search)) if search else None}
+
+#end function evaluate
+
+def pareto_front(results,min_detect):
+    '''
+    Returns the results that detect at least min_detect of the splashes and
+    are not beaten on both fp_rate and latency_ms by another one, lowest
+    fp_rate first.
+    '''
+
+    ok = [r for r in results
+          if r['latency_ms'] is not None and r['detect_rate'] >= min_detect]
+    ok.sort(key=lambda r: (r['fp_rate'],r['latency_ms'],-r['detect_rate']))
+    front = []
+    for r in ok:
+        # sorted by fp_rate, so r is on the front if it is faster than
+        # everything before it
+        if not front or r['latency_ms'] < front[-1]['latency_ms']:
+            front.append(r)
+    return front
+
+#end function pareto_front
+
+def print_front(front):
+    '''
+    Prints a table of the Pareto front.
+    '''
+
+    names = list(space)
+    print('{:>8} {:>8} {:>11} {:>10}  '.format(
+        'fp_rate','detect','latency_ms','search_ms') + ' '.join(names))
+    for r in front:
+        print('{:>8.2f} {:>8.2f} {:>11.1f} {:>10.1f}  '.format(
+            r['fp_rate'],r['detect_rate'],r['latency_ms'],
+            r['search_ms'] or 0.) + \
+            ' '.join('{:>{}}'.format(r['params'][n],len(n)) for n in names))
+
+#end function print_front
+
+def main(argv=None):
+    '''
+    Command line entry point. See GUIDE above.
+    '''
+
+    parser = argparse.ArgumentParser(description=\
+        "Tune HereFishy detection thresholds on synthetic casts")
+    parser.add_argument('--search',choices=('grid','random'),default='random',
+        help="try every combination of params, or random ones")
+    parser.add_argument('--samples',type=int,default=64,
+        help="candidates tried by random search")
+    parser.add_argument('--casts',type=int,default=8,
+        help="casts per candidate")
+    parser.add_argument('--size',default='1134x650',choices=list(sizes),
+        help="capture size")
+    parser.add_argument('--distractors',type=int,default=0,
+        help="passing distractors in the synthetic scene")
+    parser.add_argument('--water-noise',type=float,default=12.,
+        help="amplitude of the synthetic water noise")
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--workers',type=int,default=os.cpu_count(),
+        help="worker processes")
+    parser.add_argument('--min-detect',type=float,default=.8,
+        help="least detect_rate for the Pareto front")
+    parser.add_argument('--out',default=None,
+        help="save all results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    cands = candidates(args.search,args.samples,args.seed)
+    jobs = [(cand,dict(default_params),args.size,args.casts,
+             args.distractors,args.water_noise,args.seed) for cand in cands]
+    print("Trying " + str(len(cands)) + " candidates x " + \
+          str(args.casts) + " casts on " + str(args.workers) + " workers")
+
+    results = []
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(args.workers) as pool:
+        for res in pool.map(evaluate,jobs,
+                            chunksize=max(1,len(jobs)//(4*args.workers))):
+            results.append(res)
+            print("|-- " + str(len(results)) + "/" + str(len(jobs)) + \
+                  " candidates done\r",end='')
+    print()
+    print("Done in " + "{:.1f}".format(time.perf_counter()-start) + " s")
+
+    front = pareto_front(results,args.min_detect)
+    if front:
+        print_front(front)
+    else:
+        print("No candidate detected at least " + \
+              "{:.0%}".format(args.min_detect) + " of the splashes")
+
+    if args.out:
+        with open(args.out,'w') as f:
+            json.dump({'args': vars(args),'results': results,
+                       'front': front},f,indent=2)
+    return 0
+
+#end function main
+
+if __name__ == '__main__':
+    sys.exit(main())
+#end if
@@ -26,6 +26,30 @@ cap_area = {'top': 70, 'left': 70, 'width': 1134, 'height': 650}
 # size of bob finder probe in pixels
 bob_track_probe = 20
 
+# bobber search mode. 'integral' grabs the whole capture area once and scores
+# every probe at once, 'pyramid' does the same on a downsampled capture first
+# and only looks closer at the most promising spots (fastest on big screens),
+# 'probe' grabs one column of probes at a time (slow)
+bob_search_mode = 'integral'
+
+# pyramid search only. downsampling factor of the first pass, and number of
+# spots looked at closer
+pyramid_factor = 8
+pyramid_top_k = 4
+
+# how the bobber is located from the hits. 'blob' uses the best connected
+# group of hits, 'mean' averages all of them (passing players pull it off)
+bob_localize = 'blob'
+
+# 'blob' only. pixels a blob of hits may move between the validity check
+# screenshots. passing players move further and are dropped, the bobber only
+# bobs a little
+bob_max_motion = 5.
+
+# 'blob' only. pixels across the bobber as seen on screen. sets how many
+# probes a blob of bobber hits should cover
+bob_size = 28
+
 # difference threshold. lower value will be more sensitive and may get false
 # positives
 bob_color_diff = 2.
@@ -41,6 +65,35 @@ bob_fade_thresh = -4.
 # but fully around the bobber
 splash_radius = 40
 
+# follow the bobber with a tight box while waiting for the splash, instead of
+# watching the whole splash_radius box. track_radius is half the size of the
+# tight box and track_search how far in pixels it may move per frame
+splash_track = False
+track_radius = 16
+track_search = 4
+
+# how a splash (or fade) is told from the deltas. 'thresh' uses the fixed
+# thresholds above. 'zscore' and 'cusum' learn how much the deltas normally
+# vary and fire on a sudden change of splash_z standard deviations (or a
+# CUSUM of them), so they need no retuning between zones and ignore slow
+# changes in light. splash_drift is the CUSUM allowance per frame, and
+# 2**-splash_alpha_shift how fast the statistics follow changes
+splash_detect = 'thresh'
+splash_z = 6.
+splash_drift = 2.
+splash_alpha_shift = 5
+
+# frame rate while waiting for the splash. Bites usually come at similar
+# times after the cast, so frames are only taken at splash_fps inside the
+# window where the recent bites came (widened by bite_window_margin seconds),
+# and at splash_min_fps (ramping up) before it, using at most
+# splash_cpu_budget of a core. Until a few bites were seen, all frames are
+# taken at splash_fps. None for as fast as possible
+splash_fps = 60
+splash_min_fps = 5
+splash_cpu_budget = .25
+bite_window_margin = 1.
+
 # max amount of time to wait for splash
 max_wait_time = 30
 
@@ -51,6 +104,11 @@ init_wait_time = 5
 # shift right clicking
 shift_right_speed = 0.1
 
+# seconds from the frame showing the splash to moving the mouse to the
+# bobber, and to the loot click
+loot_move_delay = .4
+loot_click_delay = .8
+
 # screenshot validity check iterations. decrease to increase sensitivity and
 # speed, but may find false positives
 sct_check_iters = 3
@@ -58,6 +116,107 @@ sct_check_iters = 3
 # validity check pause time in seconds. time between validity checks
 sct_check_pause = .15
 
+# how screenshots are reduced before analysis. 'luma' for integer luminance,
+# 'bgr' for the sum of color channels, 'b', 'g' or 'r' for one channel, or
+# 'mean' for the original (slow) float mean over all channels
+reduce_mode = 'luma'
+
+# only analyze every n-th pixel in x and y. higher is faster but coarser
+reduce_stride = 1
+
+# file of the learned bobber color table, or None. With a file, find_bob
+# looks for bobber colored changes instead of any bright change (like spells
+# or passing players), once the table learned from color_lut_min_casts casts
+# that ended in a splash. The table is kept across sessions in this file.
+# color_lut_bits is the bits per color channel of the table (5 is 32 KB)
+bob_color_lut = None
+color_lut_bits = 5
+color_lut_min_casts = 3
+
+# background model. None compares against one screenshot taken right before
+# casting. 'ewma' or 'median' keep a rolling background instead, which is
+# less noisy on animated water
+bg_model = None
+
+# frames in the 'median' background, and how slowly the 'ewma' background
+# follows changes (each frame counts for 1/2**bg_alpha_shift)
+bg_window = 8
+bg_alpha_shift = 3
+
+# number of preallocated frames kept per capture size. Frames are reused in a
+# ring, so this only needs to cover the frames in use at once
+capture_ring_size = 2
+
+# run the fishing loop on asyncio. overlaps the loot click with the countdown
+# to the next cast and makes max_wait_time exact
+async_loop = False
+
+# how inputs are posted. 'mac' (Quartz), or 'null' to post nothing (e.g.
+# to run headless against a recording). None picks the one of this OS.
+# 'win' is not supported yet, as it cannot press keys
+input_backend = None
+
+# file that every cast is logged to, for tuning params later, e.g.
+# 'casts.dat'. None to keep the cast history in memory only
+cast_log = None
+
+# file that stage timings and counters are exported to every
+# metrics_interval seconds. Files ending in '.prom' are written in the
+# Prometheus text format, anything else as JSON. None to turn export off
+metrics_file = None
+metrics_interval = 60
+
+# least level of the messages printed and events traced: 'debug', 'info',
+# 'warning' or 'error' ('debug' in developer mode). Printing is done off the
+# fishing loop by a background thread
+trace_level = 'info'
+
+# directory that the trace of every cast is dumped to, one Chrome trace JSON
+# file per cast (open in chrome://tracing or ui.perfetto.dev), showing each
+# grab, stage, input event and message on a timeline. None to turn it off
+trace_dir = None
+
+# directory that every frame grabbed is recorded to, with cast marks, for
+# looking at failed casts later (see fishyhelper.FrameReplay). None to turn
+# recording off. Oldest recordings are deleted beyond record_max_mb, in
+# chunks of record_chunk_mb. record_full_frames False only records the
+# splash area crops, not the baseline, probe and verify grabs of find_bob
+record_dir = None
+record_max_mb = 2048
+record_chunk_mb = 64
+record_full_frames = True
+
+# name of the session profile to resume from and save to, or None. The
+# profile keeps the search area, cap_area, monitor, background and the
+# thresholds of the last looted cast in profile_dir/<name>.hfp, so a
+# restarted session starts fishing right away. Its thresholds win over the
+# ones above, start a new profile to use changed ones
+profile = None
+profile_dir = 'profiles'
+
+# seconds between profile saves after good casts (it is always saved on
+# exit), and how much the scene may differ from the profile's last baseline
+# (mean difference per color channel) before the profile's background is
+# dropped and learned again
+profile_save_interval = 60
+profile_max_diff = 24.
+
+# monitor that the search area is selected on (1 is the main monitor)
+monitor = 1
+
+# longest side in pixels of the search area selection window. Bigger
+# screenshots (e.g. on HiDPI screens) are shown downscaled, the selected area
+# is still in full resolution
+gui_max_size = 1600
+
+# run several fishing sessions at once, e.g. one per game window or monitor.
+# Each entry overrides params of the session, at least its cap_area. Empty
+# for a single session. Example for two windows side by side:
+# sessions = [
+#     {'cap_area': {'top': 70, 'left': 70, 'width': 800, 'height': 600}},
+#     {'cap_area': {'top': 70, 'left': 1000, 'width': 800, 'height': 600}}]
+sessions = []
+
 # developer mode on or off
 _dev_mode = False
 
@@ -73,21 +232,75 @@ params = {
     'bob_color_diff': bob_color_diff,
     'splash_radius': splash_radius,
     'bob_track_probe': bob_track_probe,
+    'bob_search_mode': bob_search_mode,
+    'pyramid_factor': pyramid_factor,
+    'pyramid_top_k': pyramid_top_k,
+    'bob_localize': bob_localize,
+    'bob_max_motion': bob_max_motion,
+    'bob_size': bob_size,
     'max_wait_time': max_wait_time,
+    'splash_fps': splash_fps,
+    'splash_min_fps': splash_min_fps,
+    'splash_cpu_budget': splash_cpu_budget,
+    'bite_window_margin': bite_window_margin,
     'splash_diff_thresh': splash_diff_thresh,
     'bob_fade_thresh': bob_fade_thresh,
     'init_wait_time': int(init_wait_time),
     '_dev_mode': _dev_mode,
     'sct_check_iters': sct_check_iters,
-    'sct_check_pause': sct_check_pause
+    'sct_check_pause': sct_check_pause,
+    'capture_ring_size': capture_ring_size,
+    'reduce_mode': reduce_mode,
+    'reduce_stride': reduce_stride,
+    'bob_color_lut': bob_color_lut,
+    'color_lut_bits': color_lut_bits,
+    'color_lut_min_casts': color_lut_min_casts,
+    'async_loop': async_loop,
+    'input_backend': input_backend,
+    'bg_model': bg_model,
+    'bg_window': bg_window,
+    'bg_alpha_shift': bg_alpha_shift,
+    'cast_log': cast_log,
+    'metrics_file': metrics_file,
+    'metrics_interval': metrics_interval,
+    'trace_level': trace_level,
+    'trace_dir': trace_dir,
+    'record_dir': record_dir,
+    'record_max_mb': record_max_mb,
+    'record_chunk_mb': record_chunk_mb,
+    'record_full_frames': record_full_frames,
+    'profile': profile,
+    'profile_dir': profile_dir,
+    'profile_save_interval': profile_save_interval,
+    'profile_max_diff': profile_max_diff,
+    'monitor': monitor,
+    'gui_max_size': gui_max_size,
+    'shift_right_speed': shift_right_speed,
+    'loot_move_delay': loot_move_delay,
+    'loot_click_delay': loot_click_delay,
+    'splash_track': splash_track,
+    'track_radius': track_radius,
+    'track_search': track_search,
+    'splash_detect': splash_detect,
+    'splash_z': splash_z,
+    'splash_drift': splash_drift,
+    'splash_alpha_shift': splash_alpha_shift
 }
 
 def main_handler():
     '''
     Main handling function. The real heavy lifting can be found in
-    fishyhelper.NatPagle class.
+    fishyhelper.NatPagle class (one per session if there are sessions).
     '''
     
+    # imported here, so that importing params does not pull in asyncio and
+    # multiprocessing
+    from fishyhelper import NatPagle, FishingSupervisor
+    
+    if sessions:
+        sup = FishingSupervisor([dict(params,**s) for s in sessions])
+        sup.run()
+        return
     nat = NatPagle(params)
     nat.gofishin()
     
@@ -0,0 +1,4 @@
+import os, sys
+
+# run the tests against the checkout, from any directory
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
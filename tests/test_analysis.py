@@ -0,0 +1,204 @@
+import numpy as np
+import pytest
+from fishyhelper import BackgroundModel, ChangeDetector, ColorLUT, \
+    FrameReducer, probe_grid, probe_means, probe_sums
+
+def random_frame(rng,h,w):
+    frame = rng.integers(0,256,(h,w,4),dtype=np.uint8)
+    frame[:,:,3] = 255
+    return frame
+
+def naive_plane(frame,mode,lut=None):
+    '''
+    Reduced plane of frame, computed pixel by pixel in float.
+    '''
+
+    b, g, r, a = [frame[:,:,c].astype(np.float64) for c in range(4)]
+    if mode == 'luma':
+        return 29*b + 150*g + 77*r
+    if mode == 'bgr':
+        return b + g + r
+    if mode == 'mean':
+        return b + g + r + a
+    if mode == 'lut':
+        s = lut.shift
+        idx = (frame[:,:,0].astype(int) >> s) << 2*lut.bits | \
+            (frame[:,:,1].astype(int) >> s) << lut.bits | \
+            frame[:,:,2].astype(int) >> s
+        return lut.table[idx].astype(np.float64)
+    return frame[:,:,'bgr'.index(mode)].astype(np.float64)
+
+def make_lut(rng):
+    lut = ColorLUT(5)
+    lut.pos[:] = rng.random(len(lut.pos))
+    lut.neg[:] = rng.random(len(lut.neg))
+    lut.build()
+    return lut
+
+@pytest.mark.parametrize('mode',['luma','bgr','b','g','r','mean','lut'])
+@pytest.mark.parametrize('stride',[1,2])
+def test_probe_means_match_naive_box_means(mode,stride):
+    rng = np.random.default_rng(1)
+    frame = random_frame(rng,96,128)
+    cap_area = {'top': 40, 'left': 30, 'width': 128, 'height': 96}
+    res = 8
+    lut = make_lut(rng) if mode == 'lut' else None
+    red = FrameReducer(mode,stride,lut)
+    xs, ys = probe_grid(cap_area,res)
+    means = probe_means(red.sat(frame),xs,ys,cap_area,res,stride,
+                        peak=red.peak)
+    plane = naive_plane(frame[::stride,::stride],mode,lut)
+    for j, y in enumerate(ys):
+        for i, x in enumerate(xs):
+            x0 = -(-(x - res - cap_area['left'])//stride)
+            x1 = -(-(x + res - cap_area['left'])//stride)
+            y0 = -(-(y - res - cap_area['top'])//stride)
+            y1 = -(-(y + res - cap_area['top'])//stride)
+            assert means[j,i] == pytest.approx(plane[y0:y1,x0:x1].mean())
+
+@pytest.mark.parametrize('mode',['luma','bgr','b','g','r','mean'])
+def test_reducer_scale_matches_float_mean(mode):
+    # grey changes on a random scene, as the original np.mean saw them
+    rng = np.random.default_rng(2)
+    before = random_frame(rng,64,64)
+    before[:,:,:3] //= 2
+    after = before.copy()
+    after[16:48,16:48,:3] += 40
+    red = FrameReducer(mode)
+    assert (red.mean(after) - red.mean(before)) == pytest.approx(
+        np.mean(after) - np.mean(before))
+    cap_area = {'top': 0, 'left': 0, 'width': 64, 'height': 64}
+    xs, ys = np.array([32]), np.array([32])
+    diff = (probe_means(red.sat(after),xs,ys,cap_area,16) -
+            probe_means(red.sat(before),xs,ys,cap_area,16))*red.scale
+    assert diff[0,0] == pytest.approx(
+        np.mean(after[16:48,16:48]) - np.mean(before[16:48,16:48]))
+
+def test_probe_sums_reject_overflowing_probes():
+    red = FrameReducer('mean')
+    frame = np.full((8,8,4),255,dtype=np.uint8)
+    cap_area = {'top': 0, 'left': 0, 'width': 8, 'height': 8}
+    xs, ys = np.array([4]), np.array([4])
+    assert probe_sums(red.sat(frame),xs,ys,cap_area,4,peak=red.peak)[0,0] \
+        == 64*1020
+    # a 2100x2100 probe of white pixels no longer fits in 32 bits
+    sat = np.zeros((4201,4201),dtype=np.uint32)
+    cap_area = {'top': 0, 'left': 0, 'width': 4200, 'height': 4200}
+    with pytest.raises(ValueError):
+        probe_sums(sat,np.array([2100]),np.array([2100]),cap_area,1050,
+                   peak=red.peak)
+
+@pytest.mark.parametrize('mode',['ewma','median'])
+def test_background_converges_to_constant_frame(mode):
+    rng = np.random.default_rng(3)
+    model = BackgroundModel(mode)
+    for i in range(8):
+        model.update(random_frame(rng,32,48))
+    const = np.full((32,48,4),(90,140,60,255),dtype=np.uint8)
+    errors = []
+    for i in range(60):
+        model.update(const)
+        errors.append(np.abs(model.background().astype(int) - const).max())
+    # the error never grows, and the background ends up at the frame
+    assert all(a >= b for a, b in zip(errors,errors[1:]))
+    assert errors[-1] == 0
+    if mode == 'median':
+        # half of the ring plus one frame outvote the old frames
+        assert errors[model.window//2] == 0
+
+@pytest.mark.parametrize('mode',['zscore','cusum'])
+@pytest.mark.parametrize('seed',range(4))
+def test_change_detector_fires_on_step_not_ramp(mode,seed):
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0,.3,400)
+    # a slow ramp, e.g. the sun setting, ends 8 above where it started,
+    # which the fixed thresholds do fire on
+    ramp = noise + .02*np.arange(400)
+    detector = ChangeDetector(mode)
+    assert not any(detector.update(d) for d in ramp)
+    assert any(ChangeDetector('thresh').update(d) for d in ramp)
+    # a step of 3 fires within two samples, and not before it
+    step = noise[:80] + np.where(np.arange(80) >= 60,3.,0.)
+    detector = ChangeDetector(mode)
+    changes = [detector.update(d) for d in step]
+    assert not any(changes[:60])
+    assert 1 in changes[60:62]
+
+def naive_index(pixel,bits):
+    '''
+    Table index of one BGR(A) pixel, from its bins along each channel.
+    '''
+
+    width = 256 // 2**bits
+    b, g, r = [int(c) // width for c in pixel[:3]]
+    return (b*2**bits + g)*2**bits + r
+
+@pytest.mark.parametrize('bits',[1,3,5])
+@pytest.mark.parametrize('channels',[3,4])
+def test_color_lut_index_and_classify_match_naive(bits,channels):
+    rng = np.random.default_rng(4)
+    frame = random_frame(rng,12,16)[:,:,:channels]
+    lut = ColorLUT(bits)
+    lut.pos[:] = rng.random(len(lut.pos))
+    lut.neg[:] = rng.random(len(lut.neg))
+    lut.build()
+    idx = lut.index(frame)
+    likelihood = lut.classify(frame)
+    assert idx.shape == likelihood.shape == frame.shape[:2]
+    for y in range(frame.shape[0]):
+        for x in range(frame.shape[1]):
+            i = naive_index(frame[y,x],bits)
+            assert idx[y,x] == i
+            assert likelihood[y,x] == lut.table[i]
+
+def test_color_lut_learn_raises_bobber_colors():
+    # blue-green water with a red and white bobber on it
+    rng = np.random.default_rng(5)
+    background = np.empty((48,64,4),dtype=np.uint8)
+    background[...] = (140,90,30,255)
+    background[...,:3] += rng.integers(0,12,(48,64,3),dtype=np.uint8)
+    frame = background.copy()
+    frame[20:28,28:36,:3] = (40,40,230)
+    frame[28:32,28:36,:3] = (235,235,235)
+    lut = ColorLUT()
+    assert not lut.table.any()
+    lut.learn(frame,background)
+    assert lut.samples == 1
+    red = lut.table[naive_index((40,40,230),lut.bits)]
+    white = lut.table[naive_index((235,235,235),lut.bits)]
+    water = lut.table[naive_index((145,95,35),lut.bits)]
+    assert red > 200 and white > 200 and water < 50
+    likelihood = lut.classify(frame)
+    assert likelihood[20:32,28:36].min() > likelihood[:16].max()
+
+def test_color_lut_update_counts_samples():
+    lut = ColorLUT(3,blur=0)
+    pos = np.array([[10,20,250],[10,20,250],[250,250,250]],dtype=np.uint8)
+    neg = np.array([[[140,90,30,255]]*4],dtype=np.uint8)
+    lut.update(pos,neg)
+    assert lut.samples == 1
+    assert lut.pos.sum() == 3 and lut.neg.sum() == 4
+    assert lut.pos[naive_index(pos[0],3)] == 2
+    assert lut.neg[naive_index(neg[0,0],3)] == 4
+    # other pixels alone are no bobber sample
+    lut.update(pos[:0],neg)
+    assert lut.samples == 1 and lut.neg.sum() == 8
+    assert lut.table[naive_index(pos[0],3)] > \
+        lut.table[naive_index(neg[0,0],3)]
+
+def test_color_lut_save_load_round_trip(tmp_path):
+    rng = np.random.default_rng(6)
+    lut = ColorLUT(4,blur=2)
+    lut.update(random_frame(rng,8,8),random_frame(rng,16,16))
+    lut.update(random_frame(rng,8,8))
+    path = str(tmp_path/'luts'/'bobber.lut')
+    lut.save(path)
+    loaded = ColorLUT.load(path)
+    assert (loaded.bits, loaded.blur, loaded.samples) == (4,2,2)
+    assert np.array_equal(loaded.pos,lut.pos)
+    assert np.array_equal(loaded.neg,lut.neg)
+    assert np.array_equal(loaded.table,lut.table)
+    assert ColorLUT.load(str(tmp_path/'none.lut')) is None
+    (tmp_path/'junk.lut').write_bytes(b'not a color table')
+    with pytest.raises(ValueError):
+        ColorLUT.load(str(tmp_path/'junk.lut'))
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from fishyhelper import FramePacer
+from herefishy import params
+
+def frame_times(pacer,secs,cost=.002):
+    '''
+    Clock times of the frames of a splash wait of secs seconds after a cast
+    at 0, each taking cost seconds to grab and analyze.
+    '''
+
+    t = 0.
+    times = []
+    pacer.start(t)
+    while t < secs:
+        t += pacer.delay(t,t,cost)
+        times.append(t)
+        t += cost
+    return np.array(times)
+
+def fps(times,start,end):
+    inside = times[(times >= start) & (times < end)]
+    return (len(inside) - 1)/(inside[-1] - inside[0])
+
+def test_pacer_reaches_splash_fps_in_bite_window():
+    pacer = FramePacer(params['splash_fps'],params['splash_min_fps'])
+    # full rate everywhere until the bite window is known
+    times = frame_times(pacer,12.)
+    assert fps(times,.5,3.) == pytest.approx(params['splash_fps'],rel=.02)
+    for secs in (7.6,7.8,8.,8.,8.2,8.4):
+        pacer.record_bite(secs)
+    start, end = pacer.window()
+    assert start == pytest.approx(6.6,abs=.1)
+    times = frame_times(pacer,12.)
+    # slow right after the cast, ramping up over pacer.ramp seconds before
+    # the window, and at the full rate from its start to its end and on
+    assert fps(times,0.,start-pacer.ramp) == pytest.approx(
+        params['splash_min_fps'],rel=.02)
+    assert params['splash_min_fps'] < fps(times,start-pacer.ramp,start) < \
+        params['splash_fps']
+    assert fps(times,start,end) == pytest.approx(params['splash_fps'],
+                                                 rel=.02)
+    assert fps(times,end,12.) == pytest.approx(params['splash_fps'],rel=.02)
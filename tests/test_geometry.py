@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+from fishyhelper import pts_in_box, pts_in_boxes
+
+def test_pts_in_box_any_polygon():
+    query = np.array([[5,5],[15,5],[0,0]])
+    corners = np.array([[0,0],[10,10]]) # two-corner rectangle
+    quad = np.array([[0,0],[10,0],[10,10],[0,10]])
+    pentagon = np.array([[0,0],[10,0],[10,10],[5,12],[0,10]])
+    for subject in (corners,quad,pentagon):
+        assert pts_in_box(query,subject).tolist() == [True,False,False]
+
+def test_pts_in_boxes_batched():
+    query = np.array([[5,5],[15,5]])
+    subjects = np.array([[[0,0],[10,10]],[[10,0],[20,10]]])
+    assert pts_in_boxes(query,subjects).tolist() == \
+        [[True,False],[False,True]]
+    assert pts_in_boxes([],subjects).shape == (2,0)
+
+def test_pts_in_boxes_bad_shapes():
+    with pytest.raises(ValueError):
+        pts_in_boxes([[1,1]],np.zeros((2,2,3)))
+    with pytest.raises(ValueError):
+        pts_in_boxes([1,2,3],np.zeros((4,2)))
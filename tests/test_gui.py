@@ -0,0 +1,16 @@
+from fishyhelper import GUIParamSet
+
+def test_view_mapping_round_trips():
+    # a 5k screenshot shown at a 1600 px wide preview, and zoomed in on
+    # (700,300)-(1100,525) of it
+    sc = 5120/1600
+    full = GUIParamSet.view_to_full(((500,100),(80,300)),sc)
+    assert full == [[320,1600],[256,960]]
+    assert GUIParamSet.full_to_view(full,sc) == ((100,500),(80,300))
+    zoom_sc, zoom_pt = .25, (700,300)
+    full = GUIParamSet.view_to_full(((40,360),(20,200)),zoom_sc,zoom_pt)
+    assert full == [[710,790],[305,350]]
+    assert GUIParamSet.full_to_view(full,zoom_sc,zoom_pt) == \
+        ((40,360),(20,200))
+    # nothing drawn maps to nothing drawn
+    assert GUIParamSet.full_to_view(((0,0),(0,0)),sc) == ((0,0),(0,0))
@@ -0,0 +1,28 @@
+import os, sys, subprocess
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules that must only be imported when first used
+backends = ('mss','Quartz','cv2','asyncio','multiprocessing')
+
+def imported(code):
+    '''
+    Runs code in a fresh interpreter and returns the backends it imported.
+    '''
+    out = subprocess.run(
+        [sys.executable,'-c',code + '\nimport sys\n' +
+         'print(",".join(m for m in ' + repr(backends) +
+         ' if m in sys.modules))'],
+        cwd=root,capture_output=True,text=True,check=True).stdout
+    return [m for m in out.strip().split(',') if m]
+
+@pytest.mark.parametrize('code',[
+    'import fishyhelper',
+    'from fishyhelper import *',
+    'from herefishy import params'])
+def test_import_pulls_in_no_backends(code):
+    assert imported(code) == []
+
+def test_lazy_names_still_import():
+    assert 'asyncio' in imported('from fishyhelper import NatPagle')
@@ -0,0 +1,61 @@
+import json, re
+import pytest
+from fishyhelper import Metrics
+
+SAMPLE = re.compile(r'^([a-z_]+)(?:\{([^}]*)\})? (\S+)$')
+
+def parse_prometheus(text):
+    '''
+    Returns dict of (name,labels) to float value of the samples in text,
+    failing on any line that is neither a comment nor a sample.
+    '''
+
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith('# '):
+            assert line.split()[1] in ('HELP','TYPE')
+            continue
+        m = SAMPLE.match(line)
+        assert m, line
+        labels = tuple(sorted(re.findall(r'(\w+)="([^"]*)"',m.group(2) or '')))
+        samples[(m.group(1),labels)] = float(m.group(3))
+    return samples
+
+def make_metrics(path=None):
+    metrics = Metrics(path)
+    for secs in (.0002,.003,.003,.2,70.):
+        metrics.observe('frame',secs)
+    metrics.inc('casts',3)
+    return metrics
+
+def test_prometheus_export_parses(tmp_path):
+    path = str(tmp_path/'metrics.prom')
+    make_metrics(path).export()
+    samples = parse_prometheus(open(path).read())
+    assert samples[('herefishy_casts_total',())] == 3
+    def bucket(le):
+        return samples[('herefishy_stage_seconds_bucket',
+                        (('le',le),('stage','frame')))]
+    # cumulative counts, one bucket per bound and +Inf for the 70 s frame
+    counts = [bucket(str(le)) for le in Metrics.buckets] + [bucket('+Inf')]
+    assert counts == sorted(counts)
+    assert bucket('0.00025') == 1
+    assert bucket('0.005') == 3
+    assert bucket('0.25') == 4
+    assert bucket('60.0') == 4 and bucket('+Inf') == 5
+    assert samples[('herefishy_stage_seconds_count',
+                    (('stage','frame'),))] == 5
+    assert samples[('herefishy_stage_seconds_sum',
+                    (('stage','frame'),))] == pytest.approx(70.2062)
+
+def test_json_export_parses(tmp_path):
+    path = str(tmp_path/'metrics.json')
+    make_metrics(path).export()
+    snap = json.load(open(path))
+    assert snap['counters'] == {'casts': 3}
+    frame = snap['stages']['frame']
+    assert frame['count'] == 5 and frame['max'] == 70.
+    buckets = dict((str(le),cum) for le, cum in frame['buckets'])
+    assert len(buckets) == len(Metrics.buckets) + 1
+    assert buckets['0.005'] == 3 and buckets['+Inf'] == 5
+    assert frame['p50'] <= .005
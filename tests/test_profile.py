@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from fishyhelper import BackgroundModel, SessionProfile
+from herefishy import params as default_params
+
+@pytest.mark.parametrize('mode',['ewma','median'])
+def test_profile_round_trip(tmp_path,mode):
+    rng = np.random.default_rng(0)
+    params = dict(default_params,splash_radius=60,bob_color_diff=2.5,
+                  monitor=2,
+                  cap_area={'top': 40, 'left': 1920, 'width': 96,
+                            'height': 64})
+    background = BackgroundModel(mode)
+    for i in range(5):
+        background.update(rng.integers(0,256,(64,96,4),dtype=np.uint8))
+    baseline = rng.integers(0,256,(64,96,4),dtype=np.uint8)
+
+    prof = SessionProfile('pond',str(tmp_path))
+    prof.search_area = [[1920,2016],[40,104]]
+    prof.update(params,background,baseline)
+    prof.save()
+    loaded = SessionProfile.load('pond',str(tmp_path))
+
+    assert loaded.saved == prof.saved
+    assert loaded.search_area == prof.search_area
+    assert loaded.cap_area == params['cap_area']
+    assert loaded.monitor == 2
+    assert loaded.params == {key: params[key]
+                             for key in SessionProfile.tuned_params
+                             if key in params}
+    resumed = loaded.apply(dict(default_params))
+    assert resumed['splash_radius'] == 60
+    assert resumed['bob_color_diff'] == 2.5
+    assert resumed['cap_area'] == params['cap_area']
+    assert loaded.baseline.dtype == np.uint8
+    assert np.array_equal(loaded.baseline,baseline)
+    assert loaded.scene_diff(baseline) == 0.
+
+    restored = BackgroundModel(mode)
+    assert loaded.restore_background(restored)
+    assert restored.count == background.count
+    assert np.array_equal(restored.background(),background.background())
+    # and it keeps learning the same way
+    frame = rng.integers(0,256,(64,96,4),dtype=np.uint8)
+    background.update(frame)
+    restored.update(frame)
+    assert np.array_equal(restored.background(),background.background())
+    # a model of the other mode is left alone
+    other = BackgroundModel('median' if mode == 'ewma' else 'ewma')
+    assert not loaded.restore_background(other)
+
+def test_profile_load_missing_or_foreign(tmp_path):
+    assert SessionProfile.load('nope',str(tmp_path)) is None
+    (tmp_path/'junk.hfp').write_bytes(b'not a profile at all')
+    with pytest.raises(ValueError):
+        SessionProfile.load('junk',str(tmp_path))
@@ -0,0 +1,107 @@
+import pytest
+from fishyhelper import RecordingMouser, SyntheticFrameSource
+from fishyhelper.session import NatPagle
+from herefishy import params as default_params
+
+class OneCastMouser(RecordingMouser):
+    '''
+    RecordingMouser that stops the fishing loop when the next cast is
+    pressed after a loot click.
+    '''
+
+    def keydown(self,code):
+        if code == 0x12 and self.last('rightclick') is not None:
+            raise KeyboardInterrupt
+        RecordingMouser.keydown(self,code)
+
+def make_params(**overrides):
+    params = dict(default_params)
+    params.update({
+        '_dev_mode': False, 'init_wait_time': 0, 'cast_log': None,
+        'trace_level': 'warning', 'profile': None, 'record_dir': None,
+        'cap_area': {'top': 0, 'left': 0, 'width': 1134, 'height': 650}})
+    params.update(overrides)
+    return params
+
+@pytest.mark.parametrize('async_loop',[False,True])
+def test_one_cast_loot_latency(async_loop):
+    params = make_params(async_loop=async_loop)
+    source = SyntheticFrameSource(1134,650,seed=3)
+    mouser = OneCastMouser(source)
+    nat = NatPagle(params,source=source,mouser=mouser)
+    nat.gofishin()
+
+    splash_t = source.splash_time()
+    click_t = mouser.last('rightclick')
+    assert click_t is not None
+    # the splash was seen within a few frames, and the click was posted on
+    # its deadline from the splash frame
+    assert 0 <= nat.click_latency - params['loot_click_delay'] < .05
+    assert click_t - splash_t == pytest.approx(
+        params['loot_click_delay'],abs=.1)
+    assert nat.metrics.snapshot()['counters']['clicks'] == 1
+
+def test_record_splash_only(tmp_path):
+    from fishyhelper import FrameReplay
+    params = make_params(record_dir=str(tmp_path),record_full_frames=False)
+    source = SyntheticFrameSource(1134,650,seed=3)
+    start_t = source.now()
+    nat = NatPagle(params,source=source,mouser=OneCastMouser(source))
+    nat.gofishin()
+    nat.source.close()
+
+    replay = FrameReplay(str(tmp_path))
+    events = replay.events()
+    # marks are on the frame source's clock, not the wall clock
+    assert events[0] == (start_t,'start')
+    assert [event for t, event in events][1:4] == \
+        ['cast','splash_start','splash']
+    # only the splash area crops were recorded
+    side = 2*params['splash_radius']
+    shapes = set((int(rec['height']),int(rec['width']))
+                 for rec, frame in replay.frames())
+    assert shapes == {(side,side)}
+
+def test_async_splash_watch_times_out_on_source_clock():
+    import asyncio, concurrent.futures, functools
+    from fishyhelper import BobTracker
+    params = make_params(async_loop=True,max_wait_time=5)
+    source = SyntheticFrameSource(1134,650,seed=3,splash_delay=None)
+    mouser = RecordingMouser(source)
+    nat = NatPagle(params,source=source,mouser=mouser)
+    tracker = BobTracker(params,nat.pt,mouser,metrics=nat.metrics,
+                         pacer=nat.pacer,tracer=nat.tracer)
+    tracker.take_baseline(source)
+    tracker.cast(source)
+    source.sleep(2)
+    bob_loc = tracker.search_bob(source,params['bob_track_probe'])
+    assert bob_loc
+    tracker.splash_start(source,bob_loc[0],bob_loc[1])
+
+    async def watch():
+        loop = asyncio.get_running_loop()
+        def run(executor,func,*args):
+            return loop.run_in_executor(
+                executor,functools.partial(func,*args))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as capture:
+            return await nat._watch_splash(
+                run,capture,tracker,source,params['max_wait_time'])
+
+    start_t = source.now()
+    assert asyncio.run(watch()) is False
+    assert tracker.outcome == 'timeout'
+    # the wait ends on the virtual clock, at most one frame late
+    waited = source.now() - start_t
+    assert params['max_wait_time'] <= waited <= \
+        params['max_wait_time'] + 1./source.fps
+
+def test_make_mouser_backends():
+    from fishyhelper import NullMouser
+    source = SyntheticFrameSource(1134,650)
+    nat = NatPagle(make_params(input_backend='null'),source=source)
+    assert isinstance(nat.make_mouser(),NullMouser)
+    # WinMouser cannot press the cast key, so it is refused up front
+    for backend in ('win','qwerty'):
+        nat = NatPagle(make_params(input_backend=backend),source=source)
+        with pytest.raises(ValueError):
+            nat.make_mouser()
@@ -0,0 +1,52 @@
+import io, sys, threading
+from fishyhelper.trace import Tracer
+
+def test_concurrent_messages_print_once():
+    stream = io.StringIO()
+    tracer = Tracer('info',capacity=1 << 16,interval=.001,stream=stream)
+
+    def produce(name):
+        for i in range(2000):
+            tracer.info(name + ' ' + str(i))
+
+    threads = [threading.Thread(target=produce,args=(name,))
+               for name in 'abcd']
+    # switch threads as often as possible, to interleave the producers
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    tracer.close()
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == len(set(lines)) == 8000
+    for name in 'abcd':
+        mine = [int(line.split()[1]) for line in lines
+                if line.startswith(name + ' ')]
+        assert mine == list(range(2000))
+
+def test_overflow_counts_dropped():
+    stream = io.StringIO()
+    tracer = Tracer('info',capacity=8,stream=stream)
+    for i in range(20):
+        tracer.info(str(i))
+    tracer.close()
+
+    lines = stream.getvalue().splitlines()
+    assert lines == ['|-- 12 trace events dropped'] + \
+        [str(i) for i in range(12,20)]
+    assert [ev[6] for ev in tracer.events()] == lines[1:]
+
+def test_trackers_share_a_default_tracer():
+    from fishyhelper import BobTracker, NullMouser, shared_tracer
+    from herefishy import params
+    params = dict(params,_dev_mode=False,trace_level='warning')
+    a = BobTracker(params,None,mouser=NullMouser())
+    b = BobTracker(params,None,mouser=NullMouser())
+    assert a.trace is b.trace is shared_tracer('warning')
+    assert shared_tracer('info') is not a.trace
@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+from fishyhelper import BobTracker, NullMouser, ParamTracker, \
+    SyntheticFrameSource, Tracer, cluster_hits
+from herefishy import params as default_params
+
+def make_params(width,height,**overrides):
+    params = dict(default_params)
+    params['_dev_mode'] = False
+    params['cap_area'] = {'top': 0, 'left': 0, 'width': width,
+                          'height': height}
+    params.update(overrides)
+    return params
+
+def test_cluster_hits_drops_moving_blobs():
+    # a still 3x3 blob and a brighter one that moves 20 px right between
+    # the two screenshots
+    still = [(100+20*i,100+20*j) for i in range(3) for j in range(3)]
+    moving = [(300+20*i,100+20*j) for i in range(4) for j in range(3)]
+    pts = np.array(still + moving)
+    first = np.array([10.]*9 + [50.,50.,50.]*3 + [1.]*3)
+    second = np.array([10.]*9 + [1.]*3 + [50.,50.,50.]*3)
+    weights = (first + second)/2
+    blobs = cluster_hits(pts,weights,20)
+    assert blobs[0]['x'] > 250 # brighter wins on color difference alone
+    blobs = cluster_hits(pts,weights,20,grab_weights=[first,second],
+                         footprint=9,max_motion=5.)
+    assert len(blobs) == 1
+    assert blobs[0]['x'] == pytest.approx(120.)
+    assert blobs[0]['motion'] == pytest.approx(0.)
+
+@pytest.mark.parametrize('mode',['probe','integral','pyramid'])
+@pytest.mark.parametrize('size',[(1134,650),(1920,1080)])
+def test_find_bob_ignores_passing_distractors(mode,size):
+    width, height = size
+    params = make_params(width,height,bob_search_mode=mode)
+    found = 0
+    for seed in range(4):
+        tracker = BobTracker(params,None,mouser=NullMouser(),
+                             tracer=Tracer('warning'))
+        source = SyntheticFrameSource(width,height,distractors=2,seed=seed)
+        bob_loc = tracker.find_bob(params['bob_track_probe'],source=source)
+        if bob_loc:
+            # never a distractor
+            assert np.hypot(bob_loc[0]-source.bob_pos[0],
+                            bob_loc[1]-source.bob_pos[1]) <= \
+                params['splash_radius']
+            found += 1
+    assert found >= 3
+
+@pytest.mark.parametrize('mode',['probe','integral','pyramid'])
+def test_find_bob_keeps_rocking_bobber(mode):
+    # on rough water the bobber drifts further than bob_max_motion between
+    # the verification screenshots, so it is kept as the best blob
+    params = make_params(1134,650,bob_search_mode=mode)
+    for seed in range(4):
+        tracker = BobTracker(params,None,mouser=NullMouser(),
+                             tracer=Tracer('warning'))
+        source = SyntheticFrameSource(1134,650,distractors=0,seed=seed,
+                                      bob_wobble=8.)
+        bob_loc = tracker.find_bob(params['bob_track_probe'],source=source)
+        assert bob_loc
+        assert np.hypot(bob_loc[0]-source.bob_pos[0],
+                        bob_loc[1]-source.bob_pos[1]) <= \
+            params['splash_radius']
+
+@pytest.mark.parametrize('size',[(1134,650),(1920,1080)])
+def test_probe_search_finds_bobber_in_time(size):
+    # the walk and verification must be done before the bobber fades
+    # away, 1.5 seconds after the default 8 second bite
+    width, height = size
+    params = make_params(width,height,bob_search_mode='probe')
+    for seed in range(4):
+        tracker = BobTracker(params,None,mouser=NullMouser(),
+                             tracer=Tracer('warning'))
+        source = SyntheticFrameSource(width,height,distractors=0,seed=seed)
+        bob_loc = tracker.find_bob(params['bob_track_probe'],source=source)
+        assert bob_loc
+        assert np.hypot(bob_loc[0]-source.bob_pos[0],
+                        bob_loc[1]-source.bob_pos[1]) <= \
+            params['splash_radius']
+        assert source.now() - source.cast_t < source.splash_delay
+
+def test_splash_track_resets_splash_background():
+    params = make_params(1134,650,bg_model='median')
+    tracker = BobTracker(params,None,mouser=NullMouser(),
+                         tracer=Tracer('warning'))
+    source = SyntheticFrameSource(1134,650,seed=0)
+    x, y = source.bob_pos
+    tracker.splash_start(source,x,y)
+    assert tracker.splash_bg is not None
+    tracker.params = dict(params,splash_track=True)
+    tracker.splash_start(source,x,y)
+    assert tracker.splash_bg is None
+
+@pytest.mark.parametrize('appear_delay',[1.,60.])
+def test_cast_log_waits_on_source_clock(appear_delay):
+    # a splash 8 seconds after the cast, or no bobber at all
+    params = make_params(1134,650)
+    pt = ParamTracker(params)
+    tracker = BobTracker(params,pt,mouser=NullMouser(),
+                         tracer=Tracer('warning'))
+    source = SyntheticFrameSource(1134,650,seed=1,distractors=0,
+                                  appear_delay=appear_delay)
+    tracker.take_baseline(source)
+    tracker.cast(source)
+    source.sleep(2)
+    bob_loc = tracker.search_bob(source,params['bob_track_probe'])
+    if bob_loc:
+        tracker.splash_start(source,bob_loc[0],bob_loc[1])
+        while tracker.splash_step(source) is None:
+            source.sleep(tracker.splash_delay(source))
+    rec = pt.history()[-1]
+    assert rec['time'] == source.cast_t
+    assert rec['wait_s'] == pytest.approx(source.now()-source.cast_t,
+                                          abs=1e-4)
+    if bob_loc:
+        assert ParamTracker.outcomes[rec['outcome']] == 'splash'
+        assert rec['wait_s'] == pytest.approx(source.splash_delay,abs=.1)
+    else:
+        assert ParamTracker.outcomes[rec['outcome']] == 'no_bobber'
+        assert 2 <= rec['wait_s'] < 5
+
+def test_cast_log_opened_on_first_cast(tmp_path):
+    path = str(tmp_path/'casts.dat')
+    pt = ParamTracker(make_params(1134,650),path)
+    assert not (tmp_path/'casts.dat').exists()
+    assert len(pt.history()) == 0
+    pt.log_cast(5.)
+    pt.log_find_bob(.1,0,0,None,7.5)
+    pt.close()
+    hist = ParamTracker(make_params(1134,650),path).history()
+    assert len(hist) == 1
+    assert hist[0]['time'] == 5. and hist[0]['wait_s'] == 2.5